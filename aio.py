@@ -0,0 +1,338 @@
+import asyncio
+import json
+import logging
+import time
+from http import HTTPStatus
+
+import aiohttp
+
+import breaker
+import conditional
+import digest
+import homework
+import http_pool
+import metrics
+import stream
+import webhook
+from botapi import parse_reply
+from cache import ResponseCache
+from exceptions import HttpResponseNotOkError, KirillTeleBotError
+from intervals import AdaptiveInterval
+from ratelimit import STATUS_PRIORITY, SendQueue, priority_of
+from scheduler import Scheduler
+from storage import MemoryStore
+from tenants import use_tenant
+
+TELEGRAM_API_URL = 'https://api.telegram.org'
+POLL_CONCURRENCY = 1000
+TICK_PERIOD = 1
+REPORT_PERIOD = 10
+SEND_DRAIN_TIMEOUT = 30
+
+
+class AsyncBot:
+    """Отправка сообщений через Bot API без блокировки цикла событий."""
+
+    def __init__(self, session, token, base_url=TELEGRAM_API_URL):
+        self.session = session
+        self.api_url = f'{base_url}/bot{token}'
+        self.url = f'{self.api_url}/sendMessage'
+
+    async def send_message(self, chat_id, text):
+        """Вызов метода sendMessage, ошибки Bot API - BotApiError."""
+        async with self.session.post(
+                self.url, json={'chat_id': chat_id, 'text': text}
+        ) as response:
+            return parse_reply(response.status, await response.read())
+
+
+class AsyncSendQueue(SendQueue):
+    """SendQueue для цикла событий.
+
+    Те же общий и по-чатовые лимиты, приоритет статусов над ошибками,
+    пауза по retry_after и сводки; отправка идет задачами asyncio вместо
+    рабочих потоков.
+    """
+
+    def __init__(self, bot, **kwargs):
+        super().__init__(bot, workers=0, **kwargs)
+        self._wakeup = asyncio.Event()
+        self._sending = set()
+        self._task = None
+
+    def put_many(self, messages, priority=STATUS_PRIORITY):
+        """Постановка пар (chat_id, текст) и пробуждение цикла отправки."""
+        super().put_many(messages, priority)
+        self._wakeup.set()
+
+    def _dispatch(self, item):
+        self._sending.add(asyncio.ensure_future(self._send_async(item)))
+
+    async def _send_async(self, item):
+        _, _, chat_id, text = item
+        try:
+            started = time.perf_counter()
+            await self.bot.send_message(chat_id=chat_id, text=text)
+        except Exception as error:
+            self._failed(item, error)
+        else:
+            metrics.SEND_LATENCY.observe(time.perf_counter() - started)
+            self.sent += 1
+        finally:
+            self._sending.discard(asyncio.current_task())
+            self._wakeup.set()
+
+    async def run(self):
+        """Цикл отправки, после stop() дожидается пустой очереди."""
+        while True:
+            delay = self.step()
+            if self._stopped and not len(self) and not self._sending:
+                return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Запуск цикла отправки задачей текущего цикла событий."""
+        self._task = asyncio.ensure_future(self.run())
+        return self
+
+    async def stop(self, timeout=None):
+        """Отправка оставшихся сообщений и остановка цикла."""
+        self._stopped = True
+        self._wakeup.set()
+        if self._task:
+            await asyncio.wait_for(self._task, timeout)
+
+
+class AsyncQueuedBot:
+    """Асинхронный бот, который только ставит сообщения в AsyncSendQueue."""
+
+    deferred = True
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    async def send_message(self, chat_id, text):
+        """Постановка в очередь, ошибки уходят с низким приоритетом."""
+        self.queue.put(chat_id, text, priority_of(text))
+
+
+async def send_message_async(bot, chat_id, message):
+    """Асинхронная отправка сообщения."""
+    try:
+        started = time.perf_counter()
+        await bot.send_message(chat_id=chat_id, text=message)
+        elapsed = time.perf_counter() - started
+        if not getattr(bot, 'deferred', False):
+            metrics.SEND_LATENCY.observe(elapsed)
+        logging.debug('send_message: Бот отправил сообщение: %s', message,
+                      extra={'send_latency': elapsed})
+    except (aiohttp.ClientError, KirillTeleBotError):
+        logging.error('send_message: Сообщение с текстом%s не отправленно',
+                      message)
+
+
+async def get_api_answer_async(session, tenant, timestamp, validate=True,
+                               cursor=None):
+    """Асинхронное получение ответа от API.
+
+    validate=False отключает условные запросы, ответ всегда разбирается.
+    cursor включает потоковый разбор с остановкой на работах старше него.
+    Любое исключение во время запроса, включая отмену, считается сбоем
+    для предохранителя: иначе его пробный запрос остался бы занятым.
+    """
+    payload = {'from_date': timestamp}
+    headers = (conditional.request_headers(tenant) if validate
+               else tenant.headers)
+    circuit = breaker.current()
+    if circuit:
+        circuit.check()
+    started = time.perf_counter()
+    requested = time.time()
+    try:
+        async with session.get(homework.ENDPOINT,
+                               headers=headers,
+                               params=payload) as response:
+            if cursor is None:
+                body = await response.read()
+            else:
+                body = None
+                if response.status == HTTPStatus.OK:
+                    answer, _ = await stream.parse_async(
+                        response.content.iter_chunked(stream.CHUNK_SIZE),
+                        cursor,
+                        stream.fallback_date(response.headers, requested))
+    except BaseException as error:
+        if circuit:
+            circuit.record_failure()
+        if isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError)):
+            raise KirillTeleBotError(error)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.API_LATENCY.observe(elapsed)
+    logging.debug('get_api_answer: код ответа %s', response.status,
+                  extra={'api_latency': elapsed})
+    if circuit:
+        circuit.record_status(response.status)
+    if validate:
+        not_modified = conditional.check(tenant, response.status,
+                                         response.headers, body)
+        if not_modified:
+            return not_modified
+    if response.status != HTTPStatus.OK:
+        logging.error(f'{homework.ENDPOINT}, не передает данные')
+        metrics.API_ERRORS.inc(response.status)
+        raise HttpResponseNotOkError(f'Код ошибки: {response.status}',
+                                     response.status)
+    if body is None:
+        return answer
+    return conditional.decode(lambda: json.loads(body), len(body))
+
+
+async def poll_tenant_async(session, bot, tenant):
+    """Асинхронный цикл опроса API и уведомления для арендатора.
+
+    Сообщения уходят всем чатам арендатора одновременно.
+    """
+    tenant.polls += 1
+    with use_tenant(tenant):
+        try:
+            response = await get_api_answer_async(
+                session, tenant, tenant.timestamp,
+                cursor=tenant.cursor if homework.STREAM_RESPONSES else None)
+            messages = homework.process_response(tenant, response)
+        except Exception as error:
+            message = homework.process_error(tenant, error)
+            messages = [message] if message else []
+        chats = tenant.chats
+        for message in messages:
+            await asyncio.gather(*(send_message_async(bot, chat_id, message)
+                                   for chat_id in chats))
+
+
+class AsyncEngine:
+    """Опрос множества арендаторов в одном цикле событий."""
+
+    def __init__(self, session, bot, registry,
+                 concurrency=POLL_CONCURRENCY, interval=None, store=None):
+        self.session = session
+        self.bot = bot
+        self.registry = registry
+        self.interval = interval or AdaptiveInterval()
+        self.store = store or MemoryStore()
+        self.scheduler = Scheduler()
+        self.cache = ResponseCache()
+        self.polls = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks = set()
+        metrics.REGISTRY.collect('scheduler', lambda: [
+            ('homework_scheduler_queue_depth', {}, len(self.scheduler)),
+            ('homework_tenants', {}, len(self.registry))])
+        metrics.REGISTRY.collect('cache', lambda: [
+            (f'homework_cache_{key}', {}, value)
+            for key, value in self.cache.stats.as_dict().items()])
+        for tenant in registry:
+            self.store.load(tenant)
+            registry.index(tenant)
+            self.scheduler.schedule(tenant.token, tenant.next_poll, tenant)
+
+    def add(self, tenant):
+        """Добавление арендатора на ходу."""
+        self.store.load(tenant)
+        self.registry.add(tenant)
+        self.scheduler.schedule(tenant.token, tenant.next_poll, tenant)
+
+    def remove(self, token):
+        """Удаление арендатора и его запланированного опроса."""
+        self.scheduler.cancel(token)
+        return self.registry.remove(token)
+
+    async def poll(self, tenant):
+        """Опрос одного арендатора с ограничением параллельности."""
+        try:
+            async with self._semaphore:
+                await poll_tenant_async(self.session, self.bot, tenant)
+        finally:
+            self.polls += 1
+            self.store.save(tenant)
+            tenant.next_poll = (time.monotonic()
+                                + breaker.next_delay(tenant, self.interval))
+            if tenant.token in self.registry:
+                self.scheduler.schedule(tenant.token, tenant.next_poll,
+                                        tenant)
+
+    async def fetch_homeworks(self, tenant, from_date=0):
+        """Ответ API по запросу пользователя через кэш."""
+        return await self.cache.get_or_fetch(
+            (tenant.token, from_date),
+            lambda: get_api_answer_async(self.session, tenant, from_date,
+                                         validate=False))
+
+    def tick(self, now=None):
+        """Запуск задач опроса для арендаторов, у которых подошел срок."""
+        now = time.monotonic() if now is None else now
+        tenants = self.scheduler.pop_due(now)
+        for tenant in tenants:
+            self._spawn(self.poll(tenant))
+        return len(tenants)
+
+    def _spawn(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def run_once(self):
+        """Однократный опрос всех арендаторов."""
+        await asyncio.gather(*(self.poll(tenant) for tenant in self.registry))
+
+    async def run(self, report=None, report_every=REPORT_PERIOD):
+        """Бесконечный цикл планировщика.
+
+        report(engine), если задан, вызывается раз в report_every секунд.
+        """
+        reported = time.monotonic()
+        while True:
+            self.tick()
+            self.store.flush_if_due()
+            if report and time.monotonic() - reported >= report_every:
+                report(self)
+                reported = time.monotonic()
+            due = self.scheduler.next_due()
+            delay = TICK_PERIOD if due is None else due - time.monotonic()
+            await asyncio.sleep(min(max(delay, 0), TICK_PERIOD))
+
+
+async def run_engine(registry, telegram_token, store=None,
+                     webhook_port=None, report=None):
+    """Запуск асинхронного опроса и, если задан порт, webhook-сервера."""
+    pool = http_pool.current() or http_pool.install(
+        http_pool.HttpPool(size=POLL_CONCURRENCY))
+    async with pool.async_session() as session:
+        bot = AsyncBot(session, telegram_token)
+        queue = AsyncSendQueue(
+            bot,
+            coalescer=digest.Coalescer() if digest.DIGEST_WINDOW else None
+        ).start()
+        engine = AsyncEngine(session, AsyncQueuedBot(queue), registry,
+                             store=store)
+        runner = None
+        if webhook_port:
+            runner = await webhook.start(engine, webhook_port)
+            if webhook.WEBHOOK_URL:
+                await webhook.set_webhook(
+                    session, bot.api_url,
+                    webhook.WEBHOOK_URL + webhook.WEBHOOK_PATH)
+        try:
+            await engine.run(report)
+        finally:
+            try:
+                await queue.stop(SEND_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                logging.warning(f'Не отправлено {len(queue)} сообщений')
+            engine.store.flush()
+            if runner:
+                await runner.cleanup()
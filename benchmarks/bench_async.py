@@ -0,0 +1,80 @@
+"""Сравнение числа опросов в секунду: потоки против asyncio.
+
+Запуск: python benchmarks/bench_async.py --tenants 2000 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aio  # noqa: E402
+import engine  # noqa: E402
+import homework  # noqa: E402
+import http_pool  # noqa: E402
+from benchmarks.fake_api import API_PATH, make_app, serve_in_thread  # noqa
+from tenants import Tenant, TenantRegistry  # noqa: E402
+
+
+class NullBot:
+    def send_message(self, chat_id, text):
+        pass
+
+
+class AsyncNullBot:
+    async def send_message(self, chat_id, text):
+        pass
+
+
+def make_registry(count):
+    return TenantRegistry(Tenant(f'token-{i}', i, timestamp=0)
+                          for i in range(count))
+
+
+def bench_sync(count, workers):
+    pool = http_pool.install(http_pool.HttpPool(per_host=workers))
+    registry = make_registry(count)
+    runner = engine.Engine(NullBot(), registry, workers=workers)
+    started = time.perf_counter()
+    runner.tick(now=0)
+    runner.shutdown()
+    rate = count / (time.perf_counter() - started)
+    http_pool.install(None)
+    return rate, pool.stats()
+
+
+async def bench_async(count, concurrency):
+    registry = make_registry(count)
+    pool = http_pool.HttpPool(size=concurrency, per_host=concurrency)
+    async with pool.async_session() as session:
+        runner = aio.AsyncEngine(session, AsyncNullBot(), registry,
+                                 concurrency=concurrency)
+        started = time.perf_counter()
+        await runner.run_once()
+        rate = count / (time.perf_counter() - started)
+    return rate, pool.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tenants', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--concurrency', type=int, default=500)
+    args = parser.parse_args()
+
+    homework.ENDPOINT = serve_in_thread(make_app(args.latency)) + API_PATH
+    sync_rate, sync_stats = bench_sync(args.tenants, args.workers)
+    async_rate, async_stats = asyncio.run(
+        bench_async(args.tenants, args.concurrency))
+    print(f'tenants={args.tenants} latency={args.latency}s')
+    print(f'sync  ({args.workers} threads): {sync_rate:10.1f} polls/s '
+          f'{sync_stats}')
+    print(f'async ({args.concurrency} tasks):  {async_rate:10.1f} polls/s '
+          f'{async_stats}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Отправка сообщений: telegram.Bot против botapi.BotClient.
+
+Заглушка Bot API (benchmarks/fake_api.py) работает в отдельном процессе
+с задержкой ответа --latency. Все варианты шлют --messages сообщений
+через --workers потоков; send_many - пакетом по пулу соединений.
+Отчет: сообщения в секунду и CPU процесса на сообщение.
+Запуск: python benchmarks/bench_botapi.py --messages 2000 --latency 0.02
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_api  # noqa: E402
+from botapi import BotClient  # noqa: E402
+
+BOT_TOKEN = '1234:bench'
+
+
+def measure(name, send, count):
+    times = os.times()
+    started = time.perf_counter()
+    send(count)
+    elapsed = time.perf_counter() - started
+    finished = os.times()
+    cpu = (finished.user - times.user + finished.system - times.system)
+    print(f'{name:28} {count / elapsed:8.0f} msg/s '
+          f'{cpu / count * 1e6:8.0f} мкс CPU/msg')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+    url, server = fake_api.serve_in_process(
+        fake_api.make_app, 0.0,
+        fake_api.World(telegram_latency=args.latency))
+    pool = ThreadPoolExecutor(args.workers)
+
+    def threaded(bot):
+        def send(count):
+            list(pool.map(lambda chat: bot.send_message(
+                chat_id=chat, text=f'Сообщение {chat}'), range(count)))
+        return send
+
+    import telegram
+    from telegram.utils.request import Request
+
+    default_bot = telegram.Bot(BOT_TOKEN, base_url=f'{url}/bot')
+    pooled_bot = telegram.Bot(
+        BOT_TOKEN, base_url=f'{url}/bot',
+        request=Request(con_pool_size=args.workers + 4))
+    client = BotClient(BOT_TOKEN, base_url=url, pool_size=args.workers)
+    print(f'messages={args.messages}, workers={args.workers}, '
+          f'latency={args.latency}')
+    measure('telegram.Bot (пул 1)', threaded(default_bot), args.messages)
+    measure('telegram.Bot (пул workers)', threaded(pooled_bot),
+            args.messages)
+    measure('BotClient.send_message', threaded(client), args.messages)
+    measure('BotClient.send_many', lambda count: client.send_many(
+        (chat, f'Сообщение {chat}') for chat in range(count)),
+        args.messages)
+    client.close()
+    pool.shutdown()
+    server.terminate()
+
+
+if __name__ == '__main__':
+    main()
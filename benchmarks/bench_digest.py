@@ -0,0 +1,70 @@
+"""Сводки уведомлений: число вызовов sendMessage и задержка в пике.
+
+Моделируется пачка проверок: у каждого чата --burst смен статуса с
+промежутками до --spread секунд. Сравнивается отправка без сводок и
+Coalescer с окном --window и пределом --max-delay.
+Запуск: python benchmarks/bench_digest.py --chats 10000 --burst 5
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from digest import Coalescer  # noqa: E402
+
+
+def make_events(chats, burst, spread, seed):
+    rand = random.Random(seed)
+    events = []
+    for chat in range(chats):
+        moment = rand.uniform(0, 60)
+        for index in range(rand.randint(1, burst)):
+            moment += rand.uniform(0, spread)
+            events.append((moment, chat, f'Изменился статус "hw{index}"'))
+    return sorted(events)
+
+
+def simulate(events, window, max_delay):
+    coalescer = Coalescer(window=window, max_delay=max_delay)
+    created = {}
+    delays = []
+    sent = 0
+
+    def release(until):
+        nonlocal sent
+        while len(coalescer) and coalescer.next_due() <= until:
+            due = coalescer.next_due()
+            for chat_id, digest in coalescer.pop_due(due):
+                sent += 1
+                delays.extend(due - created.pop((chat_id, line))
+                              for line in digest.split('\n'))
+
+    for moment, chat, text in events:
+        release(moment)
+        created[chat, text] = moment
+        coalescer.add(chat, text, now=moment)
+    release(float('inf'))
+    return sent, max(delays)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chats', type=int, default=10_000)
+    parser.add_argument('--burst', type=int, default=5)
+    parser.add_argument('--spread', type=float, default=20.0)
+    parser.add_argument('--window', type=float, default=30.0)
+    parser.add_argument('--max-delay', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    events = make_events(args.chats, args.burst, args.spread, args.seed)
+    print(f'chats={args.chats}, событий {len(events)}')
+    for name, window in (('без сводок', 0.0), ('сводки', args.window)):
+        sent, worst = simulate(events, window, args.max_delay)
+        print(f'{name:12} sendMessage {sent:7} '
+              f'({sent / len(events):5.0%}), макс. задержка {worst:5.1f} с')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Поиск подписчиков арендатора при разном размере реестра.
+
+Время registry.subscribers(token) не должно зависеть от числа
+арендаторов и подписок.
+Запуск: python benchmarks/bench_fanout.py --subscribers 3
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tenants import Tenant, TenantRegistry  # noqa: E402
+
+
+def build(tenants, subscribers):
+    registry = TenantRegistry(Tenant(f'token-{i}', i) for i in range(tenants))
+    for index in range(tenants):
+        for offset in range(1, subscribers + 1):
+            registry.subscribe(f'token-{index}', tenants * offset + index)
+    return registry
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--subscribers', type=int, default=3)
+    parser.add_argument('--lookups', type=int, default=200_000)
+    args = parser.parse_args()
+    for tenants in (1_000, 10_000, 100_000):
+        registry = build(tenants, args.subscribers)
+        tokens = [f'token-{random.randrange(tenants)}'
+                  for _ in range(args.lookups)]
+        started = time.perf_counter()
+        chats = sum(len(registry.subscribers(token)) for token in tokens)
+        elapsed = time.perf_counter() - started
+        print(f'tenants={tenants:7} чатов на событие {chats / len(tokens):.0f}'
+              f' {elapsed / len(tokens) * 1e9:6.0f} ns/поиск')
+
+
+if __name__ == '__main__':
+    main()
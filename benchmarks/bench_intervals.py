@@ -0,0 +1,80 @@
+"""Симуляция недели опросов: RETRY_PERIOD против AdaptiveInterval.
+
+Все студенты начинают с давно принятой работы, доля --active сдает
+новую. Считает число запросов к API и медианную задержку уведомления.
+Запуск: python benchmarks/bench_intervals.py --tenants 1000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intervals import AdaptiveInterval, FixedInterval  # noqa: E402
+from tenants import Tenant  # noqa: E402
+
+WEEK = 7 * 24 * 60 * 60
+START = 1_700_000_000
+
+
+def make_history(rand):
+    """Смены статусов одной работы: reviewing, затем вердикт."""
+    events = []
+    moment = START + rand.uniform(0, WEEK / 2)
+    for _ in range(rand.randint(1, 3)):
+        events.append((moment, 'reviewing'))
+        moment += rand.expovariate(1 / (6 * 60 * 60))
+        verdict = rand.choice(('approved', 'rejected'))
+        events.append((moment, verdict))
+        if verdict == 'approved':
+            break
+        moment += rand.expovariate(1 / (24 * 60 * 60))
+    return [event for event in events if event[0] < START + WEEK]
+
+
+def simulate(policy, histories):
+    calls, latencies = 0, {'reviewing': [], 'verdict': []}
+    for last_change, events in histories:
+        tenant = Tenant('token', 0, timestamp=START)
+        tenant.last_status, tenant.last_change = 'approved', last_change
+        now, index = START, 0
+        while now < START + WEEK:
+            calls += 1
+            while index < len(events) and events[index][0] <= now:
+                kind = ('reviewing' if events[index][1] == 'reviewing'
+                        else 'verdict')
+                latencies[kind].append(now - events[index][0])
+                tenant.last_status = events[index][1]
+                tenant.last_change = now
+                index += 1
+            now += policy.next_interval(tenant, now)
+    return calls, {kind: statistics.median(values)
+                   for kind, values in latencies.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tenants', type=int, default=1000)
+    parser.add_argument('--active', type=float, default=0.3,
+                        help='доля студентов, сдающих работу на этой неделе')
+    args = parser.parse_args()
+    rand = random.Random(1)
+    histories = [
+        (START - rand.uniform(1, 14) * 24 * 60 * 60,
+         make_history(rand) if rand.random() < args.active else [])
+        for _ in range(args.tenants)
+    ]
+    for name, policy in (
+            ('fixed 600s', FixedInterval(600)),
+            ('adaptive', AdaptiveInterval(rand=rand.random)),
+    ):
+        calls, latency = simulate(policy, histories)
+        print(f'{name:10}: {calls:9} API calls, median notify latency: '
+              f'verdict {latency["verdict"]:6.0f}s, '
+              f'reviewing {latency["reviewing"]:6.0f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Память на арендатора: __dict__ и строки статусов против __slots__ и Status.
+
+Статусы и работы берутся из json.loads, как из ответа API: каждая строка
+статуса в старой схеме - отдельный объект.
+Запуск: python benchmarks/bench_memory.py --tenants 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Homework, Status  # noqa: E402
+from tenants import Tenant  # noqa: E402
+
+STATUSES = ('reviewing', 'rejected', 'approved')
+
+
+class LegacyTenant:
+    """Арендатор в прежнем виде: __dict__ и строковые статусы."""
+
+    def __init__(self, token, chat_id, timestamp=0):
+        self.token = token
+        self.chat_id = chat_id
+        self.timestamp = timestamp
+        self.statuses = {}
+        self.last_message = None
+        self.old_error_message = None
+        self.last_status = None
+        self.last_change = 0.0
+        self.etag = None
+        self.last_modified = None
+        self.body_hash = None
+        self.body_size = None
+        self.failures = 0
+        self.muted = False
+        self.next_poll = 0.0
+        self.polls = 0
+        self.cursor = 0.0
+
+
+def answer(index, homeworks):
+    return json.dumps({'current_date': index, 'homeworks': [
+        {'id': index * homeworks + number,
+         'homework_name': f'user{index}__hw{number}.zip',
+         'status': STATUSES[number % 3],
+         'reviewer_comment': 'Отлично',
+         'date_updated': '2022-01-28T10:00:00Z'}
+        for number in range(homeworks)]})
+
+
+def build(bodies, typed):
+    tenants = []
+    for index, body in enumerate(bodies):
+        homeworks = json.loads(body)['homeworks']
+        if typed:
+            tenant = Tenant(str(index), index, timestamp=0)
+            records = [Homework.from_json(homework) for homework in homeworks]
+            tenant.statuses = {str(record.id): record.status
+                               for record in records}
+            tenant.last_status = records[-1].status
+        else:
+            tenant = LegacyTenant(str(index), index)
+            records = homeworks
+            tenant.statuses = {str(record['id']): record['status']
+                               for record in records}
+            tenant.last_status = records[-1]['status']
+        tenants.append((tenant, records))
+    return tenants
+
+
+def measure(bodies, typed):
+    tracemalloc.start()
+    tenants = build(bodies, typed)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tenants
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tenants', type=int, default=100_000)
+    parser.add_argument('--homeworks', type=int, default=3)
+    args = parser.parse_args()
+    bodies = [answer(index, args.homeworks) for index in range(args.tenants)]
+    legacy = measure(bodies, typed=False)
+    typed = measure(bodies, typed=True)
+    print(f'tenants={args.tenants}, homeworks={args.homeworks}, '
+          f'Status: {", ".join(status.label for status in Status)}')
+    for name, size in (('__dict__ + str', legacy),
+                       ('__slots__ + Status', typed)):
+        print(f'{name:20} {size / 2**20:8.1f} MiB '
+              f'{size / args.tenants:7.0f} B/арендатор')
+    print(f'экономия {(1 - typed / legacy) * 100:.0f}%')
+
+
+if __name__ == '__main__':
+    main()
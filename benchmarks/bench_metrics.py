@@ -0,0 +1,50 @@
+"""Микробенчмарк стоимости одного наблюдения метрик.
+
+Цель - меньше 1 мкс на observe() и inc().
+Запуск: python benchmarks/bench_metrics.py --repeat 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+
+
+def per_call(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=1_000_000)
+    args = parser.parse_args()
+    histogram = metrics.Histogram('bench_seconds', 'bench')
+    counter = metrics.Counter('bench_total', 'bench', ('code',))
+    clock = time.perf_counter
+    baseline = per_call(lambda: None, args.repeat)
+
+    def timed_observe():
+        started = clock()
+        histogram.observe(clock() - started)
+
+    results = {
+        'observe': per_call(lambda: histogram.observe(0.042), args.repeat),
+        'inc': per_call(lambda: counter.inc(502), args.repeat),
+        'perf_counter + observe': per_call(timed_observe, args.repeat),
+    }
+    print(f'repeat={args.repeat}, пустой вызов {baseline * 1e9:.0f} ns')
+    for name, seconds in results.items():
+        print(f'{name:24} {(seconds - baseline) * 1e9:7.0f} ns/op')
+    started = time.perf_counter()
+    metrics.REGISTRY.render()
+    print(f'render: {(time.perf_counter() - started) * 1e3:.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Запись в outbox и разбор после перезапуска.
+
+put() должен стоить микросекунды, чтобы не тормозить цикл опроса,
+а чтение сегментов при старте - расти линейно с числом записей.
+Запуск: python benchmarks/bench_outbox.py --messages 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbox import Outbox  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=100_000)
+    parser.add_argument('--acked', type=float, default=0.9,
+                        help='доля доставленных сообщений')
+    parser.add_argument('--sync', action='store_true',
+                        help='flush() после каждой записи')
+    args = parser.parse_args()
+    text = 'Изменился статус проверки работы "hw". Работа проверена.'
+    with tempfile.TemporaryDirectory() as directory:
+        box = Outbox(directory, sync=args.sync)
+        started = time.perf_counter()
+        for number in range(args.messages):
+            box.put(number, text, key=str(number))
+        put = time.perf_counter() - started
+        acked = int(args.messages * args.acked)
+        started = time.perf_counter()
+        for number in range(acked):
+            box.ack(str(number))
+        ack = time.perf_counter() - started
+        segments = len(box.segments)
+        box.close()
+        started = time.perf_counter()
+        box = Outbox(directory)
+        replay = time.perf_counter() - started
+        print(f'put {put / args.messages * 1e6:6.1f} us, '
+              f'ack {ack / max(acked, 1) * 1e6:6.1f} us, '
+              f'сегментов {segments}, '
+              f'перезапуск {replay * 1e3:.0f} ms, в очереди {len(box)}')
+        box.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Микробенчмарк планировщика на 100k арендаторов.
+
+Сравнивает стоимость тика с полным перебором арендаторов.
+Запуск: python benchmarks/bench_scheduler.py --tenants 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import Scheduler  # noqa: E402
+from tenants import Tenant  # noqa: E402
+
+
+def timed(func, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tenants', type=int, default=100_000)
+    parser.add_argument('--period', type=float, default=600)
+    args = parser.parse_args()
+    rand = random.Random(1)
+    tenants = [Tenant(f'token-{i}', i, timestamp=0)
+               for i in range(args.tenants)]
+    for tenant in tenants:
+        tenant.next_poll = rand.uniform(0, args.period)
+    scheduler = Scheduler()
+
+    def insert_all():
+        for tenant in tenants:
+            scheduler.schedule(tenant.token, tenant.next_poll, tenant)
+
+    insert, _ = timed(insert_all)
+    sample = rand.sample(tenants, 10_000)
+
+    def reschedule():
+        for tenant in sample:
+            scheduler.reschedule(tenant.token,
+                                 rand.uniform(0, args.period), tenant)
+
+    resched, _ = timed(reschedule)
+    now = 1.0
+    tick, due = timed(lambda: scheduler.pop_due(now))
+    for tenant in due:
+        scheduler.schedule(tenant.token, now + args.period, tenant)
+    scan, scanned = timed(
+        lambda: [t for t in tenants if t.next_poll <= now], repeat=5)
+    empty_tick, _ = timed(lambda: scheduler.pop_due(0.0), repeat=1000)
+
+    def cancel():
+        for tenant in sample:
+            scheduler.cancel(tenant.token)
+
+    cancelled, _ = timed(cancel)
+    count = len(sample)
+    print(f'tenants={args.tenants}')
+    print(f'insert:      {insert / args.tenants * 1e6:8.2f} us/op')
+    print(f'reschedule:  {resched / count * 1e6:8.2f} us/op')
+    print(f'cancel:      {cancelled / count * 1e6:8.2f} us/op')
+    print(f'tick (heap): {tick * 1e3:8.3f} ms for {len(due)} due')
+    print(f'tick (idle): {empty_tick * 1e6:8.2f} us with nothing due')
+    print(f'tick (scan): {scan * 1e3:8.3f} ms for {len(scanned)} due')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Время импорта модулей по python -X importtime с бюджетами.
+
+Каждый модуль импортируется в отдельном процессе несколько раз, берется
+медиана суммарного времени. Превышение бюджета - ненулевой код выхода.
+Запуск: python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BUDGETS_MS = {
+    'homework': 60,
+    'engine': 100,
+}
+HEAVY = ('telegram', 'aiohttp', 'requests', 'dotenv', 'email.utils')
+
+
+def import_profile(module):
+    """Время импорта module (мкс) и его прямых зависимостей."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+    children = {}
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        loaded.add(name.strip())
+        if depth == 1:
+            children[name.strip()] = int(cumulative)
+        elif depth == 0 and name.strip() == module:
+            return int(cumulative), children, loaded
+        elif depth == 0:
+            children = {}
+    raise RuntimeError(f'{module} нет в выводе -X importtime')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    over = []
+    for module, budget in BUDGETS_MS.items():
+        runs = [import_profile(module) for _ in range(args.repeat)]
+        total = statistics.median(run[0] for run in runs) / 1000
+        _, children, loaded = runs[-1]
+        heavy = [name for name in HEAVY if name in loaded]
+        top = sorted(children.items(), key=lambda item: -item[1])[:3]
+        print(f'{module:10} {total:7.1f} ms (бюджет {budget} ms), '
+              f'тяжелые: {", ".join(heavy) or "нет"}')
+        for name, micros in top:
+            print(f'    {name:20} {micros / 1000:7.1f} ms')
+        if total > budget:
+            over.append(module)
+    if over:
+        sys.exit(f'Превышен бюджет импорта: {", ".join(over)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Сквозной бенчмарк бота против локальных заглушек API и Bot API.
+
+Для каждого размера запускаются отдельный процесс заглушки и отдельный
+процесс бота, который делает --rounds полных проходов по арендаторам.
+Отчет: опросы в секунду, p50/p99 задержки уведомления (от выдачи нового
+статуса API до получения sendMessage), RSS и CPU процесса бота.
+
+Запуск:
+python benchmarks/bench_suite.py --tenants 1000 10000 100000 \
+    --latency 0.02 --change-rate 0.1 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aio  # noqa: E402
+import homework  # noqa: E402
+import http_pool  # noqa: E402
+from benchmarks import fake_api  # noqa: E402
+from tenants import Tenant, TenantRegistry  # noqa: E402
+
+BOT_TOKEN = '1234:bench'
+
+
+def make_registry(count):
+    return TenantRegistry(Tenant(f'token-{i}', i, timestamp=0)
+                          for i in range(count))
+
+
+def current_rss():
+    """Текущий RSS в байтах по /proc, без него - пиковый."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def drive_async(registry, url, args):
+    pool = http_pool.HttpPool(size=args.concurrency,
+                              per_host=args.concurrency)
+    async with pool.async_session() as session:
+        bot = aio.AsyncBot(session, BOT_TOKEN, base_url=url)
+        runner = aio.AsyncEngine(session, bot, registry,
+                                 concurrency=args.concurrency)
+        for _ in range(args.rounds):
+            await runner.run_once()
+
+
+def drive_sync(registry, url, args):
+    import telegram
+    from telegram.utils.request import Request
+
+    import engine
+    from ratelimit import QueuedBot, SendQueue
+
+    http_pool.install(http_pool.HttpPool(per_host=args.workers))
+    bot = telegram.Bot(BOT_TOKEN, base_url=f'{url}/bot',
+                       request=Request(con_pool_size=args.workers + 4))
+    queue = SendQueue(bot, global_rate=1e9, chat_rate=1e9,
+                      chat_burst=1e9).start()
+    runner = engine.Engine(QueuedBot(queue), registry, workers=args.workers)
+    for _ in range(args.rounds):
+        list(runner.executor.map(runner.poll, list(registry)))
+    runner.shutdown()
+    queue.stop()
+
+
+def run_bot(count, url, args, results):
+    """Процесс бота: замер одного размера."""
+    logging.disable(logging.CRITICAL)
+    homework.ENDPOINT = url + fake_api.API_PATH
+    registry = make_registry(count)
+    times = os.times()
+    started = time.perf_counter()
+    if args.engine == 'async':
+        asyncio.run(drive_async(registry, url, args))
+    else:
+        drive_sync(registry, url, args)
+    elapsed = time.perf_counter() - started
+    finished = os.times()
+    results.put({
+        'elapsed': elapsed,
+        'polls_per_s': count * args.rounds / elapsed,
+        'cpu_s': (finished.user - times.user
+                  + finished.system - times.system),
+        'rss_mb': current_rss() / 2 ** 20,
+        'rss_peak_mb':
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+
+
+def bench(count, args):
+    world = fake_api.World(
+        homeworks=args.homeworks, change_rate=args.change_rate,
+        api_error_rate=args.api_error_rate,
+        telegram_latency=args.telegram_latency,
+        telegram_error_rate=args.telegram_error_rate)
+    url, server = fake_api.serve_in_process(fake_api.make_app,
+                                            args.latency, world)
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    bot = context.Process(target=run_bot, args=(count, url, args, results))
+    bot.start()
+    result = results.get()
+    bot.join()
+    result.update(requests.get(url + fake_api.STATS_PATH).json())
+    server.terminate()
+    server.join()
+    return {'engine': args.engine, 'tenants': count, 'rounds': args.rounds,
+            **result}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tenants', type=int, nargs='+',
+                        default=[1000, 10_000, 100_000])
+    parser.add_argument('--rounds', type=int, default=2)
+    parser.add_argument('--engine', choices=('async', 'sync'),
+                        default='async')
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='задержка ответа API, с')
+    parser.add_argument('--api-error-rate', type=float, default=0.0)
+    parser.add_argument('--homeworks', type=int, default=3,
+                        help='работ в ответе API, задает размер ответа')
+    parser.add_argument('--change-rate', type=float, default=0.1,
+                        help='вероятность нового статуса на запрос')
+    parser.add_argument('--telegram-latency', type=float, default=0.01)
+    parser.add_argument('--telegram-error-rate', type=float, default=0.0)
+    parser.add_argument('--json', dest='json_path',
+                        help='файл для результатов в JSON, - для stdout')
+    args = parser.parse_args()
+
+    results = []
+    for count in args.tenants:
+        result = bench(count, args)
+        results.append(result)
+        p50, p99 = result['notify_p50'], result['notify_p99']
+        print(f"{args.engine} tenants={count:>7}: "
+              f"{result['polls_per_s']:9.1f} polls/s, "
+              f"notify p50={p50 or 0:.3f}s p99={p99 or 0:.3f}s, "
+              f"RSS {result['rss_mb']:.1f} MB "
+              f"(peak {result['rss_peak_mb']:.1f}), "
+              f"CPU {result['cpu_s']:.2f}s, "
+              f"messages={result['messages']}", file=sys.stderr)
+    if args.json_path == '-':
+        json.dump(results, sys.stdout, indent=2)
+    elif args.json_path:
+        with open(args.json_path, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
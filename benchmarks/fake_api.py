@@ -0,0 +1,168 @@
+"""Локальные заглушки API Практикума и Bot API для бенчмарков."""
+import asyncio
+import multiprocessing
+import random
+import socket
+import threading
+import time
+
+from aiohttp import web
+
+API_PATH = '/api/user_api/homework_statuses/'
+BOT_PATH = '/bot{token}/sendMessage'
+STATS_PATH = '/stats'
+STATUSES = ('reviewing', 'rejected', 'approved')
+
+
+def percentile(values, fraction):
+    """Перцентиль отсортированного списка, None для пустого."""
+    if not values:
+        return None
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class World:
+    """Настройки и состояние заглушек.
+
+    Статус первой работы токена меняется с вероятностью change_rate на
+    каждом запросе. Время выдачи нового статуса запоминается, и при
+    получении sendMessage для чата токена считается задержка
+    уведомления. Чат токена token-N - N.
+    """
+
+    def __init__(self, homeworks=1, change_rate=0.0, api_error_rate=0.0,
+                 telegram_latency=0.0, telegram_error_rate=0.0, seed=1):
+        self.homeworks = homeworks
+        self.change_rate = change_rate
+        self.api_error_rate = api_error_rate
+        self.telegram_latency = telegram_latency
+        self.telegram_error_rate = telegram_error_rate
+        self.random = random.Random(seed)
+        self.versions = {}
+        self.served = {}
+        self.latencies = []
+        self.api_requests = 0
+        self.api_errors = 0
+        self.messages = 0
+        self.telegram_errors = 0
+
+    def answer(self, token):
+        """Тело ответа API для токена."""
+        version = self.versions.get(token)
+        if version is None or self.random.random() < self.change_rate:
+            version = 0 if version is None else version + 1
+            self.versions[token] = version
+            self.served[token] = time.monotonic()
+        homeworks = [{
+            'id': index,
+            'homework_name': f'{token}__hw{index}.zip',
+            'lesson_name': f'Спринт {index}',
+            'status': STATUSES[version % 3] if index == 0 else 'approved',
+            'reviewer_comment': 'Принято',
+            'date_updated': '2022-01-01T00:00:00Z',
+        } for index in range(self.homeworks)]
+        return {'homeworks': homeworks, 'current_date': int(time.time())}
+
+    def notified(self, chat_id):
+        """Учет доставленного уведомления."""
+        self.messages += 1
+        served = self.served.pop(f'token-{chat_id}', None)
+        if served is not None:
+            self.latencies.append(time.monotonic() - served)
+
+    def stats(self):
+        """Сводка для бенчмарка."""
+        latencies = sorted(self.latencies)
+        return {
+            'api_requests': self.api_requests,
+            'api_errors': self.api_errors,
+            'messages': self.messages,
+            'telegram_errors': self.telegram_errors,
+            'notify_p50': percentile(latencies, 0.5),
+            'notify_p99': percentile(latencies, 0.99),
+        }
+
+
+def make_app(latency=0.0, world=None):
+    """Приложение-заглушка.
+
+    Без world API отвечает пустым списком домашек; с world добавляются
+    работы, ошибки, Bot API и сводка на STATS_PATH.
+    """
+    async def homework_statuses(request):
+        if latency:
+            await asyncio.sleep(latency)
+        if world is None:
+            return web.json_response(
+                {'homeworks': [], 'current_date': int(time.time())})
+        world.api_requests += 1
+        if world.random.random() < world.api_error_rate:
+            world.api_errors += 1
+            return web.Response(status=500)
+        token = request.headers.get('Authorization', '').split()[-1]
+        return web.json_response(world.answer(token))
+
+    async def send_message(request):
+        if world.telegram_latency:
+            await asyncio.sleep(world.telegram_latency)
+        if world.random.random() < world.telegram_error_rate:
+            world.telegram_errors += 1
+            return web.json_response(
+                {'ok': False, 'error_code': 500,
+                 'description': 'Internal Server Error'}, status=500)
+        if request.content_type == 'application/json':
+            payload = await request.json()
+        else:
+            payload = await request.post()
+        chat_id = int(payload['chat_id'])
+        world.notified(chat_id)
+        return web.json_response({'ok': True, 'result': {
+            'message_id': world.messages, 'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': payload.get('text')}})
+
+    async def stats(request):
+        return web.json_response(world.stats())
+
+    app = web.Application()
+    app.router.add_get(API_PATH, homework_statuses)
+    if world is not None:
+        app.router.add_post(BOT_PATH, send_message)
+        app.router.add_get(STATS_PATH, stats)
+    return app
+
+
+def serve_in_thread(app, host='127.0.0.1'):
+    """Запуск приложения в фоновом потоке, возвращает базовый URL."""
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app, access_log=None)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, host, 0, backlog=4096)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return f'http://{host}:{port}'
+
+
+def serve_in_process(make, *args, host='127.0.0.1'):
+    """Запуск make(*args) в отдельном процессе, возвращает (URL, процесс).
+
+    CPU и память заглушки не попадают в замеры процесса бота.
+    """
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, 0))
+    sock.listen(4096)
+    port = sock.getsockname()[1]
+
+    async def serve():
+        runner = web.AppRunner(make(*args), access_log=None)
+        await runner.setup()
+        await web.SockSite(runner, sock).start()
+        await asyncio.Event().wait()
+
+    process = multiprocessing.get_context('fork').Process(
+        target=lambda: asyncio.run(serve()), daemon=True)
+    process.start()
+    sock.close()
+    return f'http://{host}:{port}', process
@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from exceptions import BotApiError
+
+TELEGRAM_API_URL = 'https://api.telegram.org'
+SEND_POOL_SIZE = int(os.getenv('SEND_POOL_SIZE', 16))
+SEND_TIMEOUT = 10
+
+
+def parse_reply(status_code, body):
+    """Поле result ответа Bot API или BotApiError.
+
+    retry_after берется из parameters ответа 429, по нему SendQueue
+    приостанавливает отправку.
+    """
+    try:
+        reply = json.loads(body)
+    except ValueError:
+        reply = None
+    if not isinstance(reply, dict):
+        raise BotApiError(f'Код ошибки: {status_code}', status_code)
+    if status_code != HTTPStatus.OK or not reply.get('ok'):
+        parameters = reply.get('parameters') or {}
+        raise BotApiError(
+            reply.get('description') or f'Код ошибки: {status_code}',
+            reply.get('error_code', status_code),
+            parameters.get('retry_after'))
+    return reply.get('result')
+
+
+class BotClient:
+    """Отправка sendMessage напрямую в Bot API через пул keep-alive.
+
+    Заменяет telegram.Bot там, где нужен только send_message: запрос
+    идет прямо в пул urllib3, ответ не превращается в объекты
+    python-telegram-bot, число соединений задает pool_size. Прокси из
+    окружения выбирается один раз при создании, а не на каждый запрос.
+    """
+
+    def __init__(self, token, base_url=TELEGRAM_API_URL,
+                 pool_size=SEND_POOL_SIZE, timeout=SEND_TIMEOUT):
+        import urllib3
+        from urllib.request import getproxies, proxy_bypass
+
+        self.url = f'{base_url}/bot{token}/sendMessage'
+        self.pool_size = pool_size
+        scheme, _, rest = self.url.partition('://')
+        proxy = getproxies().get(scheme)
+        options = {'num_pools': 1, 'maxsize': pool_size, 'block': True,
+                   'timeout': urllib3.Timeout(total=timeout),
+                   'retries': False}
+        if proxy and not proxy_bypass(rest.split('/')[0]):
+            self.http = urllib3.ProxyManager(proxy, **options)
+        else:
+            self.http = urllib3.PoolManager(**options)
+        self._errors = urllib3.exceptions.HTTPError
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def send_message(self, chat_id, text, **params):
+        """Вызов sendMessage, возвращает result ответа Bot API."""
+        body = json.dumps({'chat_id': chat_id, 'text': text, **params})
+        try:
+            response = self.http.request(
+                'POST', self.url, body=body.encode(),
+                headers={'Content-Type': 'application/json'})
+        except self._errors as error:
+            raise BotApiError(str(error)) from error
+        return parse_reply(response.status, response.data)
+
+    def _send_or_error(self, message):
+        chat_id, text = message
+        try:
+            return self.send_message(chat_id, text)
+        except BotApiError as error:
+            return error
+
+    def send_many(self, messages):
+        """Отправка пар (chat_id, text) одновременно по соединениям пула.
+
+        Результаты возвращаются в порядке messages; ошибка сообщения
+        стоит на его месте и не прерывает отправку остальных.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.pool_size)
+        return list(self._executor.map(self._send_or_error, messages))
+
+    def close(self):
+        """Закрытие соединений и потоков send_many."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self.http.clear()
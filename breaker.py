@@ -0,0 +1,152 @@
+import random
+import threading
+import time
+from collections import Counter
+from http import HTTPStatus
+
+import metrics
+from exceptions import CircuitOpenError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 60
+BACKOFF_BASE = 30
+BACKOFF_CAP = 1800
+OUTAGE_STATUSES = frozenset((
+    HTTPStatus.TOO_MANY_REQUESTS,
+    HTTPStatus.INTERNAL_SERVER_ERROR,
+    HTTPStatus.BAD_GATEWAY,
+    HTTPStatus.SERVICE_UNAVAILABLE,
+    HTTPStatus.GATEWAY_TIMEOUT,
+))
+
+_installed = None
+
+
+class CircuitBreaker:
+    """Общий предохранитель для запросов к API: closed/open/half-open.
+
+    После failure_threshold сбоев подряд запросы не отправляются
+    reset_timeout секунд, затем пропускается один пробный запрос.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD,
+                 reset_timeout=RESET_TIMEOUT, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.transitions = Counter()
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _move(self, state):
+        self.transitions[f'{self.state}->{state}'] += 1
+        self.state = state
+
+    def retry_in(self):
+        """Сколько секунд предохранитель еще будет открыт."""
+        if self.state != OPEN:
+            return 0.0
+        return max(self.opened_at + self.reset_timeout - self.clock(), 0.0)
+
+    def check(self):
+        """Исключение CircuitOpenError, если запрос сейчас запрещен."""
+        with self._lock:
+            if self.state == OPEN and not self.retry_in():
+                self._move(HALF_OPEN)
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+        raise CircuitOpenError('API недоступен, запрос не отправлен')
+
+    def record_success(self):
+        """Успешный ответ закрывает предохранитель."""
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._move(CLOSED)
+
+    def record_failure(self):
+        """Сбой запроса; при превышении порога предохранитель открывается."""
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if (self.state == HALF_OPEN
+                    or self.failures >= self.failure_threshold
+                    and self.state == CLOSED):
+                self.opened_at = self.clock()
+                self._move(OPEN)
+
+    def record_status(self, status):
+        """Учет кода ответа: 429 и 5xx считаются сбоем API."""
+        if status in OUTAGE_STATUSES:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def call(self, func, *args, **kwargs):
+        """Вызов func под защитой предохранителя."""
+        self.check()
+        try:
+            response = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_status(getattr(response, 'status_code', None))
+        return response
+
+
+def install(breaker):
+    """Делает предохранитель общим для всех арендаторов."""
+    global _installed
+    _installed = breaker
+    return breaker
+
+
+def current():
+    """Установленный предохранитель или None."""
+    return _installed
+
+
+def call(func, *args, **kwargs):
+    """Вызов через общий предохранитель, если он установлен."""
+    if _installed is None:
+        return func(*args, **kwargs)
+    return _installed.call(func, *args, **kwargs)
+
+
+def backoff_delay(failures, base=BACKOFF_BASE, cap=BACKOFF_CAP,
+                  rand=random.random):
+    """Экспоненциальная задержка с разбросом после failures сбоев."""
+    return base + rand() * min(cap, base * 2 ** min(failures, 32))
+
+
+def next_delay(tenant, interval):
+    """Задержка до следующего опроса с учетом сбоев и предохранителя."""
+    if not tenant.failures:
+        return interval.next_interval(tenant)
+    delay = backoff_delay(tenant.failures)
+    if _installed is not None:
+        delay += _installed.retry_in()
+    return delay
+
+
+def _collect():
+    if _installed is None:
+        return []
+    samples = [('homework_breaker_open', {}, int(_installed.state != CLOSED))]
+    samples.extend(('homework_breaker_transitions', {'transition': name},
+                    count) for name, count in _installed.transitions.items())
+    return samples
+
+
+metrics.REGISTRY.collect('breaker', _collect)
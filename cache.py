@@ -0,0 +1,115 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+
+from exceptions import KirillTeleBotError
+
+CACHE_TTL = 60
+CACHE_MAX_ENTRIES = 10_000
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class CacheStats:
+    """Счетчики работы кэша."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def as_dict(self):
+        """Счетчики в виде словаря."""
+        return dict(vars(self))
+
+
+class ResponseCache:
+    """Кэш ответов API с TTL, вытеснением LRU и ограничением памяти.
+
+    Одновременные запросы одного ключа объединяются: к API уходит один
+    запрос, остальные ждут его результата.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES,
+                 max_bytes=CACHE_MAX_BYTES, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.size = 0
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._in_flight = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Значение из кэша или None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        expires, size, value = entry
+        if expires <= self.clock():
+            self._drop(key)
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def put(self, key, value, size=None):
+        """Сохранение значения; size - оценка занимаемой памяти в байтах."""
+        if size is None:
+            size = len(json.dumps(value, ensure_ascii=False))
+        if key in self._entries:
+            self._drop(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (self.clock() + self.ttl, size, value)
+        self.size += size
+        while (len(self._entries) > self.max_entries
+               or self.size > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.stats.evictions += 1
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+    async def get_or_fetch(self, key, fetch):
+        """Значение из кэша или результат одного общего вызова fetch().
+
+        Если вызов, который выполняет fetch(), отменен, ожидающие его
+        получают KirillTeleBotError, а не висят на незавершенном future.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.stats.coalesced += 1
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await fetch()
+        except Exception as error:
+            future.set_exception(error)
+            future.exception()
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            del self._in_flight[key]
+            if not future.done():
+                future.set_exception(
+                    KirillTeleBotError('Запрос к API отменен'))
+                future.exception()
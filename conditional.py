@@ -0,0 +1,117 @@
+import hashlib
+import re
+import time
+from http import HTTPStatus
+
+import metrics
+
+CURRENT_DATE_PATTERN = re.compile(rb'"current_date"\s*:\s*(\d+)')
+
+
+class NotModified:
+    """Ответ API не изменился с прошлого опроса арендатора."""
+
+    def __init__(self, current_date=None):
+        self.current_date = current_date
+
+    def __repr__(self):
+        return f'NotModified(current_date={self.current_date!r})'
+
+
+class ConditionalStats:
+    """Счетчики сэкономленных байтов и времени разбора JSON."""
+
+    def __init__(self):
+        self.not_modified = 0
+        self.identical = 0
+        self.bytes_saved = 0
+        self.decoded = 0
+        self.decoded_bytes = 0
+        self.decode_seconds = 0.0
+
+    @property
+    def decode_seconds_saved(self):
+        """Оценка времени json(), которое не пришлось тратить."""
+        if not self.decoded_bytes:
+            return 0.0
+        return self.bytes_saved * self.decode_seconds / self.decoded_bytes
+
+    def as_dict(self):
+        """Счетчики в виде словаря."""
+        return {
+            'not_modified': self.not_modified,
+            'identical': self.identical,
+            'bytes_saved': self.bytes_saved,
+            'decode_seconds_saved': self.decode_seconds_saved,
+        }
+
+
+STATS = ConditionalStats()
+metrics.REGISTRY.collect('conditional', lambda: [
+    (f'homework_conditional_{key}', {}, value)
+    for key, value in STATS.as_dict().items()])
+
+
+def body_digest(body):
+    """Хэш тела ответа без постоянно меняющегося current_date."""
+    return hashlib.blake2b(CURRENT_DATE_PATTERN.sub(b'', body),
+                           digest_size=16).digest()
+
+
+def request_headers(tenant):
+    """Заголовки запроса с валидаторами последнего ответа."""
+    headers = dict(tenant.headers)
+    if tenant.etag:
+        headers['If-None-Match'] = tenant.etag
+    if tenant.last_modified:
+        headers['If-Modified-Since'] = tenant.last_modified
+    return headers
+
+
+def check(tenant, status, headers, body, stats=STATS):
+    """NotModified для 304 и тела, совпавшего с прошлым, иначе None.
+
+    Валидаторы ответа только откладываются в tenant.validators: commit()
+    запоминает их после того, как ответ обработан без ошибок. Иначе ответ,
+    на котором разбор упал, при повторе пришел бы как NotModified.
+    """
+    tenant.validators = None
+    if status == HTTPStatus.NOT_MODIFIED:
+        stats.not_modified += 1
+        stats.bytes_saved += tenant.body_size
+        return NotModified()
+    if status != HTTPStatus.OK:
+        return None
+    digest, size = tenant.body_hash, tenant.body_size
+    not_modified = None
+    if body is not None:
+        digest = body_digest(body)
+        if digest == tenant.body_hash:
+            stats.identical += 1
+            stats.bytes_saved += len(body)
+            match = CURRENT_DATE_PATTERN.search(body)
+            not_modified = NotModified(int(match[1]) if match else None)
+        size = len(body)
+    tenant.validators = (headers.get('ETag'), headers.get('Last-Modified'),
+                         digest, size)
+    return not_modified
+
+
+def commit(tenant):
+    """Запоминание валидаторов ответа, обработанного без ошибок."""
+    if tenant.validators:
+        (tenant.etag, tenant.last_modified,
+         tenant.body_hash, tenant.body_size) = tenant.validators
+        tenant.validators = None
+
+
+def decode(loader, size, stats=STATS):
+    """Разбор JSON с учетом затраченного времени."""
+    started = time.perf_counter()
+    data = loader()
+    elapsed = time.perf_counter() - started
+    metrics.DECODE_LATENCY.observe(elapsed)
+    stats.decode_seconds += elapsed
+    stats.decoded += 1
+    stats.decoded_bytes += size
+    return data
@@ -0,0 +1,36 @@
+import metrics
+from exceptions import WrongKeyHw
+from models import Status
+
+
+def homework_key(homework):
+    """Ключ домашней работы: id, а без него - homework_name."""
+    key = homework.get('id')
+    if key is not None:
+        return str(key)
+    name = homework.get('homework_name')
+    if not name:
+        metrics.WRONG_KEY.inc('homework_key')
+        raise WrongKeyHw('В ответе API нет ключа "homework_name"')
+    return name
+
+
+def transitions(statuses, homeworks, errors=None):
+    """Пары (ключ, работа) для работ со статусом, отличным от statuses.
+
+    API отдает работы начиная с новых, события возвращаются в порядке
+    их наступления. statuses не меняется: вызывающий код обновляет его
+    после успешной обработки каждого события. Работа без ключа
+    пропускается, ее WrongKeyHw добавляется в errors.
+    """
+    changed = []
+    for homework in reversed(homeworks):
+        try:
+            key = homework_key(homework)
+        except WrongKeyHw as error:
+            if errors is not None:
+                errors.append(error)
+            continue
+        if statuses.get(key) != Status.parse(homework.get('status')):
+            changed.append((key, homework))
+    return changed
@@ -0,0 +1,105 @@
+import heapq
+import itertools
+import os
+import time
+
+DIGEST_WINDOW = float(os.getenv('DIGEST_WINDOW', 0))
+DIGEST_MAX_DELAY = float(os.getenv('DIGEST_MAX_DELAY', 60))
+MESSAGE_LIMIT = 4096
+SEPARATOR = '\n'
+
+
+def join(texts, limit=MESSAGE_LIMIT):
+    """Склейка текстов в сообщения не длиннее limit символов."""
+    messages = []
+    current = ''
+    for text in texts:
+        if current and len(current) + len(SEPARATOR) + len(text) > limit:
+            messages.append(current)
+            current = ''
+        current = current + SEPARATOR + text if current else text
+    if current:
+        messages.append(current)
+    return messages
+
+
+class Coalescer:
+    """Объединение уведомлений одного чата в сводку.
+
+    Сообщение чата ждет window секунд: пришедшее за это время следующее
+    сообщение продлевает ожидание, но не дольше max_delay от первого.
+    Потом накопленное уходит одним сообщением (или несколькими, если не
+    помещается в MESSAGE_LIMIT). Окно отдельного чата задает
+    set_window(); окно 0 - отправка без ожидания.
+    """
+
+    def __init__(self, window=DIGEST_WINDOW, max_delay=DIGEST_MAX_DELAY,
+                 limit=MESSAGE_LIMIT, clock=time.monotonic):
+        self.window = window
+        self.max_delay = max_delay
+        self.limit = limit
+        self.clock = clock
+        self.windows = {}
+        self.merged = 0
+        self._pending = {}
+        self._heap = []
+        self._counter = itertools.count()
+
+    def set_window(self, chat_id, window):
+        """Окно чата вместо общего, None возвращает общее."""
+        if window is None:
+            self.windows.pop(chat_id, None)
+        else:
+            self.windows[chat_id] = window
+
+    def add(self, chat_id, text, now=None):
+        """Сообщение в сводку чата, возвращает время ее отправки."""
+        now = self.clock() if now is None else now
+        window = self.windows.get(chat_id, self.window)
+        pending = self._pending.get(chat_id)
+        if pending is None:
+            pending = self._pending[chat_id] = [now, None, []]
+        first, _, texts = pending
+        texts.append(text)
+        pending[1] = min(now + window, first + self.max_delay)
+        heapq.heappush(self._heap,
+                       (pending[1], next(self._counter), chat_id))
+        return pending[1]
+
+    def __len__(self):
+        return len(self._pending)
+
+    def next_due(self):
+        """Время ближайшей отправки сводки или None."""
+        while self._heap:
+            due, _, chat_id = self._heap[0]
+            pending = self._pending.get(chat_id)
+            if pending is not None and pending[1] == due:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now=None):
+        """Пары (chat_id, текст) для сводок, время которых подошло."""
+        now = self.clock() if now is None else now
+        ready = []
+        while True:
+            due = self.next_due()
+            if due is None or due > now:
+                return ready
+            _, _, chat_id = heapq.heappop(self._heap)
+            ready.extend(self._release(chat_id))
+
+    def pop_all(self):
+        """Все накопленные сводки без ожидания."""
+        ready = []
+        for chat_id in list(self._pending):
+            ready.extend(self._release(chat_id))
+        self._heap.clear()
+        return ready
+
+    def _release(self, chat_id):
+        texts = self._pending.pop(chat_id)[2]
+        messages = join(texts, self.limit)
+        self.merged += len(texts) - len(messages)
+        return [(chat_id, text) for text in messages]
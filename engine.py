@@ -0,0 +1,278 @@
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import breaker
+import digest
+import homework
+import http_pool
+import leases
+import logs
+import metrics
+from botapi import BotClient
+from intervals import AdaptiveInterval
+from ratelimit import QueuedBot, SendQueue
+from scheduler import Scheduler
+from storage import MemoryStore, open_store
+from tenants import Tenant, TenantRegistry
+
+TENANTS_FILE = os.getenv('TENANTS_FILE', 'tenants.json')
+POLL_WORKERS = int(os.getenv('POLL_WORKERS', 64))
+STATE_DB = os.getenv('STATE_DB', 'sqlite:///state.sqlite3')
+LEASE_DB = os.getenv('LEASE_DB', STATE_DB)
+OUTBOX_DIR = os.getenv('OUTBOX_DIR')
+TICK_PERIOD = 1
+
+
+class Engine:
+    """Опрос множества арендаторов из одного процесса."""
+
+    def __init__(self, bot, registry, workers=POLL_WORKERS, interval=None,
+                 store=None, leases=None):
+        self.bot = bot
+        self.registry = registry
+        self.leases = leases
+        self.interval = interval or AdaptiveInterval()
+        self.store = store or MemoryStore()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.scheduler = Scheduler()
+        self._lock = threading.Lock()
+        metrics.REGISTRY.collect('scheduler', lambda: [
+            ('homework_scheduler_queue_depth', {}, len(self.scheduler)),
+            ('homework_tenants', {}, len(self.registry))])
+        for tenant in registry:
+            self.store.load(tenant)
+            registry.index(tenant)
+            self.scheduler.schedule(tenant.token, tenant.next_poll, tenant)
+
+    def add(self, tenant):
+        """Добавление арендатора на ходу."""
+        self.store.load(tenant)
+        self.registry.add(tenant)
+        with self._lock:
+            self.scheduler.schedule(tenant.token, tenant.next_poll, tenant)
+
+    def remove(self, token):
+        """Удаление арендатора и его запланированного опроса."""
+        with self._lock:
+            self.scheduler.cancel(token)
+        return self.registry.remove(token)
+
+    def poll(self, tenant):
+        """Опрос одного арендатора в рабочем потоке.
+
+        Если задан leases, арендатор опрашивается, только пока узел
+        уверенно владеет его разделом.
+        """
+        try:
+            if self.leases is None or self.leases.holds(tenant.token):
+                homework.poll_tenant(self.bot, tenant)
+        finally:
+            delay = breaker.next_delay(tenant, self.interval)
+            tenant.next_poll = time.monotonic() + delay
+            tenant.due_at = time.time() + delay
+            self.store.save(tenant)
+            if tenant.token in self.registry:
+                with self._lock:
+                    self.scheduler.schedule(tenant.token, tenant.next_poll,
+                                            tenant)
+
+    def tick(self, now=None):
+        """Отправка в пул всех арендаторов, у которых подошел срок."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tenants = self.scheduler.pop_due(now)
+        for tenant in tenants:
+            self.executor.submit(self.poll, tenant)
+        return len(tenants)
+
+    def poll_due(self, now=None):
+        """Однократный опрос арендаторов, срок которых подошел.
+
+        Срок берется из сохраненного due_at, поэтому запуски по cron
+        соблюдают адаптивный интервал между опросами. Возвращает число
+        опрошенных арендаторов.
+        """
+        now = time.time() if now is None else now
+        due = [tenant for tenant in self.registry if tenant.due_at <= now]
+        for future in wait([self.executor.submit(self.poll, tenant)
+                            for tenant in due]).done:
+            future.result()
+        return len(due)
+
+    def sleep_time(self):
+        """Время до ближайшего срока, но не больше TICK_PERIOD."""
+        with self._lock:
+            due = self.scheduler.next_due()
+        if due is None:
+            return TICK_PERIOD
+        return min(max(due - time.monotonic(), 0), TICK_PERIOD)
+
+    def run(self):
+        """Бесконечный цикл планировщика."""
+        while True:
+            self.tick()
+            self.store.flush_if_due()
+            time.sleep(self.sleep_time())
+
+    def shutdown(self):
+        """Ожидание завершения начатых опросов и запись состояния."""
+        self.executor.shutdown(wait=True)
+        self.store.flush()
+
+
+def load_registry():
+    """Реестр из TENANTS_FILE и пары из переменных окружения."""
+    registry = TenantRegistry()
+    if os.path.exists(TENANTS_FILE):
+        registry = TenantRegistry.load(TENANTS_FILE)
+    if homework.PRACTICUM_TOKEN and homework.TELEGRAM_CHAT_ID:
+        registry.add(Tenant(homework.PRACTICUM_TOKEN,
+                            homework.TELEGRAM_CHAT_ID))
+    return registry
+
+
+def make_queue():
+    """Запущенная очередь отправки, со сводками при DIGEST_WINDOW."""
+    coalescer = digest.Coalescer() if digest.DIGEST_WINDOW else None
+    return SendQueue(BotClient(homework.TELEGRAM_TOKEN),
+                     coalescer=coalescer).start()
+
+
+def make_sender():
+    """Бот для Engine и функция, останавливающая отправку.
+
+    При OUTBOX_DIR сообщения сначала пишутся в outbox на диске и
+    отправляются фоновыми потоками с теми же лимитами и приоритетами,
+    что в SendQueue, иначе идут через SendQueue. Сводок DIGEST_WINDOW
+    outbox не делает, main() не запускается с обеими настройками.
+    """
+    if not OUTBOX_DIR:
+        queue = make_queue()
+        return QueuedBot(queue), queue.stop
+    import outbox
+
+    box = outbox.Outbox(OUTBOX_DIR)
+    drainer = outbox.Drainer(box, BotClient(homework.TELEGRAM_TOKEN)).start()
+
+    def stop():
+        drainer.stop()
+        box.close()
+
+    return outbox.OutboxBot(box), stop
+
+
+def run_once(registry):
+    """Один проход для cron и бессерверных запусков.
+
+    Опрашиваются только арендаторы с подошедшим сроком; до выхода
+    дожидается отправка сообщений и запись состояния.
+    """
+    bot, stop = make_sender()
+    runner = Engine(bot, registry, store=open_store(STATE_DB))
+    try:
+        polled = runner.poll_due()
+    finally:
+        runner.shutdown()
+        stop()
+    logging.info(f'Опрошено {polled} из {len(registry)} арендаторов')
+    return polled
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки."""
+    parser = argparse.ArgumentParser(description='Опрос API домашек.')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='опрос в одном цикле событий asyncio')
+    parser.add_argument('--webhook', action='store_true',
+                        help='принимать команды Telegram через webhook '
+                             'на порту PORT (включает --async)')
+    parser.add_argument('--processes', type=int, default=0,
+                        help='распределить арендаторов по N процессам '
+                             'по хэшу токена (0 - один процесс)')
+    parser.add_argument('--node-id',
+                        help='имя узла: опрашивать только арендованные '
+                             'разделы арендаторов из LEASE_DB')
+    parser.add_argument('--once', action='store_true',
+                        help='опросить арендаторов, срок которых подошел, '
+                             'и выйти')
+    return parser.parse_args(argv)
+
+
+def main():
+    """Запуск многопользовательского опроса."""
+    args = parse_args()
+    registry = load_registry()
+    if not homework.TELEGRAM_TOKEN or not (registry or args.webhook):
+        message = 'Нет TELEGRAM_TOKEN или ни одного арендатора'
+        logging.critical(message)
+        sys.exit(message)
+    if args.webhook and not os.getenv('WEBHOOK_SECRET'):
+        message = 'Для --webhook нужен WEBHOOK_SECRET'
+        logging.critical(message)
+        sys.exit(message)
+    if OUTBOX_DIR and digest.DIGEST_WINDOW:
+        message = ('OUTBOX_DIR и DIGEST_WINDOW несовместимы: outbox '
+                   'подтверждает доставку каждого сообщения отдельно')
+        logging.critical(message)
+        sys.exit(message)
+    if OUTBOX_DIR and (args.use_async or args.webhook or args.processes):
+        logging.warning('OUTBOX_DIR используется только без --async, '
+                        '--webhook и --processes')
+    logging.info(f'Запущен опрос {len(registry)} арендаторов')
+    if args.once:
+        run_once(registry)
+        return
+    if args.processes:
+        import sharding
+
+        supervisor = sharding.Supervisor(
+            [tenant.spec() for tenant in registry],
+            workers=args.processes, store_url=STATE_DB)
+        try:
+            supervisor.run()
+        finally:
+            supervisor.shutdown()
+        return
+    if metrics.METRICS_PORT:
+        metrics.serve(metrics.METRICS_PORT)
+    http_pool.install(http_pool.HttpPool(per_host=POLL_WORKERS))
+    breaker.install(breaker.CircuitBreaker())
+    store = open_store(STATE_DB)
+    if args.use_async or args.webhook:
+        import asyncio
+
+        import aio
+        import webhook
+
+        asyncio.run(aio.run_engine(
+            registry, homework.TELEGRAM_TOKEN, store,
+            webhook_port=webhook.WEBHOOK_PORT if args.webhook else None))
+        return
+    bot, stop = make_sender()
+    if not args.node_id:
+        try:
+            Engine(bot, registry, store=store).run()
+        finally:
+            stop()
+        return
+    manager = leases.LeaseManager(leases.open_leases(LEASE_DB), args.node_id)
+    runner = Engine(bot, TenantRegistry(), store=store, leases=manager)
+    coordinator = leases.Coordinator(
+        runner, manager,
+        [tenant.spec() for tenant in registry]).start()
+    try:
+        runner.run()
+    finally:
+        coordinator.stop()
+        runner.shutdown()
+        stop()
+
+
+if __name__ == '__main__':
+    logs.setup()
+    main()
@@ -7,8 +7,23 @@ class HTTPError(KirillTeleBotError):
 
 
 class HttpResponseNotOkError(KirillTeleBotError):
-    pass
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
 
 
 class WrongKeyHw(KirillTeleBotError):
     pass
+
+
+class CircuitOpenError(KirillTeleBotError):
+    pass
+
+
+class BotApiError(KirillTeleBotError):
+
+    def __init__(self, message, error_code=None, retry_after=None):
+        super().__init__(message)
+        self.error_code = error_code
+        self.retry_after = retry_after
@@ -2,30 +2,63 @@ import logging
 import os
 import sys
 import time
-import copy
 from http import HTTPStatus
 
-import requests
-import telegram
-from dotenv import load_dotenv
-from exceptions import KirillTeleBotError, HttpResponseNotOkError, WrongKeyHw
+import breaker
+import conditional
+import http_pool
+import metrics
+import stream
+from messages import HOMEWORK_VERDICTS, TEMPLATES  # noqa: F401
+from diff import transitions
+from exceptions import (BotApiError, CircuitOpenError, KirillTeleBotError,
+                        HttpResponseNotOkError, WrongKeyHw)
+from models import Notification, Status, event_key
+from storage import open_store
+from tenants import Tenant, current_tenant, use_tenant
 
-load_dotenv()
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_env():
+    """Чтение .env, если он есть.
+
+    python-dotenv импортируется только при наличии файла: на Heroku и в
+    cron переменные окружения заданы напрямую.
+    """
+    if any(os.path.exists(path) for path in
+           ('.env', os.path.join(BASE_DIR, '.env'))):
+        from dotenv import load_dotenv
+
+        load_dotenv()
+
+
+def loaded_errors(module, name):
+    """Кортеж для except с исключением из уже импортированного модуля.
+
+    Если модуль не импортирован, его исключение возникнуть не могло, и
+    ради except импортировать его не нужно.
+    """
+    loaded = sys.modules.get(module)
+    return (getattr(loaded, name),) if loaded else ()
+
+
+load_env()
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
+STATE_DB = os.getenv('STATE_DB')
+STREAM_RESPONSES = os.getenv('STREAM_RESPONSES') == '1'
+
 RETRY_PERIOD = 600
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 
 
-HOMEWORK_VERDICTS = {
-    'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
-    'reviewing': 'Работа взята на проверку ревьюером.',
-    'rejected': 'Работа проверена: у ревьюера есть замечания.'
-}
+NOT_ACCEPTED_MESSAGE = TEMPLATES.not_accepted()
+ERROR_MESSAGE = 'Сбой в работе программы: {}'
 
 
 def check_tokens():
@@ -34,27 +67,115 @@ def check_tokens():
 
 
 def send_message(bot, message):
-    """Отправка сообщений."""
+    """Отправка сообщений.
+
+    Сообщение арендатора уходит его чату и всем подписчикам; бот с
+    send_many получает их одним пакетом.
+    """
+    tenant = current_tenant()
+    chats = tenant.chats if tenant else (TELEGRAM_CHAT_ID,)
+    if len(chats) > 1 and hasattr(bot, 'send_many'):
+        _send_many(bot, chats, message)
+        return
+    for chat_id in chats:
+        _send_one(bot, chat_id, message)
+
+
+def _send_one(bot, chat_id, message):
     try:
-        bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
-        logging.debug(f'send_message: Бот отправил сообщение: {message}')
-    except telegram.error.TelegramError:
-        logging.error('send_message: Сообщение с текстом'
-                      f'{message} не отправленно')
+        started = time.perf_counter()
+        bot.send_message(chat_id=chat_id, text=message)
+        elapsed = time.perf_counter() - started
+        if not getattr(bot, 'deferred', False):
+            metrics.SEND_LATENCY.observe(elapsed)
+        logging.debug('send_message: Бот отправил сообщение: %s', message,
+                      extra={'send_latency': elapsed})
+    except (BotApiError, *loaded_errors('telegram.error', 'TelegramError')):
+        logging.error('send_message: Сообщение с текстом%s не отправленно',
+                      message)
 
 
-def get_api_answer(timestamp: int = int(time.time())):
-    """Получение ответа от API."""
+def _send_many(bot, chats, message):
+    started = time.perf_counter()
+    results = bot.send_many([(chat_id, message) for chat_id in chats])
+    elapsed = time.perf_counter() - started
+    if not getattr(bot, 'deferred', False):
+        metrics.SEND_LATENCY.observe(elapsed)
+    failed = [chat_id for chat_id, result in zip(chats, results)
+              if isinstance(result, Exception)]
+    if failed:
+        logging.error('send_message: Сообщение с текстом%s не отправленно '
+                      'в чаты %s', message, failed)
+    logging.debug('send_message: Бот отправил сообщение в %s чатов: %s',
+                  len(chats) - len(failed), message,
+                  extra={'send_latency': elapsed})
+
+
+def _request(tenant, timestamp, **kwargs):
+    headers = conditional.request_headers(tenant) if tenant else HEADERS
     payload = {'from_date': timestamp}
+    started = time.perf_counter()
     try:
-        response = requests.get(ENDPOINT, headers=HEADERS, params=payload)
-    except requests.RequestException as error:
+        response = breaker.call(http_pool.get, ENDPOINT, headers=headers,
+                                params=payload, **kwargs)
+    except loaded_errors('requests', 'RequestException') as error:
+        metrics.API_LATENCY.observe(time.perf_counter() - started)
         raise KirillTeleBotError(error)
+    elapsed = time.perf_counter() - started
+    metrics.API_LATENCY.observe(elapsed)
+    logging.debug('get_api_answer: код ответа %s', response.status_code,
+                  extra={'api_latency': elapsed})
+    return response
+
+
+def _check_status(tenant, response, body):
+    if tenant:
+        not_modified = conditional.check(
+            tenant, response.status_code,
+            getattr(response, 'headers', {}), body)
+        if not_modified:
+            return not_modified
     if response.status_code != HTTPStatus.OK:
         logging.error(f'{ENDPOINT}, не передает данные')
+        metrics.API_ERRORS.inc(response.status_code)
         raise HttpResponseNotOkError(
-            f'Код ошибки: {response.status_code}')
-    return response.json()
+            f'Код ошибки: {response.status_code}', response.status_code)
+    return None
+
+
+def get_api_answer(timestamp: int = int(time.time())):
+    """Получение ответа от API."""
+    tenant = current_tenant()
+    response = _request(tenant, timestamp)
+    body = getattr(response, 'content', None)
+    not_modified = _check_status(tenant, response, body)
+    if not_modified:
+        return not_modified
+    return conditional.decode(response.json, len(body or b''))
+
+
+def get_api_answer_stream(timestamp, cursor=0.0):
+    """Получение ответа от API с потоковым разбором.
+
+    Работы сжимаются до нужных полей, работы старше cursor не
+    разбираются, тело целиком в памяти не держится.
+    """
+    tenant = current_tenant()
+    requested = time.time()
+    response = _request(tenant, timestamp, stream=True)
+    try:
+        not_modified = _check_status(tenant, response, None)
+        if not_modified:
+            return not_modified
+        started = time.perf_counter()
+        answer, _ = stream.parse_chunks(
+            response.iter_content(stream.CHUNK_SIZE), cursor,
+            stream.fallback_date(getattr(response, 'headers', {}),
+                                 requested))
+        metrics.DECODE_LATENCY.observe(time.perf_counter() - started)
+        return answer
+    finally:
+        response.close()
 
 
 def check_response(response):
@@ -75,15 +196,119 @@ def parse_status(homework):
     if not homework_name:
         error_message = 'В ответе API нет ключа "homework_name"'
         logging.error(error_message)
+        metrics.WRONG_KEY.inc('homework_name')
         raise WrongKeyHw(error_message)
-    status = homework.get('status')
-    verdict = HOMEWORK_VERDICTS.get(status)
-    if not verdict:
-        logging.error(f'Неожиданный статус {status} домашней работы'
-                      f'{homework_name}, обнаруженный в ответе API')
+    status = Status.parse(homework.get('status'))
+    if not TEMPLATES.knows(status):
+        logging.error('Неожиданный статус %s домашней работы%s, '
+                      'обнаруженный в ответе API', status, homework_name)
+        metrics.WRONG_KEY.inc('status')
         raise WrongKeyHw('Неожиданный статус домашней работы'
                          'обнаруженный в ответе API')
-    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+    tenant = current_tenant()
+    return TEMPLATES.render(homework_name, status,
+                            tenant.locale if tenant else None)
+
+
+def _apply_transitions(tenant, homeworks):
+    """Уведомления о сменах статусов и ошибки отдельных работ."""
+    messages = []
+    errors = []
+    for key, homework in transitions(tenant.statuses, homeworks, errors):
+        try:
+            text = parse_status(homework)
+        except WrongKeyHw as error:
+            errors.append(error)
+            continue
+        messages.append(Notification(text,
+                                     event_key(tenant.token, key, homework)))
+        tenant.statuses[key] = tenant.last_status = Status.parse(
+            homework.get('status'))
+        tenant.last_change = time.time()
+        updated = stream.parse_date(homework.get('date_updated'))
+        if updated:
+            tenant.cursor = max(tenant.cursor, updated)
+    return messages, errors
+
+
+def process_response(tenant, response):
+    """Обновление состояния арендатора, возвращает тексты для отправки.
+
+    Работа с неизвестным статусом или без ключа не мешает остальным: их
+    уведомления отправляются, а о ней сообщается ошибкой. Ответ при этом
+    считается обработанным: current_date запоминается, и работа
+    вернется, только когда у нее сменится статус. Сбоем опроса это не
+    считается, интервал опроса не сокращается. Валидаторы ответа
+    запоминаются только здесь, после обработки.
+    """
+    if isinstance(response, conditional.NotModified):
+        logging.debug('нет новых статусов')
+        if response.current_date:
+            tenant.timestamp = response.current_date
+        tenant.failures = 0
+        conditional.commit(tenant)
+        return []
+    homeworks = check_response(response)
+    messages, errors = _apply_transitions(tenant, homeworks)
+    tenant.failures = 0
+    not_accepted = TEMPLATES.not_accepted(tenant.locale)
+    if (not homeworks and not tenant.statuses
+            and tenant.last_message != not_accepted):
+        messages.append(not_accepted)
+    if messages:
+        tenant.last_message = messages[-1]
+    else:
+        logging.debug('нет новых статусов')
+    tenant.timestamp = response.get('current_date') or tenant.timestamp
+    conditional.commit(tenant)
+    for error in errors:
+        logging.error('Работа пропущена: %s', error)
+        message = error_notice(tenant, error)
+        if message:
+            messages.append(message)
+    return [] if tenant.muted else messages
+
+
+def error_notice(tenant, error):
+    """Текст ошибки для отправки, если он отличается от предыдущего."""
+    message = ERROR_MESSAGE.format(error)
+    if message == tenant.old_error_message:
+        return None
+    tenant.old_error_message = message
+    return None if tenant.muted else message
+
+
+def process_error(tenant, error):
+    """Учет сбоя опроса и текст ошибки для отправки.
+
+    Открытый предохранитель увеличивает счетчик неудач для отсрочки
+    опроса, но не рассылается: об одном сбое API иначе узнали бы все
+    арендаторы разом.
+    """
+    tenant.failures += 1
+    if isinstance(error, CircuitOpenError):
+        logging.warning('Опрос пропущен: %s', error)
+        return None
+    logging.exception(ERROR_MESSAGE.format(error))
+    return error_notice(tenant, error)
+
+
+def poll_tenant(bot, tenant):
+    """Один цикл опроса API и уведомления для арендатора."""
+    tenant.polls += 1
+    with use_tenant(tenant):
+        try:
+            if STREAM_RESPONSES:
+                response = get_api_answer_stream(tenant.timestamp,
+                                                 tenant.cursor)
+            else:
+                response = get_api_answer(tenant.timestamp)
+            messages = process_response(tenant, response)
+        except Exception as error:
+            message = process_error(tenant, error)
+            messages = [message] if message else []
+        for message in messages:
+            send_message(bot, message)
 
 
 def main():
@@ -92,33 +317,19 @@ def main():
         message = 'Отсутствуют обязательные переменные окружения'
         logging.critical(message)
         sys.exit(message)
+    import telegram
+
     bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    cur_status = {"hw_name": "", "message": ""}
-    prev_status = {"hw_name": "", "message": ""}
-    timestamp = int(time.time())
-    old_error_message = None
+    tenant = Tenant(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)
+    store = open_store(STATE_DB) if STATE_DB else None
+    if store:
+        store.load(tenant)
     while True:
-        try:
-            response = get_api_answer(timestamp)
-            homeworks = check_response(response)
-            if homeworks:
-                cur_status["hw_name"] = homeworks[0]["homework_name"]
-                cur_status["message"] = parse_status(homeworks[0])
-            else:
-                cur_status["message"] = "Не принята ревьюером"
-            if cur_status != prev_status:
-                send_message(bot, cur_status["message"])
-                prev_status = copy.deepcopy(cur_status)
-            else:
-                logging.debug('нет новых статусов')
-                timestamp = response.get('current_date')
-        except Exception as error:
-            logging.exception('Сбой в работе программы:', error)
-            if message != old_error_message:
-                send_message(bot, message)
-                old_error_message = message
-        finally:
-            time.sleep(RETRY_PERIOD)
+        poll_tenant(bot, tenant)
+        if store:
+            store.save(tenant)
+            store.flush()
+        time.sleep(RETRY_PERIOD)
 
 
 if __name__ == '__main__':
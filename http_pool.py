@@ -0,0 +1,108 @@
+import os
+
+import metrics
+
+POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 100))
+POOL_PER_HOST = int(os.getenv('HTTP_POOL_PER_HOST', 64))
+KEEPALIVE_TIMEOUT = 30
+REQUEST_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 10))
+
+_installed = None
+
+
+class HttpPool:
+    """Общий пул keep-alive соединений для запросов к API."""
+
+    def __init__(self, size=POOL_SIZE, per_host=POOL_PER_HOST,
+                 keepalive=KEEPALIVE_TIMEOUT, block=True,
+                 timeout=REQUEST_TIMEOUT):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.size = size
+        self.per_host = per_host
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.adapter = HTTPAdapter(pool_connections=size,
+                                   pool_maxsize=per_host, pool_block=block)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.async_created = 0
+        self.async_reused = 0
+
+    def get(self, url, **kwargs):
+        """GET-запрос через пул, по умолчанию с таймаутом timeout."""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def async_session(self):
+        """Сессия aiohttp с теми же лимитами и счетчиками."""
+        import aiohttp
+
+        async def on_create(session, context, params):
+            self.async_created += 1
+
+        async def on_reuse(session, context, params):
+            self.async_reused += 1
+
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(on_create)
+        trace.on_connection_reuseconn.append(on_reuse)
+        connector = aiohttp.TCPConnector(limit=self.size,
+                                         limit_per_host=self.per_host,
+                                         keepalive_timeout=self.keepalive)
+        return aiohttp.ClientSession(
+            connector=connector, trace_configs=[trace],
+            timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    def stats(self):
+        """Счетчики попаданий в пул и повторного использования."""
+        manager = self.adapter.poolmanager
+        created = sent = 0
+        for key in manager.pools.keys():
+            pool = manager.pools.get(key)
+            if pool is not None:
+                created += pool.num_connections
+                sent += pool.num_requests
+        return {
+            'requests': sent + self.async_created + self.async_reused,
+            'misses': created + self.async_created,
+            'hits': max(sent - created, 0) + self.async_reused,
+        }
+
+    def close(self):
+        """Закрытие всех соединений."""
+        self.session.close()
+
+
+def install(pool):
+    """Делает пул общим для get_api_answer и движков опроса."""
+    global _installed
+    _installed = pool
+    return pool
+
+
+def current():
+    """Установленный пул или None."""
+    return _installed
+
+
+def get(url, **kwargs):
+    """GET через общий пул, без пула - через requests.get."""
+    if _installed is None:
+        import requests
+
+        kwargs.setdefault('timeout', REQUEST_TIMEOUT)
+        return requests.get(url, **kwargs)
+    return _installed.get(url, **kwargs)
+
+
+def _collect():
+    if _installed is None:
+        return []
+    return [(f'homework_http_pool_{key}', {}, value)
+            for key, value in _installed.stats().items()]
+
+
+metrics.REGISTRY.collect('http_pool', _collect)
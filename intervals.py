@@ -0,0 +1,59 @@
+import random
+import time
+
+from models import Status
+
+MIN_INTERVAL = 60
+MAX_INTERVAL = 3 * 60 * 60
+JITTER = 0.1
+BASE_INTERVALS = {
+    Status.REVIEWING: 300,
+    Status.REJECTED: 900,
+    Status.APPROVED: 3600,
+}
+DEFAULT_INTERVAL = 600
+STALE_PERIOD = 24 * 60 * 60
+NIGHT_HOURS = range(1, 7)
+NIGHT_FACTOR = 3
+
+
+class FixedInterval:
+    """Постоянный период опроса, как RETRY_PERIOD в main()."""
+
+    def __init__(self, period):
+        self.period = period
+
+    def next_interval(self, tenant, now=None):
+        """Период до следующего опроса."""
+        return self.period
+
+
+class AdaptiveInterval:
+    """Период опроса по последнему вердикту, давности изменения и часу."""
+
+    def __init__(self, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                 jitter=JITTER, night_hours=NIGHT_HOURS,
+                 night_factor=NIGHT_FACTOR, rand=random.random):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.night_hours = night_hours
+        self.night_factor = night_factor
+        self.rand = rand
+
+    def base(self, tenant, now):
+        """Период без учета границ и разброса."""
+        status = Status.parse(tenant.last_status)
+        interval = BASE_INTERVALS.get(status, DEFAULT_INTERVAL)
+        if status != Status.REVIEWING and tenant.last_change:
+            interval *= 1 + (now - tenant.last_change) / STALE_PERIOD
+        if time.localtime(now).tm_hour in self.night_hours:
+            interval *= self.night_factor
+        return interval
+
+    def next_interval(self, tenant, now=None):
+        """Период до следующего опроса с разбросом и границами."""
+        now = time.time() if now is None else now
+        interval = self.base(tenant, now)
+        interval *= 1 + self.jitter * (2 * self.rand() - 1)
+        return min(max(interval, self.min_interval), self.max_interval)
@@ -0,0 +1,322 @@
+import hashlib
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from tenants import Tenant
+
+PARTITIONS = 64
+LEASE_TTL = 30
+
+
+def partition_of(token, partitions=PARTITIONS):
+    """Номер раздела, которому принадлежит токен."""
+    digest = hashlib.md5(token.encode()).digest()
+    return int.from_bytes(digest[:8], 'big') % partitions
+
+
+class LeaseStore:
+    """Общее для всех узлов хранилище аренды разделов.
+
+    Время везде - time.time(), чтобы сроки были сравнимы между
+    процессами и машинами.
+    """
+
+    def heartbeat(self, node, expires):
+        """Отметка, что узел жив до expires."""
+        raise NotImplementedError
+
+    def live_nodes(self, now):
+        """Узлы с неистекшей отметкой."""
+        raise NotImplementedError
+
+    def owners(self, now):
+        """Разделы с действующей арендой и их владельцы."""
+        raise NotImplementedError
+
+    def acquire(self, partition, node, expires, now):
+        """Захват свободного или истекшего раздела, True при успехе."""
+        raise NotImplementedError
+
+    def renew(self, partitions, node, expires):
+        """Продление аренды, множество разделов, оставшихся за узлом."""
+        raise NotImplementedError
+
+    def release(self, partitions, node):
+        """Досрочное освобождение разделов."""
+        raise NotImplementedError
+
+
+class MemoryLeaseStore(LeaseStore):
+    """Аренда в памяти, для узлов в одном процессе и тестов."""
+
+    def __init__(self):
+        self._nodes = {}
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def heartbeat(self, node, expires):
+        """Отметка, что узел жив до expires."""
+        with self._lock:
+            self._nodes[node] = expires
+
+    def live_nodes(self, now):
+        """Узлы с неистекшей отметкой."""
+        with self._lock:
+            return {node for node, expires in self._nodes.items()
+                    if expires > now}
+
+    def owners(self, now):
+        """Разделы с действующей арендой и их владельцы."""
+        with self._lock:
+            return {partition: node
+                    for partition, (node, expires) in self._leases.items()
+                    if expires > now}
+
+    def acquire(self, partition, node, expires, now):
+        """Захват свободного или истекшего раздела, True при успехе."""
+        with self._lock:
+            owner, until = self._leases.get(partition, (None, 0.0))
+            if owner not in (None, node) and until > now:
+                return False
+            self._leases[partition] = (node, expires)
+            return True
+
+    def renew(self, partitions, node, expires):
+        """Продление аренды, множество разделов, оставшихся за узлом."""
+        with self._lock:
+            renewed = {partition for partition in partitions
+                       if self._leases.get(partition, (None,))[0] == node}
+            for partition in renewed:
+                self._leases[partition] = (node, expires)
+            return renewed
+
+    def release(self, partitions, node):
+        """Досрочное освобождение разделов."""
+        with self._lock:
+            for partition in partitions:
+                if self._leases.get(partition, (None,))[0] == node:
+                    del self._leases[partition]
+
+
+class SQLiteLeaseStore(LeaseStore):
+    """Аренда в файле SQLite, общем для процессов одной машины.
+
+    Захват выполняется одним условным UPSERT, поэтому два узла не могут
+    одновременно получить один раздел.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS lease_nodes ('
+                'node TEXT PRIMARY KEY, expires REAL NOT NULL)')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS leases ('
+                'partition INTEGER PRIMARY KEY, node TEXT NOT NULL, '
+                'expires REAL NOT NULL)')
+        self._lock = threading.Lock()
+
+    def heartbeat(self, node, expires):
+        """Отметка, что узел жив до expires."""
+        with self._lock, self.connection:
+            self.connection.execute(
+                'INSERT INTO lease_nodes (node, expires) VALUES (?, ?) '
+                'ON CONFLICT(node) DO UPDATE SET expires = excluded.expires',
+                (node, expires))
+
+    def live_nodes(self, now):
+        """Узлы с неистекшей отметкой."""
+        with self._lock:
+            rows = self.connection.execute(
+                'SELECT node FROM lease_nodes WHERE expires > ?', (now,))
+            return {node for node, in rows}
+
+    def owners(self, now):
+        """Разделы с действующей арендой и их владельцы."""
+        with self._lock:
+            rows = self.connection.execute(
+                'SELECT partition, node FROM leases WHERE expires > ?',
+                (now,))
+            return dict(rows)
+
+    def acquire(self, partition, node, expires, now):
+        """Захват свободного или истекшего раздела, True при успехе."""
+        with self._lock, self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO leases (partition, node, expires) '
+                'VALUES (?, ?, ?) ON CONFLICT(partition) DO UPDATE SET '
+                'node = excluded.node, expires = excluded.expires '
+                'WHERE leases.expires <= ? OR leases.node = excluded.node',
+                (partition, node, expires, now))
+            return cursor.rowcount == 1
+
+    def renew(self, partitions, node, expires):
+        """Продление аренды, множество разделов, оставшихся за узлом."""
+        renewed = set()
+        with self._lock, self.connection:
+            for partition in partitions:
+                cursor = self.connection.execute(
+                    'UPDATE leases SET expires = ? '
+                    'WHERE partition = ? AND node = ?',
+                    (expires, partition, node))
+                if cursor.rowcount:
+                    renewed.add(partition)
+        return renewed
+
+    def release(self, partitions, node):
+        """Досрочное освобождение разделов."""
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'DELETE FROM leases WHERE partition = ? AND node = ?',
+                [(partition, node) for partition in partitions])
+
+    def close(self):
+        """Закрытие базы."""
+        self.connection.close()
+
+
+class LeaseManager:
+    """Аренда разделов одним узлом: продление, захват и балансировка.
+
+    Каждый узел стремится держать ceil(partitions / живые узлы)
+    разделов; разделы упавшего узла разбираются остальными после
+    истечения его аренды.
+    """
+
+    def __init__(self, store, node, partitions=PARTITIONS, ttl=LEASE_TTL,
+                 clock=time.time):
+        self.store = store
+        self.node = node
+        self.partitions = partitions
+        self.ttl = ttl
+        self.clock = clock
+        self.owned = set()
+        self.target = partitions
+        self.expires = 0.0
+
+    def step(self):
+        """Продление и захват разделов, возвращает (gained, lost)."""
+        now = self.clock()
+        expires = now + self.ttl
+        self.store.heartbeat(self.node, expires)
+        renewed = self.store.renew(self.owned, self.node, expires)
+        lost, self.owned = self.owned - renewed, renewed
+        self.expires = expires
+        live = self.store.live_nodes(now) | {self.node}
+        self.target = math.ceil(self.partitions / len(live))
+        gained = set()
+        if len(self.owned) < self.target:
+            owners = self.store.owners(now)
+            start = partition_of(self.node, self.partitions)
+            for offset in range(self.partitions):
+                partition = (start + offset) % self.partitions
+                if len(self.owned) + len(gained) >= self.target:
+                    break
+                if (partition not in owners
+                        and self.store.acquire(partition, self.node,
+                                               expires, now)):
+                    gained.add(partition)
+        self.owned |= gained
+        return gained, lost
+
+    def surplus(self):
+        """Разделы сверх справедливой доли, которые стоит отдать."""
+        extra = len(self.owned) - self.target
+        return set(sorted(self.owned)[-extra:]) if extra > 0 else set()
+
+    def release(self, partitions):
+        """Отказ от разделов."""
+        self.owned -= partitions
+        self.store.release(partitions, self.node)
+
+    def holds(self, token):
+        """Узел владеет разделом токена с запасом по времени."""
+        return (partition_of(token, self.partitions) in self.owned
+                and self.expires - self.clock() > self.ttl / 3)
+
+
+class Coordinator:
+    """Перенос арендаторов в движок и из него по арендованным разделам.
+
+    Отданный раздел освобождается на следующем шаге: за это время
+    завершаются начатые опросы и их состояние записывается в общее
+    хранилище, откуда его прочитает новый владелец. Так сохраненные
+    statuses и old_error_message не дают отправить уведомление дважды.
+    """
+
+    def __init__(self, engine, manager, specs):
+        self.engine = engine
+        self.manager = manager
+        self.by_partition = defaultdict(dict)
+        for spec in specs:
+            partition = partition_of(spec['token'], manager.partitions)
+            self.by_partition[partition][spec['token']] = spec
+        self._draining = set()
+        self._stopped = threading.Event()
+
+    def _drop(self, partitions):
+        for partition in partitions:
+            for token in self.by_partition[partition]:
+                self.engine.remove(token)
+
+    def step(self):
+        """Один шаг: продление аренды и перенос арендаторов."""
+        if self._draining:
+            self.engine.store.flush()
+            self.manager.release(self._draining)
+            self._draining = set()
+        gained, lost = self.manager.step()
+        if lost:
+            logging.warning(f'{self.manager.node}: потеряна аренда '
+                            f'разделов {sorted(lost)}')
+        self._drop(lost)
+        self._draining = self.manager.surplus()
+        self._drop(self._draining)
+        for partition in gained:
+            for spec in self.by_partition[partition].values():
+                self.engine.add(Tenant.from_spec(spec))
+        return gained, lost
+
+    def run(self):
+        """Цикл продления аренды раз в треть ее срока."""
+        while not self._stopped.is_set():
+            try:
+                self.step()
+            except sqlite3.Error as error:
+                logging.error(f'Сбой продления аренды: {error}')
+            self._stopped.wait(self.manager.ttl / 3)
+
+    def start(self):
+        """Запуск цикла в фоновом потоке."""
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Остановка цикла и освобождение всех разделов."""
+        self._stopped.set()
+        self._drop(self.manager.owned)
+        self.engine.store.flush()
+        self.manager.release(set(self.manager.owned))
+
+
+BACKENDS = {
+    'sqlite': SQLiteLeaseStore,
+    'memory': lambda path: MemoryLeaseStore(),
+}
+
+
+def open_leases(url):
+    """Хранилище аренды по адресу вида 'sqlite:///state.db'."""
+    scheme, separator, path = url.partition('://')
+    if not separator:
+        scheme, path = 'sqlite', url
+    elif path.startswith('/'):
+        path = path[1:]
+    return BACKENDS[scheme](path)
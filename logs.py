@@ -0,0 +1,150 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+from tenants import current_tenant
+
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+SAMPLE_PERIOD = 300
+SAMPLE_MAX_KEYS = 100_000
+EXTRA_FIELDS = ('api_latency', 'send_latency', 'suppressed')
+
+_settings = None
+
+
+class TenantFilter(logging.Filter):
+    """Добавляет к записи арендатора и номер опроса из контекста.
+
+    Работает в потоке, создавшем запись, пока контекст еще доступен.
+    """
+
+    def filter(self, record):
+        tenant = current_tenant()
+        if tenant is not None:
+            record.tenant = tenant.chat_id
+            record.poll = tenant.polls
+        return True
+
+
+class ErrorSampler(logging.Filter):
+    """Подавление одинаковых ошибок одного арендатора.
+
+    Первая ошибка проходит сразу, повторы в течение period отбрасываются,
+    следующая после period запись несет число подавленных в suppressed.
+    """
+
+    def __init__(self, period=SAMPLE_PERIOD, max_keys=SAMPLE_MAX_KEYS,
+                 clock=time.monotonic):
+        super().__init__()
+        self.period = period
+        self.max_keys = max_keys
+        self.clock = clock
+        self.suppressed = 0
+        self._seen = {}
+
+    def filter(self, record):
+        if record.levelno < logging.ERROR:
+            return True
+        key = (getattr(record, 'tenant', None), record.getMessage())
+        now = self.clock()
+        seen = self._seen.get(key)
+        if seen is not None and now - seen[0] < self.period:
+            seen[1] += 1
+            self.suppressed += 1
+            return False
+        if len(self._seen) >= self.max_keys:
+            self._seen.clear()
+        if seen is not None and seen[1]:
+            record.suppressed = seen[1]
+        self._seen[key] = [now, 0]
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись."""
+
+    def format(self, record):
+        entry = {
+            'time': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        tenant = getattr(record, 'tenant', None)
+        if tenant is not None:
+            entry['tenant'] = tenant
+            entry['poll'] = record.poll
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который не форматирует запись в потоке опроса.
+
+    Сообщение собирается из msg и args уже в потоке QueueListener.
+    Исключение сохраняется текстом, чтобы не держать кадры стека.
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class QueueListener(logging.handlers.QueueListener):
+    """QueueListener, который можно останавливать повторно."""
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+def setup(level=LOG_LEVEL, log_format=LOG_FORMAT, stream=None):
+    """Неблокирующее логирование: запись в очередь, вывод в потоке.
+
+    Возвращает запущенный QueueListener; он останавливается при выходе.
+    """
+    global _settings
+    _settings = (level, log_format, stream)
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if log_format == 'json'
+                        else logging.Formatter(TEXT_FORMAT))
+    records = queue.SimpleQueue()
+    handler = LazyQueueHandler(records)
+    handler.addFilter(TenantFilter())
+    handler.addFilter(ErrorSampler())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    listener = QueueListener(records, output)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def restart():
+    """Повторная настройка логирования в процессе, созданном fork().
+
+    Поток QueueListener в дочерний процесс не переходит, и без нового
+    слушателя записи копились бы в унаследованной очереди. Возвращает
+    QueueListener или None, если setup() в родителе не вызывался.
+    """
+    if _settings is None:
+        return None
+    return setup(*_settings)
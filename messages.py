@@ -0,0 +1,86 @@
+import sys
+from functools import lru_cache
+
+from models import Status
+
+DEFAULT_LOCALE = 'ru'
+RENDER_CACHE_SIZE = 4096
+
+STATUS_CHANGED = {
+    'ru': 'Изменился статус проверки работы "{name}". {verdict}',
+    'en': 'Homework "{name}" review status changed. {verdict}',
+}
+
+HOMEWORK_VERDICTS = {
+    'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
+    'reviewing': 'Работа взята на проверку ревьюером.',
+    'rejected': 'Работа проверена: у ревьюера есть замечания.'
+}
+
+VERDICTS = {
+    'ru': HOMEWORK_VERDICTS,
+    'en': {
+        'approved': 'Reviewed: the reviewer liked everything. Hooray!',
+        'reviewing': 'The reviewer has started the review.',
+        'rejected': 'Reviewed: the reviewer has some remarks.',
+    },
+}
+
+NOT_ACCEPTED = {
+    'ru': 'Не принята ревьюером',
+    'en': 'Not accepted by a reviewer yet',
+}
+
+
+class TemplateRegistry:
+    """Заготовки уведомлений о смене статуса по языкам.
+
+    Для каждой пары (язык, Status) шаблон заранее делится на части до и
+    после названия работы, и сообщение собирается одной склейкой строк.
+    Готовые сообщения кэшируются: одна работа с одним статусом
+    рассылается всем подписчикам одним и тем же объектом строки.
+    """
+
+    def __init__(self, formats=STATUS_CHANGED, verdicts=VERDICTS,
+                 not_accepted=NOT_ACCEPTED, default=DEFAULT_LOCALE,
+                 cache_size=RENDER_CACHE_SIZE):
+        self.default = default
+        self._locales = frozenset(formats)
+        self._not_accepted = dict(not_accepted)
+        self._parts = {}
+        for locale, template in formats.items():
+            head, tail = template.split('{name}')
+            for label, verdict in verdicts[locale].items():
+                self._parts[locale, Status.parse(label)] = (
+                    sys.intern(head),
+                    sys.intern(tail.replace('{verdict}', verdict)))
+        self.render = lru_cache(maxsize=cache_size)(self._render)
+
+    @property
+    def locales(self):
+        """Поддерживаемые языки."""
+        return sorted(self._locales)
+
+    def locale(self, locale):
+        """Язык из поддерживаемых, иначе язык по умолчанию."""
+        return locale if locale in self._locales else self.default
+
+    def knows(self, status):
+        """Есть ли шаблон для статуса."""
+        return (isinstance(status, Status)
+                and (self.default, status) in self._parts)
+
+    def not_accepted(self, locale=None):
+        """Сообщение о том, что работ еще нет."""
+        return self._not_accepted[self.locale(locale)]
+
+    def _render(self, name, status, locale=None):
+        head, tail = self._parts[self.locale(locale), status]
+        return head + name + tail
+
+    def cache_info(self):
+        """Статистика кэша готовых сообщений."""
+        return self.render.cache_info()
+
+
+TEMPLATES = TemplateRegistry()
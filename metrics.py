@@ -0,0 +1,164 @@
+import bisect
+import logging
+import os
+import threading
+from collections import defaultdict
+
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+METRICS_PATH = '/metrics'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0)
+DECODE_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01,
+                  0.05)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                         .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    """Счетчик с метками; inc() - одно обращение к словарю."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = defaultdict(int)
+
+    def inc(self, *labelvalues, amount=1):
+        """Увеличение счетчика для набора значений меток."""
+        self.values[labelvalues] += amount
+
+    def render(self):
+        """Строки в текстовом формате Prometheus."""
+        for labelvalues, value in list(self.values.items()):
+            yield (f'{self.name}{_labels(self.labelnames, labelvalues)} '
+                   f'{value}')
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами.
+
+    observe() без блокировок: поиск корзины bisect и два сложения.
+    Накопительные суммы считаются только при выдаче метрик.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Учет одного значения."""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        """Число учтенных значений."""
+        return sum(self.counts)
+
+    def render(self):
+        """Строки в текстовом формате Prometheus."""
+        total = 0
+        for bound, count in zip(self.bounds + ('+Inf',), self.counts):
+            total += count
+            yield f'{self.name}_bucket{{le="{bound}"}} {total}'
+        yield f'{self.name}_sum {self.sum}'
+        yield f'{self.name}_count {total}'
+
+
+class Registry:
+    """Набор метрик и функций, снимающих показания при запросе."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = {}
+
+    def register(self, metric):
+        """Регистрация счетчика или гистограммы."""
+        self.metrics[metric.name] = metric
+        return metric
+
+    def collect(self, key, function):
+        """Функция, возвращающая [(имя, {метки}, значение)] при запросе.
+
+        Повторная регистрация с тем же key заменяет прежнюю функцию.
+        """
+        self.collectors[key] = function
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        gauges = defaultdict(list)
+        for key, function in list(self.collectors.items()):
+            try:
+                for name, labels, value in function():
+                    gauges[name].append((labels, value))
+            except Exception as error:
+                logging.error(f'metrics: сбой сборщика {key}: {error}')
+        for name, samples in gauges.items():
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in samples:
+                lines.append(f'{name}{_labels(labels, labels.values())} '
+                             f'{value}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+API_LATENCY = REGISTRY.register(Histogram(
+    'homework_api_request_seconds', 'Время запроса к API домашек'))
+DECODE_LATENCY = REGISTRY.register(Histogram(
+    'homework_api_decode_seconds', 'Время разбора JSON ответа API',
+    DECODE_BUCKETS))
+SEND_LATENCY = REGISTRY.register(Histogram(
+    'telegram_send_seconds', 'Время вызова sendMessage'))
+API_ERRORS = REGISTRY.register(Counter(
+    'homework_api_errors_total', 'Ответы API с кодом, отличным от 200',
+    ('code',)))
+WRONG_KEY = REGISTRY.register(Counter(
+    'homework_wrong_key_total', 'Ошибки WrongKeyHw по причинам',
+    ('cause',)))
+
+
+def serve(port=METRICS_PORT, registry=REGISTRY):
+    """HTTP-сервер с METRICS_PATH в фоновом потоке."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != METRICS_PATH:
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f'Метрики доступны на порту {server.server_port}')
+    return server
@@ -0,0 +1,98 @@
+import hashlib
+from enum import IntEnum
+
+
+class Status(IntEnum):
+    """Статус проверки работы; имена совпадают с ключами HOMEWORK_VERDICTS.
+
+    Члены перечисления - общие для всех арендаторов объекты, поэтому
+    словарь статусов арендатора не хранит своих копий строк из ответа API.
+    """
+
+    REVIEWING = 1
+    REJECTED = 2
+    APPROVED = 3
+
+    @property
+    def label(self):
+        """Статус в виде строки API."""
+        return self.name.lower()
+
+    @classmethod
+    def parse(cls, value):
+        """Член перечисления для строки API или числа.
+
+        Неизвестное значение возвращается как есть, чтобы parse_status
+        сообщил о нем.
+        """
+        try:
+            return _LOOKUP.get(value, value)
+        except TypeError:
+            return value
+
+
+_LOOKUP = {key: status for status in Status
+           for key in (status.label, status.value)}
+
+
+class Homework:
+    """Работа из ответа API только с полями, нужными для уведомлений.
+
+    get() повторяет dict.get ответа API, поэтому объект принимают
+    check_response, parse_status и transitions.
+    """
+
+    __slots__ = ('id', 'homework_name', 'status', 'date_updated')
+
+    def __init__(self, id=None, homework_name=None, status=None,
+                 date_updated=None):
+        self.id = id
+        self.homework_name = homework_name
+        self.status = Status.parse(status)
+        self.date_updated = date_updated
+
+    @classmethod
+    def from_json(cls, data):
+        """Запись из словаря ответа API."""
+        return cls(data.get('id'), data.get('homework_name'),
+                   data.get('status'), data.get('date_updated'))
+
+    def get(self, key, default=None):
+        """Поле по ключу ответа API."""
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        if value is None:
+            return default
+        return value.label if isinstance(value, Status) else value
+
+    def as_dict(self):
+        """Словарь в формате ответа API без пустых полей."""
+        return {key: self.get(key) for key in self.__slots__
+                if getattr(self, key) is not None}
+
+    def __eq__(self, other):
+        if not isinstance(other, Homework):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        return f'Homework({self.as_dict()!r})'
+
+
+class Notification(str):
+    """Текст уведомления с ключом события.
+
+    По ключу outbox отсеивает повторную отправку того же события после
+    перезапуска. Ведет себя как обычная строка.
+    """
+
+    def __new__(cls, text, key=None):
+        notification = super().__new__(cls, text)
+        notification.key = key
+        return notification
+
+
+def event_key(token, homework_key, homework):
+    """Ключ смены статуса работы, одинаковый при повторном опросе."""
+    parts = (token, homework_key, str(homework.get('status')),
+             str(homework.get('date_updated')))
+    return hashlib.sha1('\0'.join(parts).encode()).hexdigest()
@@ -0,0 +1,475 @@
+import heapq
+import itertools
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+import uuid
+import zlib
+from http import HTTPStatus
+
+import metrics
+from exceptions import BotApiError
+from ratelimit import (CHAT_BURST, CHAT_RATE, GLOBAL_RATE, MAX_IDLE_BUCKETS,
+                       TokenBucket, priority_of)
+
+SEGMENT_SIZE = 4 * 2 ** 20
+COMPACT_SEGMENTS = 4
+DEDUP_TTL = 24 * 3600
+RETRY_BASE = 1.0
+RETRY_MAX = 600.0
+DRAIN_WORKERS = 4
+DRAIN_TIMEOUT = 30.0
+TAKE_TIMEOUT = 0.5
+
+PUT = 1
+ACK = 2
+HEADER = struct.Struct('<IIB')
+SUFFIX = '.seg'
+DECODER = json.JSONDecoder()
+
+
+class Segment:
+    """Файл фиксированного размера, отображенный в память.
+
+    Записи дописываются подряд: заголовок (длина, crc32, тип) и JSON.
+    Заголовок пишется после тела, поэтому запись, оборванная падением
+    процесса, при чтении отбрасывается по нулевому типу или crc. Память
+    MAP_SHARED переживает падение процесса без flush(); flush() нужен
+    только против падения системы.
+    """
+
+    def __init__(self, path, size=SEGMENT_SIZE):
+        self.path = path
+        descriptor = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(descriptor).st_size < size:
+                os.ftruncate(descriptor, size)
+            self.size = os.fstat(descriptor).st_size
+            self.map = mmap.mmap(descriptor, self.size)
+        finally:
+            os.close(descriptor)
+        self.offset = 0
+        for _ in self._scan():
+            pass
+
+    def _scan(self):
+        offset = 0
+        while offset + HEADER.size <= self.size:
+            length, crc, kind = HEADER.unpack_from(self.map, offset)
+            end = offset + HEADER.size + length
+            if not kind or end > self.size:
+                break
+            body = self.map[offset + HEADER.size:end]
+            if zlib.crc32(body, kind) != crc:
+                break
+            offset = self.offset = end
+            yield kind, body
+
+    def records(self):
+        """Пары (тип, запись) от начала сегмента до первой битой."""
+        for kind, body in self._scan():
+            yield kind, DECODER.decode(body.decode())
+
+    def append(self, kind, body):
+        """Дописывание записи, False если она не помещается."""
+        start = self.offset + HEADER.size
+        end = start + len(body)
+        if end > self.size:
+            return False
+        self.map[start:end] = body
+        HEADER.pack_into(self.map, self.offset, len(body),
+                         zlib.crc32(body, kind), kind)
+        self.offset = end
+        return True
+
+    def flush(self):
+        """Сброс страниц сегмента на диск."""
+        self.map.flush()
+
+    def close(self):
+        """Освобождение отображения."""
+        self.map.close()
+
+
+class Outbox:
+    """Очередь исходящих сообщений в сегментах на диске.
+
+    put() дописывает сообщение и сразу возвращается, отправкой занимается
+    Drainer: take() выдает сообщения, срок которых подошел, ack()
+    отмечает доставку, fail() откладывает повтор с экспоненциальной
+    задержкой. Доставка - не менее одного раза: сообщение, отправленное
+    до падения, но не отмеченное, уйдет повторно. Ключи доставленных
+    сообщений помнятся dedup_ttl секунд, повторный put() с таким ключом
+    игнорируется. Когда сегментов становится compact_segments, живые
+    записи переписываются в новые сегменты, а старые удаляются.
+    """
+
+    def __init__(self, directory, segment_size=SEGMENT_SIZE,
+                 compact_segments=COMPACT_SEGMENTS, dedup_ttl=DEDUP_TTL,
+                 retry_base=RETRY_BASE, retry_max=RETRY_MAX, sync=False,
+                 clock=time.time, rand=random.random):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.compact_segments = compact_segments
+        self.compact_at = compact_segments
+        self.dedup_ttl = dedup_ttl
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.sync = sync
+        self.clock = clock
+        self.rand = rand
+        self.pending = {}
+        self.delivered = {}
+        self.duplicates = 0
+        self.retries = 0
+        self.dead = 0
+        self.compactions = 0
+        self.paused_until = 0.0
+        self._due = []
+        self._ready = []
+        self._inflight = set()
+        self._counter = itertools.count()
+        self._condition = threading.Condition(threading.RLock())
+        self._compacting = False
+        self._closed = False
+        self.segments = []
+        names = sorted(name for name in os.listdir(directory)
+                       if name.endswith(SUFFIX))
+        self._number = int(names[-1][:-len(SUFFIX)]) + 1 if names else 0
+        for name in names:
+            segment = Segment(os.path.join(directory, name), segment_size)
+            self.segments.append(segment)
+            for kind, record in segment.records():
+                self._replay(kind, record)
+        if not self.segments:
+            self._new_segment()
+        for key in self.pending:
+            heapq.heappush(self._due, (0.0, next(self._counter), key))
+        metrics.REGISTRY.collect('outbox', lambda: [
+            ('homework_outbox_pending', {}, len(self.pending)),
+            ('homework_outbox_retries', {}, self.retries),
+            ('homework_outbox_dead', {}, self.dead),
+            ('homework_outbox_duplicates', {}, self.duplicates),
+            ('homework_outbox_segments', {}, len(self.segments))])
+
+    def _replay(self, kind, record):
+        key = record['k']
+        if kind == PUT and key not in self.delivered:
+            self.pending[key] = [record['c'], record['t'], record['at'], 0,
+                                 record.get('p', 0)]
+        elif kind == ACK:
+            self.pending.pop(key, None)
+            self.delivered[key] = record['at']
+
+    def _new_segment(self):
+        path = os.path.join(self.directory, f'{self._number:08d}{SUFFIX}')
+        self._number += 1
+        self.segments.append(Segment(path, self.segment_size))
+
+    def _write(self, kind, record):
+        body = json.dumps(record, ensure_ascii=False).encode()
+        if not self.segments[-1].append(kind, body):
+            if (not self._compacting
+                    and len(self.segments) + 1 >= self.compact_at):
+                self.compact()
+            if not self.segments[-1].append(kind, body):
+                self._new_segment()
+                if not self.segments[-1].append(kind, body):
+                    raise ValueError('Запись не помещается в сегмент outbox')
+        if self.sync:
+            self.segments[-1].flush()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def put(self, chat_id, text, key=None, priority=0):
+        """Сообщение в очередь, False если такой ключ уже был.
+
+        Из готовых к отправке первыми берутся сообщения с меньшим
+        priority.
+        """
+        key = key or uuid.uuid4().hex
+        with self._condition:
+            if key in self.pending or key in self.delivered:
+                self.duplicates += 1
+                return False
+            created = self.clock()
+            self._write(PUT, {'k': key, 'c': chat_id, 't': text,
+                              'at': created, 'p': priority})
+            self.pending[key] = [chat_id, text, created, 0, priority]
+            heapq.heappush(self._due, (created, next(self._counter), key))
+            self._condition.notify()
+            return True
+
+    def _promote(self, now):
+        while self._due and self._due[0][0] <= now:
+            key = heapq.heappop(self._due)[2]
+            if key in self.pending:
+                heapq.heappush(self._ready, (self.pending[key][4],
+                                             next(self._counter), key))
+        while self._ready and self._ready[0][2] not in self.pending:
+            heapq.heappop(self._ready)
+        while self._due and self._due[0][2] not in self.pending:
+            heapq.heappop(self._due)
+
+    def next_due(self):
+        """Время, когда будет что отправить, None если нечего."""
+        with self._condition:
+            now = self.clock()
+            self._promote(now)
+            if self._ready:
+                return max(now, self.paused_until)
+            if not self._due:
+                return None
+            return max(self._due[0][0], self.paused_until)
+
+    def take(self, timeout=None):
+        """(ключ, chat_id, текст) для отправки или None по таймауту."""
+        deadline = None if timeout is None else self.clock() + timeout
+        with self._condition:
+            while not self._closed:
+                now = self.clock()
+                due = self.next_due()
+                if self._ready and self.paused_until <= now:
+                    key = heapq.heappop(self._ready)[2]
+                    self._inflight.add(key)
+                    chat_id, text = self.pending[key][:2]
+                    return key, chat_id, text
+                waits = [moment - now for moment in (due, deadline)
+                         if moment is not None]
+                if deadline is not None and deadline <= now:
+                    return None
+                self._condition.wait(min(waits) if waits else None)
+            return None
+
+    def ack(self, key, dead=False):
+        """Отметка о доставке.
+
+        dead=True - сообщение не доставлено и не будет (чат удален, бот
+        заблокирован): запись снимается с отправки и считается в dead.
+        """
+        with self._condition:
+            self._inflight.discard(key)
+            if self.pending.pop(key, None) is None:
+                return
+            if dead:
+                self.dead += 1
+            now = self.clock()
+            self.delivered[key] = now
+            self._write(ACK, {'k': key, 'at': now})
+            self._condition.notify_all()
+
+    def fail(self, key, retry_after=None):
+        """Повтор позже: через retry_after или по экспоненте с разбросом.
+
+        retry_after (ответ 429) приостанавливает всю отправку.
+        """
+        with self._condition:
+            self._inflight.discard(key)
+            entry = self.pending.get(key)
+            if entry is None:
+                return
+            entry[3] += 1
+            self.retries += 1
+            now = self.clock()
+            if retry_after is not None:
+                delay = retry_after
+                self.paused_until = max(self.paused_until, now + delay)
+            else:
+                delay = min(self.retry_max,
+                            self.retry_base * 2 ** (entry[3] - 1))
+                delay *= 0.5 + self.rand() / 2
+            heapq.heappush(self._due, (now + delay, next(self._counter), key))
+            self._condition.notify_all()
+
+    def defer(self, key, delay):
+        """Возврат взятого сообщения в очередь на delay секунд без
+        счета попыток, например до появления токена в корзине чата."""
+        with self._condition:
+            self._inflight.discard(key)
+            if key in self.pending:
+                heapq.heappush(self._due, (self.clock() + delay,
+                                           next(self._counter), key))
+                self._condition.notify_all()
+
+    def compact(self):
+        """Перезапись живых записей в новые сегменты, удаление старых.
+
+        Новые сегменты получают большие номера и сбрасываются на диск до
+        удаления старых, так что после падения посередине повторное
+        чтение всех сегментов дает то же состояние.
+        """
+        with self._condition:
+            self._compacting = True
+            try:
+                now = self.clock()
+                self.delivered = {
+                    key: moment for key, moment in self.delivered.items()
+                    if now - moment < self.dedup_ttl}
+                old, self.segments = self.segments, []
+                self._new_segment()
+                for key, entry in self.pending.items():
+                    chat_id, text, created, _, priority = entry
+                    self._write(PUT, {'k': key, 'c': chat_id, 't': text,
+                                      'at': created, 'p': priority})
+                for key, moment in self.delivered.items():
+                    self._write(ACK, {'k': key, 'at': moment})
+                for segment in self.segments:
+                    segment.flush()
+                for segment in old:
+                    segment.close()
+                    os.remove(segment.path)
+                self.compact_at = max(self.compact_segments,
+                                      2 * len(self.segments))
+                self.compactions += 1
+            finally:
+                self._compacting = False
+
+    def close(self):
+        """Сброс сегментов на диск и пробуждение ждущих take()."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            for segment in self.segments:
+                segment.flush()
+                segment.close()
+
+
+def permanent(error):
+    """Ошибка Bot API, повтор после которой ничего не изменит.
+
+    Ответы 4xx, кроме 429: бот заблокирован, чат не найден, неверный
+    запрос.
+    """
+    code = getattr(error, 'error_code', None)
+    return (isinstance(error, BotApiError) and isinstance(code, int)
+            and 400 <= code < 500 and code != HTTPStatus.TOO_MANY_REQUESTS)
+
+
+class Drainer:
+    """Фоновые потоки, отправляющие сообщения из Outbox.
+
+    Общий и по-чатовые лимиты Telegram соблюдаются корзинами токенов, как
+    в SendQueue: сообщение чата, корзина которого пуста, возвращается в
+    Outbox до появления токена. Ошибка отправки не теряет сообщение, а
+    откладывает его повтор.
+    """
+
+    def __init__(self, outbox, bot, workers=DRAIN_WORKERS, rate=GLOBAL_RATE,
+                 chat_rate=CHAT_RATE, chat_burst=CHAT_BURST,
+                 clock=time.monotonic):
+        self.outbox = outbox
+        self.bot = bot
+        self.workers = workers
+        self.clock = clock
+        self.bucket = TokenBucket(rate, rate, clock())
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.buckets = {}
+        self.sent = 0
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stopped = threading.Event()
+
+    def _chat_wait(self, chat_id):
+        with self._lock:
+            now = self.clock()
+            bucket = self.buckets.get(chat_id)
+            if bucket is None:
+                if len(self.buckets) >= MAX_IDLE_BUCKETS:
+                    self.buckets = {
+                        chat: bucket for chat, bucket in self.buckets.items()
+                        if not bucket.is_full(now)}
+                bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+                self.buckets[chat_id] = bucket
+            wait = bucket.wait_time(now)
+            if not wait:
+                bucket.consume(now)
+            return wait
+
+    def _acquire(self):
+        while True:
+            with self._lock:
+                wait = self.bucket.wait_time(self.clock())
+                if not wait:
+                    self.bucket.consume(self.clock())
+                    return
+            time.sleep(wait)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            item = self.outbox.take(timeout=TAKE_TIMEOUT)
+            if item is None:
+                continue
+            key, chat_id, text = item
+            wait = self._chat_wait(chat_id)
+            if wait:
+                self.outbox.defer(key, wait)
+                continue
+            self._acquire()
+            try:
+                self.bot.send_message(chat_id=chat_id, text=text)
+            except Exception as error:
+                if permanent(error):
+                    logging.error('outbox: сообщение в чат %s отброшено: %s',
+                                  chat_id, error)
+                    self.outbox.ack(key, dead=True)
+                    continue
+                logging.warning('outbox: отправка в чат %s отложена: %s',
+                                chat_id, error)
+                self.outbox.fail(key, getattr(error, 'retry_after', None))
+            else:
+                self.outbox.ack(key)
+                with self._lock:
+                    self.sent += 1
+
+    def start(self):
+        """Запуск рабочих потоков."""
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._run, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=DRAIN_TIMEOUT):
+        """Ожидание отправки всех сообщений, не дольше timeout.
+
+        Неотправленное остается на диске до следующего запуска.
+        """
+        deadline = time.monotonic() + timeout
+        while len(self.outbox) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+
+
+class OutboxBot:
+    """Бот для send_message, который только пишет сообщения в Outbox.
+
+    Ключ берется из Notification.key и chat_id, поэтому уведомление о
+    том же событии в тот же чат не ставится в очередь дважды.
+    """
+
+    deferred = True
+
+    def __init__(self, outbox):
+        self.outbox = outbox
+
+    def send_message(self, chat_id, text):
+        """Запись сообщения в outbox, ошибки - с низким приоритетом."""
+        key = getattr(text, 'key', None)
+        self.outbox.put(chat_id, str(text),
+                        f'{key}:{chat_id}' if key else None,
+                        priority_of(text))
+
+    def send_many(self, messages):
+        """Запись пакета пар (chat_id, текст) в outbox."""
+        return [self.send_message(chat_id, text)
+                for chat_id, text in messages]
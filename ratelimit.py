@@ -0,0 +1,250 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import homework
+import metrics
+
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+CHAT_BURST = 3
+SEND_WORKERS = 8
+MAX_IDLE_BUCKETS = 10_000
+
+STATUS_PRIORITY = 0
+ERROR_PRIORITY = 1
+ERROR_PREFIX = homework.ERROR_MESSAGE.format('')
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity."""
+
+    def __init__(self, rate, capacity, now=0.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now):
+        """Начисление токенов за прошедшее время."""
+        if now > self.updated:
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now):
+        """Сколько ждать до появления токена."""
+        self.refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now):
+        """Списание токена, True если он был."""
+        if self.wait_time(now):
+            return False
+        self.tokens -= 1
+        return True
+
+    def is_full(self, now):
+        """Корзина полна и ее можно забыть."""
+        self.refill(now)
+        return self.tokens >= self.capacity
+
+
+class SendQueue:
+    """Очередь отправки с общим и по-чатовым лимитами Telegram.
+
+    Статусы уходят раньше уведомлений об ошибках, RetryAfter от Telegram
+    приостанавливает отправку на указанное время. Если задан coalescer,
+    статусы одного чата сначала собираются в сводку.
+    """
+
+    def __init__(self, bot, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE,
+                 chat_burst=CHAT_BURST, workers=SEND_WORKERS,
+                 clock=time.monotonic, coalescer=None):
+        self.bot = bot
+        self.clock = clock
+        self.coalescer = coalescer
+        self.global_bucket = TokenBucket(global_rate, global_rate, clock())
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.buckets = {}
+        self.executor = ThreadPoolExecutor(workers) if workers else None
+        self.paused_until = 0.0
+        self.sent = 0
+        self.failed = 0
+        self._ready = []
+        self._waiting = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        metrics.REGISTRY.collect('send_queue', lambda: [
+            ('telegram_send_queue_depth', {}, len(self)),
+            ('telegram_sent', {}, self.sent),
+            ('telegram_send_failed', {}, self.failed),
+            ('telegram_digest_merged', {},
+             self.coalescer.merged if self.coalescer is not None else 0)])
+
+    def put(self, chat_id, text, priority=STATUS_PRIORITY):
+        """Постановка сообщения в очередь без ожидания отправки."""
+        self.put_many([(chat_id, text)], priority)
+
+    def put_many(self, messages, priority=STATUS_PRIORITY):
+        """Постановка пар (chat_id, текст) под одной блокировкой."""
+        with self._condition:
+            for chat_id, text in messages:
+                if (self.coalescer is not None
+                        and priority == STATUS_PRIORITY):
+                    self.coalescer.add(chat_id, text, self.clock())
+                else:
+                    heapq.heappush(self._ready, (
+                        priority, next(self._counter), chat_id, text))
+            self._condition.notify()
+
+    def __len__(self):
+        pending = len(self.coalescer) if self.coalescer is not None else 0
+        return len(self._ready) + len(self._waiting) + pending
+
+    def _bucket(self, chat_id, now):
+        bucket = self.buckets.get(chat_id)
+        if bucket is None:
+            if len(self.buckets) >= MAX_IDLE_BUCKETS:
+                self.buckets = {
+                    chat: bucket for chat, bucket in self.buckets.items()
+                    if not bucket.is_full(now)
+                }
+            bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+            self.buckets[chat_id] = bucket
+        return bucket
+
+    def step(self, now=None):
+        """Отправка всего, что разрешают лимиты; время до следующего шага."""
+        now = self.clock() if now is None else now
+        with self._condition:
+            self._release_digests(now)
+            while self._waiting and self._waiting[0][0] <= now:
+                heapq.heappush(self._ready, heapq.heappop(self._waiting)[1:])
+            if now < self.paused_until:
+                return self.paused_until - now
+            while self._ready:
+                wait = self.global_bucket.wait_time(now)
+                if wait:
+                    return wait
+                item = heapq.heappop(self._ready)
+                bucket = self._bucket(item[2], now)
+                wait = bucket.wait_time(now)
+                if wait:
+                    heapq.heappush(self._waiting, (now + wait, *item))
+                    continue
+                bucket.consume(now)
+                self.global_bucket.consume(now)
+                self._dispatch(item)
+            due = [self._waiting[0][0]] if self._waiting else []
+            if self.coalescer is not None and len(self.coalescer):
+                due.append(self.coalescer.next_due())
+            return min(due) - now if due else None
+
+    def _release_digests(self, now):
+        if self.coalescer is None:
+            return
+        digests = (self.coalescer.pop_all() if self._stopped
+                   else self.coalescer.pop_due(now))
+        for chat_id, text in digests:
+            heapq.heappush(self._ready, (STATUS_PRIORITY,
+                                         next(self._counter), chat_id, text))
+
+    def _dispatch(self, item):
+        if self.executor is None:
+            self._send(item)
+        else:
+            self.executor.submit(self._send, item)
+
+    def _send(self, item):
+        priority, _, chat_id, text = item
+        try:
+            started = time.perf_counter()
+            self.bot.send_message(chat_id=chat_id, text=text)
+        except Exception as error:
+            self._failed(item, error)
+        else:
+            metrics.SEND_LATENCY.observe(time.perf_counter() - started)
+            self.sent += 1
+
+    def _failed(self, item, error):
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is None:
+            self.failed += 1
+            logging.error('send_message: Сообщение с текстом%s '
+                          'не отправленно: %s', item[3], error)
+            return
+        logging.warning(f'Telegram просит подождать {retry_after} с')
+        with self._condition:
+            ready_at = self.clock() + retry_after
+            self.paused_until = max(self.paused_until, ready_at)
+            heapq.heappush(self._waiting, (ready_at, *item))
+            self._condition.notify()
+
+    def run(self):
+        """Цикл рабочего потока, после stop() дожидается пустой очереди."""
+        while True:
+            delay = self.step()
+            with self._condition:
+                if self._stopped and not len(self):
+                    break
+                if delay is None and not self._ready:
+                    self._condition.wait()
+                elif delay:
+                    self._condition.wait(delay)
+
+    def start(self):
+        """Запуск рабочего потока."""
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Отправка оставшихся сообщений и остановка рабочего потока."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout)
+        if self.executor:
+            self.executor.shutdown(wait=True)
+
+
+def priority_of(text):
+    """Приоритет сообщения: уведомления об ошибках ждут статусов."""
+    return (ERROR_PRIORITY if text.startswith(ERROR_PREFIX)
+            else STATUS_PRIORITY)
+
+
+class QueuedBot:
+    """Бот для send_message, который только ставит сообщения в очередь.
+
+    deferred: время отправки измеряет SendQueue, а не send_message.
+    """
+
+    deferred = True
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def send_message(self, chat_id, text):
+        """Постановка в очередь, ошибки уходят с низким приоритетом."""
+        self.queue.put(chat_id, text, priority_of(text))
+
+    def send_many(self, messages):
+        """Постановка пакета пар (chat_id, текст) в очередь."""
+        messages = list(messages)
+        for priority in (STATUS_PRIORITY, ERROR_PRIORITY):
+            batch = [item for item in messages
+                     if priority_of(item[1]) == priority]
+            if batch:
+                self.queue.put_many(batch, priority)
+        return [None] * len(messages)
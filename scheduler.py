@@ -0,0 +1,71 @@
+import heapq
+import itertools
+
+_REMOVED = object()
+
+
+class Scheduler:
+    """Min-heap арендаторов по времени следующего опроса.
+
+    Добавление и перенос - O(log n), отмена - O(1) с ленивым удалением
+    из кучи. Стоимость тика зависит только от числа наступивших сроков.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._entries = {}
+        self._counter = itertools.count()
+        self._removed = 0
+
+    def schedule(self, key, due, item):
+        """Постановка или перенос опроса на момент due."""
+        if key in self._entries:
+            self.cancel(key)
+        entry = [due, next(self._counter), key, item]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+
+    reschedule = schedule
+
+    def cancel(self, key):
+        """Отмена запланированного опроса, True если он был."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        entry[-1] = _REMOVED
+        self._removed += 1
+        if self._removed > len(self._heap) // 2:
+            self._compact()
+        return True
+
+    def pop_due(self, now):
+        """Извлечение всех элементов со сроком не позже now."""
+        heap, due = self._heap, []
+        while heap and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            if entry[-1] is _REMOVED:
+                self._removed -= 1
+                continue
+            del self._entries[entry[2]]
+            due.append(entry[-1])
+        return due
+
+    def next_due(self):
+        """Ближайший срок опроса или None для пустой очереди."""
+        heap = self._heap
+        while heap and heap[0][-1] is _REMOVED:
+            heapq.heappop(heap)
+            self._removed -= 1
+        return heap[0][0] if heap else None
+
+    def _compact(self):
+        self._heap = [entry for entry in self._heap
+                      if entry[-1] is not _REMOVED]
+        heapq.heapify(self._heap)
+        self._removed = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
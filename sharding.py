@@ -0,0 +1,211 @@
+import asyncio
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+
+import aio
+import breaker
+import homework
+import http_pool
+import logs
+from storage import MemoryStore, open_store
+from tenants import Tenant, TenantRegistry
+
+WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', os.cpu_count() or 1))
+RING_REPLICAS = 100
+MONITOR_PERIOD = 1
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """Консистентное хэширование токенов по рабочим процессам."""
+
+    def __init__(self, nodes=(), replicas=RING_REPLICAS):
+        self.replicas = replicas
+        self._points = []
+        self._nodes = {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        """Добавление узла вместе с его виртуальными точками."""
+        for replica in range(self.replicas):
+            point = _hash(f'{node}#{replica}')
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._nodes[point] = node
+
+    def remove(self, node):
+        """Удаление узла, его токены расходятся по соседям."""
+        for replica in range(self.replicas):
+            point = _hash(f'{node}#{replica}')
+            self._points.remove(point)
+            del self._nodes[point]
+
+    @property
+    def nodes(self):
+        """Множество узлов кольца."""
+        return set(self._nodes.values())
+
+    def node_for(self, key):
+        """Узел, которому принадлежит ключ."""
+        if not self._points:
+            raise LookupError('Кольцо пустое')
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._nodes[self._points[index]]
+
+
+def run_worker(name, specs, metrics_queue, store_url=None):
+    """Точка входа рабочего процесса: асинхронный опрос своего шарда."""
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    listener = logs.restart()
+    registry = TenantRegistry(Tenant.from_spec(spec) for spec in specs)
+    pool = http_pool.install(http_pool.HttpPool())
+    breaker.install(breaker.CircuitBreaker())
+    store = open_store(store_url) if store_url else MemoryStore()
+
+    def report(engine):
+        metrics_queue.put((name, {
+            'tenants': len(engine.registry),
+            'polls': engine.polls,
+            **{f'pool_{key}': value for key, value in pool.stats().items()},
+        }))
+
+    try:
+        asyncio.run(aio.run_engine(
+            registry, homework.TELEGRAM_TOKEN, store, report=report))
+    finally:
+        store.close()
+        if listener:
+            listener.stop()
+
+
+class Supervisor:
+    """Распределение арендаторов по процессам и присмотр за ними.
+
+    Шард процесса определяется консистентным хэшированием токена, при
+    добавлении или удалении процесса перезапускаются только процессы,
+    шард которых изменился. Упавший процесс перезапускается с тем же
+    шардом.
+    """
+
+    def __init__(self, specs, workers=WORKER_PROCESSES, store_url=None,
+                 target=run_worker):
+        self.specs = {spec['token']: spec for spec in specs}
+        self.store_url = store_url
+        self.target = target
+        self.context = multiprocessing.get_context('fork')
+        self.metrics_queue = self.context.Queue()
+        self.ring = HashRing(f'worker-{index}' for index in range(workers))
+        self.processes = {}
+        self.shards = {}
+        self.metrics = {}
+        self.restarts = 0
+
+    def compute_shards(self):
+        """Токены каждого рабочего процесса по кольцу."""
+        shards = {node: {} for node in self.ring.nodes}
+        for token, spec in self.specs.items():
+            shards[self.ring.node_for(token)][token] = spec
+        return shards
+
+    def _start(self, node):
+        process = self.context.Process(
+            target=self.target, name=node, daemon=True,
+            args=(node, list(self.shards[node].values()),
+                  self.metrics_queue, self.store_url))
+        process.start()
+        self.processes[node] = process
+
+    def _stop(self, node):
+        process = self.processes.pop(node, None)
+        if process is not None and process.is_alive():
+            process.terminate()
+            process.join()
+        self.metrics.pop(node, None)
+
+    def rebalance(self):
+        """Перезапуск процессов, шард которых изменился.
+
+        Сначала останавливаются все затронутые процессы, чтобы их
+        состояние было записано до того, как его прочитает новый владелец.
+        """
+        shards = self.compute_shards()
+        for node in set(self.processes) - set(shards):
+            self._stop(node)
+        changed = [node for node in shards
+                   if shards[node] != self.shards.get(node)
+                   or node not in self.processes]
+        self.shards = shards
+        for node in changed:
+            self._stop(node)
+        for node in changed:
+            self._start(node)
+        return changed
+
+    def start(self):
+        """Запуск всех рабочих процессов."""
+        self.rebalance()
+        return self
+
+    def add_worker(self):
+        """Новый рабочий процесс забирает часть токенов у остальных."""
+        index = 0
+        while f'worker-{index}' in self.ring.nodes:
+            index += 1
+        self.ring.add(f'worker-{index}')
+        return self.rebalance()
+
+    def remove_worker(self, node):
+        """Остановка процесса и раздача его токенов соседям."""
+        self.ring.remove(node)
+        return self.rebalance()
+
+    def monitor_once(self):
+        """Сбор метрик и перезапуск упавших процессов."""
+        while True:
+            try:
+                node, stats = self.metrics_queue.get_nowait()
+            except queue.Empty:
+                break
+            if node in self.processes:
+                self.metrics[node] = stats
+        for node, process in list(self.processes.items()):
+            if not process.is_alive():
+                logging.error(f'{node} завершился с кодом '
+                              f'{process.exitcode}, перезапуск')
+                self.restarts += 1
+                self._start(node)
+
+    def aggregate(self):
+        """Сумма метрик всех процессов."""
+        total = {'workers': len(self.processes), 'restarts': self.restarts}
+        for stats in self.metrics.values():
+            for key, value in stats.items():
+                total[key] = total.get(key, 0) + value
+        return total
+
+    def run(self):
+        """Бесконечный цикл присмотра за процессами."""
+        self.start()
+        reported = time.monotonic()
+        while True:
+            self.monitor_once()
+            if time.monotonic() - reported >= aio.REPORT_PERIOD:
+                logging.info(f'Метрики шардов: {self.aggregate()}')
+                reported = time.monotonic()
+            time.sleep(MONITOR_PERIOD)
+
+    def shutdown(self):
+        """Остановка всех рабочих процессов."""
+        for node in list(self.processes):
+            self._stop(node)
@@ -0,0 +1,135 @@
+import json
+import sqlite3
+import threading
+import time
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0
+
+
+class StateStore:
+    """Хранилище состояния арендаторов между перезапусками."""
+
+    def load(self, tenant):
+        """Восстановление состояния арендатора, True если оно было."""
+        raise NotImplementedError
+
+    def save(self, tenant):
+        """Запись состояния арендатора, может быть отложенной."""
+        raise NotImplementedError
+
+    def flush(self):
+        """Запись отложенных изменений."""
+
+    def flush_if_due(self):
+        """Запись отложенных изменений, если подошел срок."""
+
+    def close(self):
+        """Запись изменений и освобождение ресурсов."""
+        self.flush()
+
+
+class MemoryStore(StateStore):
+    """Хранилище в памяти процесса, для тестов и разовых запусков."""
+
+    def __init__(self):
+        self.states = {}
+
+    def load(self, tenant):
+        """Восстановление состояния арендатора, True если оно было."""
+        state = self.states.get(tenant.token)
+        if state is None:
+            return False
+        tenant.set_state(json.loads(state))
+        return True
+
+    def save(self, tenant):
+        """Запись состояния арендатора."""
+        self.states[tenant.token] = json.dumps(tenant.get_state())
+
+
+class SQLiteStore(StateStore):
+    """SQLite в режиме WAL с пакетной записью изменений.
+
+    save() только запоминает снимок состояния, commit выполняется раз
+    в batch_size изменений или flush_interval секунд.
+    """
+
+    def __init__(self, path, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS tenants ('
+            'token TEXT PRIMARY KEY, chat_id TEXT, state TEXT NOT NULL)')
+        self.connection.commit()
+        self.commits = 0
+        self._dirty = {}
+        self._flushed = time.monotonic()
+        self._lock = threading.Lock()
+
+    def load(self, tenant):
+        """Восстановление состояния арендатора, True если оно было."""
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT state FROM tenants WHERE token = ?', (tenant.token,)
+            ).fetchone()
+        if row is None:
+            return False
+        tenant.set_state(json.loads(row[0]))
+        return True
+
+    def save(self, tenant):
+        """Снимок состояния в пакет на запись."""
+        row = (tenant.token, str(tenant.chat_id),
+               json.dumps(tenant.get_state()))
+        with self._lock:
+            self._dirty[tenant.token] = row
+            full = len(self._dirty) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Запись пакета одной транзакцией."""
+        with self._lock:
+            rows, self._dirty = list(self._dirty.values()), {}
+            self._flushed = time.monotonic()
+            if not rows:
+                return
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT INTO tenants (token, chat_id, state) '
+                    'VALUES (?, ?, ?) ON CONFLICT(token) DO UPDATE SET '
+                    'chat_id = excluded.chat_id, state = excluded.state',
+                    rows)
+            self.commits += 1
+
+    def flush_if_due(self):
+        """Запись пакета, если с прошлой прошло flush_interval секунд."""
+        if time.monotonic() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def close(self):
+        """Запись пакета и закрытие базы."""
+        self.flush()
+        self.connection.close()
+
+
+BACKENDS = {
+    'sqlite': SQLiteStore,
+    'memory': lambda path: MemoryStore(),
+}
+
+
+def open_store(url):
+    """Хранилище по адресу вида 'sqlite:///state.db' или пути к файлу."""
+    scheme, separator, path = url.partition('://')
+    if not separator:
+        scheme, path = 'sqlite', url
+    elif path.startswith('/'):
+        path = path[1:]
+    return BACKENDS[scheme](path)
@@ -0,0 +1,208 @@
+import codecs
+import json
+from datetime import datetime
+
+from models import Homework
+
+CHUNK_SIZE = 64 * 1024
+COMPACT_FIELDS = Homework.__slots__
+WHITESPACE = ' \t\n\r'
+
+_decoder = json.JSONDecoder()
+
+
+def parse_date(value):
+    """Время date_updated в секундах эпохи, None если его нет."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')
+                                      ).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def fallback_date(headers, started):
+    """current_date для ответа, дочитанного не до конца.
+
+    API кладет current_date после списка работ, поэтому при остановке
+    на старых работах он неизвестен. Берется меньшее из заголовка Date
+    и времени отправки запроса: from_date не окажется позже времени
+    сервера, даже если часы расходятся.
+    """
+    from email.utils import parsedate_to_datetime
+
+    try:
+        date = parsedate_to_datetime(headers.get('Date')).timestamp()
+    except (AttributeError, TypeError, ValueError):
+        date = started
+    return int(min(date, started))
+
+
+def compact(homework):
+    """Работа только с полями, нужными для уведомлений."""
+    if not isinstance(homework, dict):
+        return homework
+    return Homework.from_json(homework)
+
+
+class HomeworkParser:
+    """Потоковый разбор ответа API по кускам.
+
+    Работы из списка homeworks разбираются по одной и сжимаются до
+    COMPACT_FIELDS. API отдает работы от новых к старым, поэтому после
+    первой работы с date_updated раньше cursor остальные только
+    пропускаются, а если задан current_date, чтение на этом
+    прекращается и он подставляется вместо current_date ответа. В памяти
+    держится текущий кусок и одна работа.
+    """
+
+    def __init__(self, cursor=0.0, current_date=None):
+        self.cursor = cursor
+        self.current_date = current_date
+        self.stopped = False
+        self.skipped = 0
+        self.size = 0
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._result = {}
+        self._steps = self._parse()
+        self.finished = False
+
+    @property
+    def done(self):
+        """Дальше читать не нужно.
+
+        Разбор закончен или остались только старые работы, а current_date
+        уже известен или подставляется.
+        """
+        return self.finished or self.stopped and (
+            'current_date' in self._result or self.current_date is not None)
+
+    def feed(self, chunk):
+        """Очередной кусок тела ответа."""
+        self.size += len(chunk)
+        self._buffer += self._text.decode(chunk)
+        self._run()
+
+    def close(self):
+        """Конец тела ответа, возвращает разобранный ответ."""
+        self._eof = True
+        self._buffer += self._text.decode(b'', final=True)
+        if not self.done:
+            self._run()
+        if not self.done:
+            raise ValueError('Ответ API оборван')
+        if not self.finished:
+            self._result.setdefault('current_date', self.current_date)
+        return self._result
+
+    def _run(self):
+        if self.finished:
+            return
+        try:
+            next(self._steps)
+        except StopIteration:
+            self.finished = True
+        if self._pos > CHUNK_SIZE:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+    def _skip_ws(self):
+        while True:
+            while (self._pos < len(self._buffer)
+                   and self._buffer[self._pos] in WHITESPACE):
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if self._eof:
+                raise ValueError('Ответ API оборван')
+            yield
+
+    def _value(self):
+        yield from self._skip_ws()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            else:
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            yield
+
+    def _expect(self, char):
+        found = yield from self._skip_ws()
+        if found != char:
+            raise ValueError(f'Ожидался {char!r}, получен {found!r}')
+        self._pos += 1
+
+    def _parse(self):
+        if (yield from self._skip_ws()) != '{':
+            self._result = yield from self._value()
+            return
+        self._pos += 1
+        if (yield from self._skip_ws()) == '}':
+            return
+        while True:
+            key = yield from self._value()
+            yield from self._expect(':')
+            if key == 'homeworks' and (yield from self._skip_ws()) == '[':
+                self._pos += 1
+                self._result[key] = []
+                yield from self._homeworks(self._result[key])
+            elif key in ('homeworks', 'current_date'):
+                self._result[key] = yield from self._value()
+            else:
+                yield from self._value()
+            if (yield from self._skip_ws()) == '}':
+                return
+            yield from self._expect(',')
+
+    def _homeworks(self, records):
+        if (yield from self._skip_ws()) == ']':
+            self._pos += 1
+            return
+        while True:
+            homework = yield from self._value()
+            if self.stopped:
+                self.skipped += 1
+            else:
+                date = parse_date(homework.get('date_updated')
+                                  if isinstance(homework, dict) else None)
+                if self.cursor and date is not None and date < self.cursor:
+                    self.stopped = True
+                    self.skipped += 1
+                else:
+                    records.append(compact(homework))
+            if (yield from self._skip_ws()) == ']':
+                self._pos += 1
+                return
+            yield from self._expect(',')
+
+
+def parse_chunks(chunks, cursor=0.0, current_date=None):
+    """Разбор ответа из итератора кусков, возвращает (ответ, парсер).
+
+    Чтение прекращается, как только оставшаяся часть не нужна.
+    """
+    parser = HomeworkParser(cursor, current_date)
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.done:
+            break
+    return parser.close(), parser
+
+
+async def parse_async(chunks, cursor=0.0, current_date=None):
+    """То же, что parse_chunks, для асинхронного итератора кусков."""
+    parser = HomeworkParser(cursor, current_date)
+    async for chunk in chunks:
+        parser.feed(chunk)
+        if parser.done:
+            break
+    return parser.close(), parser
@@ -0,0 +1,221 @@
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from messages import DEFAULT_LOCALE
+from models import Status
+
+_current_tenant = ContextVar('current_tenant', default=None)
+
+
+def chat_key(chat_id):
+    """chat_id одного типа: число для числовых id, иначе строка.
+
+    В tenants.json и состоянии id чата может прийти строкой, а из
+    webhook - числом; без приведения один чат стал бы двумя подписчиками.
+    """
+    try:
+        return int(chat_id)
+    except (TypeError, ValueError):
+        return str(chat_id)
+
+
+class Tenant:
+    """Состояние опроса API для пары (PRACTICUM_TOKEN, chat_id).
+
+    __slots__ вместо __dict__ экономит память при сотнях тысяч
+    арендаторов; статусы хранятся членами Status.
+    """
+
+    __slots__ = ('token', 'chat_id', 'timestamp', 'statuses',
+                 'last_message', 'old_error_message', 'last_status',
+                 'last_change', 'etag', 'last_modified', 'body_hash',
+                 'body_size', 'validators', 'failures', 'muted', 'next_poll', 'polls',
+                 'cursor', 'locale', 'due_at', 'subscribers')
+
+    STATE_FIELDS = ('timestamp', 'statuses', 'last_message',
+                    'old_error_message', 'last_status', 'last_change',
+                    'muted', 'cursor', 'locale', 'due_at', 'subscribers')
+
+    def __init__(self, token, chat_id, timestamp=None,
+                 locale=DEFAULT_LOCALE):
+        self.token = token
+        self.chat_id = chat_id
+        self.timestamp = int(time.time()) if timestamp is None else timestamp
+        self.statuses = {}
+        self.last_message = None
+        self.old_error_message = None
+        self.last_status = None
+        self.last_change = 0.0
+        self.etag = None
+        self.last_modified = None
+        self.body_hash = None
+        self.body_size = 0
+        self.validators = None
+        self.failures = 0
+        self.muted = False
+        self.next_poll = 0.0
+        self.polls = 0
+        self.cursor = 0.0
+        self.locale = locale
+        self.due_at = 0.0
+        self.subscribers = set()
+
+    @property
+    def headers(self):
+        """Заголовки запроса к API, собираются при каждом обращении."""
+        return {'Authorization': f'OAuth {self.token}'}
+
+    @property
+    def chats(self):
+        """Чат владельца и чаты подписчиков."""
+        return (self.chat_id, *self.subscribers)
+
+    def spec(self):
+        """Настройки арендатора из tenants.json для передачи в процессы."""
+        return {'token': self.token, 'chat_id': self.chat_id,
+                'locale': self.locale,
+                'subscribers': list(self.subscribers)}
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Арендатор по словарю настроек вида Tenant.spec()."""
+        tenant = cls(spec['token'], spec['chat_id'],
+                     locale=spec.get('locale', DEFAULT_LOCALE))
+        tenant.subscribers.update(
+            chat_key(chat_id) for chat_id in spec.get('subscribers', ())
+            if str(chat_id) != str(tenant.chat_id))
+        return tenant
+
+    def get_state(self):
+        """Сохраняемая часть состояния."""
+        state = {field: getattr(self, field) for field in self.STATE_FIELDS}
+        state['subscribers'] = list(self.subscribers)
+        return state
+
+    def set_state(self, state):
+        """Восстановление состояния, сохраненного get_state().
+
+        Подписчики из состояния добавляются к уже заданным.
+        """
+        configured = self.subscribers
+        for field in self.STATE_FIELDS:
+            if field in state:
+                setattr(self, field, state[field])
+        self.statuses = {key: Status.parse(value)
+                         for key, value in self.statuses.items()}
+        self.last_status = Status.parse(self.last_status)
+        self.subscribers = configured | {
+            chat_key(chat_id) for chat_id in self.subscribers}
+
+    def __repr__(self):
+        return f'Tenant(chat_id={self.chat_id!r})'
+
+
+class TenantRegistry:
+    """Реестр арендаторов, ключ - PRACTICUM_TOKEN.
+
+    Кроме владельца (chat_id) на арендатора могут подписаться другие
+    чаты; индекс чатов учитывает и их.
+    """
+
+    def __init__(self, tenants=()):
+        self._tenants = {}
+        self._by_chat = {}
+        for tenant in tenants:
+            self.add(tenant)
+
+    def add(self, tenant):
+        """Добавление арендатора, повторный токен заменяет старый."""
+        self.remove(tenant.token)
+        self._tenants[tenant.token] = tenant
+        self.index(tenant)
+        return tenant
+
+    def index(self, tenant):
+        """Внесение чатов арендатора в индекс, например после загрузки."""
+        for chat_id in tenant.chats:
+            self._by_chat.setdefault(str(chat_id), set()).add(tenant.token)
+
+    def _unindex(self, token, chat_id):
+        tokens = self._by_chat.get(str(chat_id))
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_chat[str(chat_id)]
+
+    def remove(self, token):
+        """Удаление арендатора по токену."""
+        tenant = self._tenants.pop(token, None)
+        if tenant is not None:
+            for chat_id in tenant.chats:
+                self._unindex(token, chat_id)
+        return tenant
+
+    def subscribe(self, token, chat_id):
+        """Подписка чата на арендатора, None если токена нет."""
+        tenant = self._tenants.get(token)
+        if tenant is not None and str(chat_id) != str(tenant.chat_id):
+            tenant.subscribers.add(chat_key(chat_id))
+            self._by_chat.setdefault(str(chat_id), set()).add(token)
+        return tenant
+
+    def unsubscribe(self, token, chat_id):
+        """Отписка чата-подписчика, True если он был подписан."""
+        tenant = self._tenants.get(token)
+        chat_id = chat_key(chat_id)
+        if tenant is None or chat_id not in tenant.subscribers:
+            return False
+        tenant.subscribers.discard(chat_id)
+        self._unindex(token, chat_id)
+        return True
+
+    def subscribers(self, token):
+        """Все чаты, получающие уведомления арендатора."""
+        tenant = self._tenants.get(token)
+        return tenant.chats if tenant is not None else ()
+
+    def get(self, token):
+        """Арендатор по токену или None."""
+        return self._tenants.get(token)
+
+    def by_chat(self, chat_id):
+        """Арендаторы, уведомления которых приходят в чат."""
+        return [self._tenants[token]
+                for token in self._by_chat.get(str(chat_id), ())]
+
+    def __len__(self):
+        return len(self._tenants)
+
+    def __iter__(self):
+        return iter(list(self._tenants.values()))
+
+    def __contains__(self, token):
+        return token in self._tenants
+
+    @classmethod
+    def load(cls, path):
+        """Загрузка реестра из JSON-файла вида [{"token", "chat_id"}].
+
+        Необязательный ключ "locale" задает язык уведомлений, а
+        "subscribers" - список чатов-подписчиков.
+        """
+        with open(path, encoding='utf-8') as file:
+            items = json.load(file)
+        return cls(Tenant.from_spec(item) for item in items)
+
+
+def current_tenant():
+    """Арендатор, опрос которого выполняется в текущем контексте."""
+    return _current_tenant.get()
+
+
+@contextmanager
+def use_tenant(tenant):
+    """Делает арендатора текущим для get_api_answer и send_message."""
+    token = _current_tenant.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _current_tenant.reset(token)
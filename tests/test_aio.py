@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+
+def make_fake_app(answer, status=200):
+    sent = []
+
+    async def homework_statuses(request):
+        assert request.headers['Authorization'].startswith('OAuth ')
+        assert 'from_date' in request.query
+        return web.json_response(answer, status=status)
+
+    async def send_message(request):
+        sent.append(await request.json())
+        return web.json_response({'ok': True})
+
+    app = web.Application()
+    app.router.add_get('/api/', homework_statuses)
+    app.router.add_post('/bottoken/sendMessage', send_message)
+    return app, sent
+
+
+def run_poll(monkeypatch, homework_module, tenant, answer, status=200):
+    import aio
+
+    app, sent = make_fake_app(answer, status)
+
+    async def scenario():
+        async with TestServer(app) as server, ClientSession() as session:
+            base_url = str(server.make_url('')).rstrip('/')
+            monkeypatch.setattr(homework_module, 'ENDPOINT',
+                                f'{base_url}/api/')
+            bot = aio.AsyncBot(session, 'token', base_url=base_url)
+            await aio.poll_tenant_async(session, bot, tenant)
+
+    asyncio.run(scenario())
+    return sent
+
+
+class TestAsyncPolling:
+
+    def test_new_status_is_sent(self, monkeypatch, homework_module):
+        from tenants import Tenant
+
+        tenant = Tenant('a', 42, timestamp=0)
+        answer = {'homeworks': [{'homework_name': 'hw1',
+                                 'status': 'reviewing'}],
+                  'current_date': 5}
+        sent = run_poll(monkeypatch, homework_module, tenant, answer)
+        assert sent[0]['chat_id'] == 42
+        assert sent[0]['text'].endswith(
+            homework_module.HOMEWORK_VERDICTS['reviewing'])
+        assert run_poll(monkeypatch, homework_module, tenant, answer) == []
+        assert tenant.timestamp == 5
+
+    def test_not_ok_status_reported_once(self, monkeypatch, homework_module):
+        from tenants import Tenant
+
+        tenant = Tenant('a', 42)
+        sent = run_poll(monkeypatch, homework_module, tenant, {}, status=500)
+        assert len(sent) == 1 and '500' in sent[0]['text']
+        assert run_poll(monkeypatch, homework_module, tenant, {},
+                        status=500) == []
+
+    def test_send_queue_limits_and_retry_after(self, homework_module):
+        import aio
+        from exceptions import BotApiError
+        from ratelimit import ERROR_PREFIX
+
+        sent = []
+
+        class Bot:
+            async def send_message(self, chat_id, text):
+                if not sent:
+                    sent.append(None)
+                    raise BotApiError('Too Many Requests', 429, 0.05)
+                sent.append((chat_id, text, time.monotonic()))
+
+        async def scenario():
+            queue = aio.AsyncSendQueue(Bot(), chat_rate=20,
+                                       chat_burst=1).start()
+            bot = aio.AsyncQueuedBot(queue)
+            await bot.send_message(1, ERROR_PREFIX + 'сбой')
+            await bot.send_message(1, 'статус 1')
+            await bot.send_message(1, 'статус 2')
+            started = time.monotonic()
+            await queue.stop(timeout=5)
+            return started
+
+        started = asyncio.run(scenario())
+        texts = [text for _, text, _ in sent[1:]]
+        assert texts == ['статус 1', 'статус 2', ERROR_PREFIX + 'сбой']
+        assert sent[1][2] - started >= 0.04
+        assert sent[3][2] - sent[2][2] >= 0.04
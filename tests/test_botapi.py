@@ -0,0 +1,82 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+@pytest.fixture
+def bot_api():
+    sent = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(
+                int(self.headers['Content-Length'])))
+            sent.append(payload)
+            if payload['chat_id'] == 429:
+                status, reply = 429, {
+                    'ok': False, 'error_code': 429,
+                    'description': 'Too Many Requests',
+                    'parameters': {'retry_after': 3}}
+            else:
+                status, reply = 200, {'ok': True, 'result': {
+                    'message_id': len(sent), 'text': payload['text']}}
+            body = json.dumps(reply).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}', sent
+    server.shutdown()
+    server.server_close()
+
+
+class TestBotClient:
+
+    def test_send_message_and_errors(self, bot_api):
+        from botapi import BotClient
+        from exceptions import BotApiError
+
+        url, sent = bot_api
+        client = BotClient('token', base_url=url, pool_size=2)
+        assert client.send_message(chat_id=1, text='привет')['text'] == (
+            'привет')
+        with pytest.raises(BotApiError) as error:
+            client.send_message(chat_id=429, text='много')
+        assert error.value.error_code == 429
+        assert error.value.retry_after == 3
+        client.close()
+        assert [item['chat_id'] for item in sent] == [1, 429]
+
+    def test_send_many_keeps_order(self, bot_api):
+        from botapi import BotClient
+        from exceptions import BotApiError
+
+        url, sent = bot_api
+        client = BotClient('token', base_url=url, pool_size=4)
+        results = client.send_many(
+            [(chat, f'text {chat}') for chat in (1, 2, 429, 3)])
+        client.close()
+        assert [result['text'] for result in results
+                if not isinstance(result, BotApiError)] == [
+            'text 1', 'text 2', 'text 3']
+        assert isinstance(results[2], BotApiError)
+        assert len(sent) == 4
+
+    def test_failed_send_is_logged(self, caplog, homework_module):
+        from botapi import BotClient
+
+        client = BotClient('token', base_url='http://127.0.0.1:9',
+                           timeout=1)
+        homework_module.send_message(client, 'сообщение')
+        assert 'не отправленно' in caplog.text
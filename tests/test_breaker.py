@@ -0,0 +1,164 @@
+import pytest
+import requests
+
+import utils
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold_and_fails_fast(self):
+        from breaker import OPEN, CircuitBreaker
+        from exceptions import CircuitOpenError
+
+        circuit = CircuitBreaker(failure_threshold=3, clock=utils.FakeClock())
+        for _ in range(3):
+            circuit.check()
+            circuit.record_status(503)
+        assert circuit.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            circuit.check()
+        assert circuit.transitions == {'closed->open': 1}
+
+    def test_half_open_probe(self):
+        from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+        from exceptions import CircuitOpenError
+
+        clock = utils.FakeClock()
+        circuit = CircuitBreaker(failure_threshold=1, reset_timeout=60,
+                                 clock=clock)
+        circuit.record_failure()
+        clock.now = 60
+        circuit.check()
+        assert circuit.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            circuit.check()
+        circuit.record_failure()
+        assert circuit.state == OPEN and circuit.retry_in() == 60
+        clock.now = 120
+        circuit.check()
+        circuit.record_status(200)
+        assert circuit.state == CLOSED
+        assert circuit.transitions['half_open->closed'] == 1
+
+    def test_client_errors_do_not_trip(self):
+        from breaker import CLOSED, CircuitBreaker
+
+        circuit = CircuitBreaker(failure_threshold=1)
+        circuit.record_status(401)
+        assert circuit.state == CLOSED
+
+    def test_get_api_answer_fails_fast(self, monkeypatch, homework_module):
+        import breaker
+        import metrics
+        from exceptions import CircuitOpenError
+
+        calls = []
+
+        def broken_get(*args, **kwargs):
+            calls.append(1)
+            raise requests.ConnectionError('down')
+
+        monkeypatch.setattr(requests, 'get', broken_get)
+        breaker.install(breaker.CircuitBreaker(failure_threshold=2))
+        try:
+            for _ in range(2):
+                with pytest.raises(homework_module.KirillTeleBotError):
+                    homework_module.get_api_answer(0)
+            observed = metrics.API_LATENCY.count
+            with pytest.raises(CircuitOpenError):
+                homework_module.get_api_answer(0)
+        finally:
+            breaker.install(None)
+        assert len(calls) == 2
+        assert metrics.API_LATENCY.count == observed
+
+    def test_async_probe_is_released_on_broken_body(self, homework_module):
+        import asyncio
+
+        from aiohttp import ClientSession, web
+        from aiohttp.test_utils import TestServer
+
+        import aio
+        import breaker
+        from breaker import OPEN, CircuitBreaker
+        from tenants import Tenant
+
+        async def truncated(request):
+            return web.Response(body=b'{"homeworks": [{"id": 1, "sta')
+
+        app = web.Application()
+        app.router.add_get('/api/', truncated)
+        clock = utils.FakeClock()
+        circuit = breaker.install(CircuitBreaker(failure_threshold=1,
+                                                 clock=clock))
+        circuit.record_failure()
+        clock.now = circuit.reset_timeout
+
+        async def scenario():
+            async with TestServer(app) as server, ClientSession() as session:
+                homework_module.ENDPOINT = str(server.make_url('/api/'))
+                with pytest.raises(ValueError):
+                    await aio.get_api_answer_async(
+                        session, Tenant('token', 1), 0, cursor=0.0)
+
+        endpoint = homework_module.ENDPOINT
+        try:
+            asyncio.run(scenario())
+        finally:
+            homework_module.ENDPOINT = endpoint
+            breaker.install(None)
+        assert circuit.state == OPEN and not circuit._probing
+
+
+class TestBackoff:
+
+    def test_backoff_grows_and_is_capped(self):
+        from breaker import backoff_delay
+
+        def top(failures):
+            return backoff_delay(failures, base=10, cap=100, rand=lambda: 1)
+
+        assert top(1) == 30
+        assert top(2) == 50
+        assert top(10) == 110
+        assert backoff_delay(5, base=10, rand=lambda: 0) == 10
+
+    def test_failed_tenant_is_backed_off(self, monkeypatch):
+        import engine
+        from intervals import FixedInterval
+        from tenants import Tenant, TenantRegistry
+
+        def broken_get(*args, **kwargs):
+            raise requests.ConnectionError('down')
+
+        monkeypatch.setattr(requests, 'get', broken_get)
+        tenant = Tenant('token', 1)
+        runner = engine.Engine(utils.MockTelegramBot(),
+                               TenantRegistry([tenant]), workers=1,
+                               interval=FixedInterval(10 ** 6))
+        runner.tick(now=0)
+        runner.shutdown()
+        assert tenant.failures == 1
+        assert tenant.next_poll < 10 ** 5
+
+    def test_open_circuit_is_not_reported(self, monkeypatch,
+                                          homework_module):
+        import breaker
+        from tenants import Tenant
+
+        def broken_get(*args, **kwargs):
+            raise requests.ConnectionError('down')
+
+        monkeypatch.setattr(requests, 'get', broken_get)
+        breaker.install(breaker.CircuitBreaker(failure_threshold=1))
+        bot = utils.MockTelegramBot()
+        sent = []
+        bot.send_message = lambda chat_id, text: sent.append(text)
+        tenants = [Tenant(f'token-{index}', index) for index in range(3)]
+        try:
+            for tenant in tenants:
+                homework_module.poll_tenant(bot, tenant)
+        finally:
+            breaker.install(None)
+        assert len(sent) == 1
+        assert [tenant.failures for tenant in tenants] == [1, 1, 1]
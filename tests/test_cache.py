@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+import utils
+
+
+class TestResponseCache:
+
+    def test_ttl_expiry(self):
+        from cache import ResponseCache
+
+        clock = utils.FakeClock()
+        cache = ResponseCache(ttl=10, clock=clock)
+        cache.put(('t', 0), {'homeworks': []})
+        assert cache.get(('t', 0)) == {'homeworks': []}
+        clock.now = 10
+        assert cache.get(('t', 0)) is None
+        assert cache.stats.as_dict() == {
+            'hits': 1, 'misses': 1, 'coalesced': 0,
+            'evictions': 0, 'expirations': 1}
+
+    def test_lru_eviction_and_memory_cap(self):
+        from cache import ResponseCache
+
+        cache = ResponseCache(max_entries=2, max_bytes=100)
+        cache.put('a', 1, size=10)
+        cache.put('b', 2, size=10)
+        cache.get('a')
+        cache.put('c', 3, size=10)
+        assert cache.get('b') is None and cache.get('a') == 1
+        cache.put('d', 4, size=95)
+        assert len(cache) == 1 and cache.size == 95
+        assert cache.stats.evictions == 3
+        cache.put('huge', 5, size=1000)
+        assert cache.get('huge') is None
+
+    def test_concurrent_requests_are_coalesced(self):
+        from cache import ResponseCache
+
+        cache = ResponseCache()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {'homeworks': []}
+
+        async def scenario():
+            return await asyncio.gather(
+                *(cache.get_or_fetch(('t', 0), fetch) for _ in range(100)))
+
+        results = asyncio.run(scenario())
+        assert len(calls) == 1
+        assert all(result == {'homeworks': []} for result in results)
+        assert cache.stats.coalesced == 99
+
+    def test_errors_are_shared_and_not_cached(self):
+        from cache import ResponseCache
+
+        cache = ResponseCache()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise RuntimeError('down')
+
+        async def scenario():
+            return await asyncio.gather(
+                *(cache.get_or_fetch('k', fetch) for _ in range(3)),
+                return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        assert len(calls) == 1
+        assert all(isinstance(result, RuntimeError) for result in results)
+        with pytest.raises(RuntimeError):
+            asyncio.run(cache.get_or_fetch('k', fetch))
+        assert len(calls) == 2
+
+    def test_cancelled_leader_releases_waiters(self):
+        from cache import ResponseCache
+        from exceptions import KirillTeleBotError
+
+        cache = ResponseCache()
+
+        async def fetch():
+            await asyncio.sleep(10)
+
+        async def scenario():
+            leader = asyncio.ensure_future(cache.get_or_fetch('k', fetch))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(cache.get_or_fetch('k', fetch))
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(leader, 0.01)
+            with pytest.raises(KirillTeleBotError):
+                await asyncio.wait_for(waiter, 1)
+
+        asyncio.run(scenario())
@@ -0,0 +1,125 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ANSWER = {'homeworks': [{'homework_name': 'hw', 'status': 'approved'}]}
+
+
+class ValidatorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    etag = '"v1"'
+    current_date = 100
+
+    def do_GET(self):
+        if self.etag and self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        type(self).current_date += 1
+        body = json.dumps(
+            dict(ANSWER, current_date=self.current_date)).encode()
+        self.send_response(200)
+        if self.etag:
+            self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def serve(monkeypatch, homework_module):
+    servers = []
+
+    def start(etag):
+        handler = type('Handler', (ValidatorHandler,), {'etag': etag})
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setattr(homework_module, 'ENDPOINT',
+                            f'http://127.0.0.1:{server.server_address[1]}/')
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+class TestConditionalRequests:
+
+    def test_etag_short_circuits_on_304(self, serve, homework_module):
+        from conditional import STATS, NotModified
+        from tenants import Tenant, use_tenant
+
+        serve('"v1"')
+        tenant = Tenant('token', 1, timestamp=0)
+        before = STATS.not_modified
+        with use_tenant(tenant):
+            first = homework_module.get_api_answer(0)
+            homework_module.process_response(tenant, first)
+            second = homework_module.get_api_answer(0)
+        assert first['homeworks'] == ANSWER['homeworks']
+        assert tenant.etag == '"v1"'
+        assert isinstance(second, NotModified)
+        assert STATS.not_modified == before + 1
+
+    def test_identical_body_short_circuits(self, serve, homework_module):
+        from conditional import STATS, NotModified
+        from tenants import Tenant, use_tenant
+
+        serve(None)
+        tenant = Tenant('token', 1, timestamp=0)
+        before = STATS.identical, STATS.bytes_saved
+        with use_tenant(tenant):
+            homework_module.process_response(
+                tenant, homework_module.get_api_answer(0))
+            second = homework_module.get_api_answer(0)
+        assert isinstance(second, NotModified)
+        assert second.current_date > ValidatorHandler.current_date
+        assert STATS.identical == before[0] + 1
+        assert STATS.bytes_saved > before[1]
+
+    def test_poll_tenant_skips_unchanged(self, serve, homework_module):
+        from tenants import Tenant
+
+        serve('"v1"')
+        sent = []
+
+        class Bot:
+            def send_message(self, chat_id, text):
+                sent.append(text)
+
+        tenant = Tenant('token', 1, timestamp=0)
+        homework_module.poll_tenant(Bot(), tenant)
+        homework_module.poll_tenant(Bot(), tenant)
+        assert len(sent) == 1
+
+    @pytest.mark.parametrize('etag', ['"v1"', None])
+    def test_failed_answer_is_not_remembered(self, serve, homework_module,
+                                             monkeypatch, etag):
+        from conditional import NotModified
+        from tenants import Tenant, use_tenant
+
+        serve(etag)
+        sent = []
+
+        class Bot:
+            def send_message(self, chat_id, text):
+                sent.append(text)
+
+        def broken(response):
+            raise TypeError('Ответ API не является словарем')
+
+        tenant = Tenant('token', 1, timestamp=0)
+        check_response = homework_module.check_response
+        monkeypatch.setattr(homework_module, 'check_response', broken)
+        homework_module.poll_tenant(Bot(), tenant)
+        assert tenant.etag is None and tenant.body_hash is None
+        monkeypatch.setattr(homework_module, 'check_response',
+                            check_response)
+        with use_tenant(tenant):
+            answer = homework_module.get_api_answer(0)
+        assert not isinstance(answer, NotModified)
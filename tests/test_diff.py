@@ -0,0 +1,80 @@
+def answer(*homeworks, current_date=100):
+    return {'homeworks': list(homeworks), 'current_date': current_date}
+
+
+class TestHomeworkDiff:
+
+    def test_every_transition_in_window_is_reported(self, homework_module):
+        from models import Status
+        from tenants import Tenant
+
+        tenant = Tenant('token', 1, timestamp=0)
+        messages = homework_module.process_response(tenant, answer(
+            {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing'},
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+        ))
+        assert len(messages) == 2
+        assert '"hw1"' in messages[0] and '"hw2"' in messages[1]
+        assert tenant.statuses == {'1': Status.APPROVED,
+                                   '2': Status.REVIEWING}
+        assert tenant.timestamp == 100
+
+    def test_only_changed_homeworks_are_reported(self, homework_module):
+        from models import Status
+        from tenants import Tenant
+
+        tenant = Tenant('token', 1, timestamp=0)
+        tenant.statuses = {'1': Status.APPROVED, '2': Status.REVIEWING}
+        messages = homework_module.process_response(tenant, answer(
+            {'id': 2, 'homework_name': 'hw2', 'status': 'rejected'},
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+        ))
+        assert len(messages) == 1 and '"hw2"' in messages[0]
+        assert homework_module.process_response(tenant, answer()) == []
+
+    def test_not_accepted_notice_sent_once(self, homework_module):
+        from tenants import Tenant
+
+        tenant = Tenant('token', 1, timestamp=0)
+        first = homework_module.process_response(tenant, answer())
+        assert first == [homework_module.NOT_ACCEPTED_MESSAGE]
+        assert homework_module.process_response(tenant, answer()) == []
+
+    def test_bad_homework_does_not_drop_valid_events(self, homework_module):
+        from models import Status
+        from tenants import Tenant
+
+        tenant = Tenant('token', 1, timestamp=0)
+        messages = homework_module.process_response(tenant, answer(
+            {'id': 2, 'homework_name': 'hw2', 'status': 'weird'},
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+        ))
+        assert len(messages) == 2 and '"hw1"' in messages[0]
+        assert messages[1].startswith(
+            homework_module.ERROR_MESSAGE.format(''))
+        assert tenant.statuses == {'1': Status.APPROVED}
+        assert tenant.timestamp == 100 and tenant.failures == 0
+        assert homework_module.process_response(tenant, answer(
+            {'id': 2, 'homework_name': 'hw2', 'status': 'weird'},
+            current_date=200)) == []
+        assert tenant.timestamp == 200
+        assert homework_module.process_response(tenant, answer(
+            {'id': 2, 'homework_name': 'hw2', 'status': 'rejected'},
+            current_date=300,
+        )) == [homework_module.parse_status(
+            {'homework_name': 'hw2', 'status': 'rejected'})]
+        assert tenant.timestamp == 300
+
+    def test_homework_without_key_is_skipped(self, homework_module):
+        from models import Status
+        from tenants import Tenant
+
+        tenant = Tenant('token', 1, timestamp=0)
+        messages = homework_module.process_response(tenant, answer(
+            {'status': 'approved'},
+            {'id': 1, 'homework_name': 'a', 'status': 'approved'},
+        ))
+        assert len(messages) == 2 and '"a"' in messages[0]
+        assert messages[1].startswith(
+            homework_module.ERROR_MESSAGE.format(''))
+        assert tenant.statuses == {'1': Status.APPROVED}
@@ -0,0 +1,28 @@
+class TestCoalescer:
+
+    def test_window_is_extended_up_to_max_delay(self):
+        from digest import Coalescer
+
+        coalescer = Coalescer(window=10, max_delay=25)
+        assert coalescer.add(1, 'a', now=0) == 10
+        assert coalescer.add(1, 'b', now=8) == 18
+        assert coalescer.add(1, 'c', now=17) == 25
+        assert coalescer.add(2, 'x', now=17) == 27
+        assert coalescer.pop_due(24) == []
+        assert coalescer.pop_due(25) == [(1, 'a\nb\nc')]
+        assert coalescer.next_due() == 27 and len(coalescer) == 1
+        assert coalescer.pop_all() == [(2, 'x')]
+        assert coalescer.merged == 2 and coalescer.next_due() is None
+
+    def test_chat_window_and_message_limit(self):
+        from digest import Coalescer, join
+
+        assert join(['aaaa', 'bbbb', 'cc'], limit=9) == ['aaaa\nbbbb', 'cc']
+        assert join(['a' * 20], limit=9) == ['a' * 20]
+        coalescer = Coalescer(window=60, limit=9)
+        coalescer.set_window(7, 0)
+        coalescer.add(7, 'aaaa', now=0)
+        coalescer.add(7, 'bbbb', now=0)
+        coalescer.add(7, 'cc', now=0)
+        assert coalescer.pop_due(0) == [(7, 'aaaa\nbbbb'), (7, 'cc')]
+        assert coalescer.merged == 1
@@ -0,0 +1,125 @@
+import json
+
+import requests
+
+import utils
+
+
+def mock_get_by_token(answers):
+    def mocked_get(url, headers=None, params=None, **kwargs):
+        token = headers['Authorization'].split()[1]
+        response = utils.MockResponseGET(random_timestamp=params['from_date'])
+        response.json = lambda: answers[token]
+        return response
+    return mocked_get
+
+
+class TestEngine:
+
+    def test_registry_load(self, tmp_path):
+        from tenants import TenantRegistry
+
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'token': 'a', 'chat_id': 1},
+            {'token': 'b', 'chat_id': 2},
+        ]))
+        registry = TenantRegistry.load(path)
+        assert len(registry) == 2
+        assert registry.get('b').chat_id == 2
+        assert registry.get('a').headers == {'Authorization': 'OAuth a'}
+
+    def test_poll_tenant_keeps_state_per_tenant(self, monkeypatch,
+                                                homework_module):
+        from models import Status
+        from tenants import Tenant
+
+        answers = {
+            'a': {'homeworks': [{'homework_name': 'hw1',
+                                 'status': 'approved'}],
+                  'current_date': 10},
+            'b': {'homeworks': [{'homework_name': 'hw2',
+                                 'status': 'rejected'}],
+                  'current_date': 10},
+        }
+        monkeypatch.setattr(requests, 'get', mock_get_by_token(answers))
+        bot = utils.MockTelegramBot()
+        first, second = Tenant('a', 1, timestamp=0), Tenant('b', 2,
+                                                           timestamp=0)
+
+        homework_module.poll_tenant(bot, first)
+        assert bot.chat_id == 1 and 'hw1' in bot.text
+        homework_module.poll_tenant(bot, second)
+        assert bot.chat_id == 2 and 'hw2' in bot.text
+        assert first.statuses == {'hw1': Status.APPROVED}
+        assert second.statuses == {'hw2': Status.REJECTED}
+
+        bot.text = None
+        homework_module.poll_tenant(bot, first)
+        assert bot.text is None, 'Повторный статус не должен отправляться'
+        assert first.timestamp == 10
+
+    def test_poll_tenant_error_sent_once(self, monkeypatch, homework_module):
+        from tenants import Tenant
+
+        def broken_get(*args, **kwargs):
+            raise requests.RequestException('down')
+
+        monkeypatch.setattr(requests, 'get', broken_get)
+        sent = []
+        bot = utils.MockTelegramBot()
+        bot.send_message = lambda chat_id, text: sent.append(text)
+        tenant = Tenant('a', 1)
+        homework_module.poll_tenant(bot, tenant)
+        homework_module.poll_tenant(bot, tenant)
+        assert len(sent) == 1 and 'down' in sent[0]
+
+    def test_engine_tick_polls_only_due(self, monkeypatch):
+        import engine
+        from tenants import Tenant, TenantRegistry
+
+        polled = []
+        monkeypatch.setattr(engine.homework, 'poll_tenant',
+                            lambda bot, tenant: polled.append(tenant.token))
+        registry = TenantRegistry(Tenant(str(i), i) for i in range(100))
+        registry.get('5').next_poll = float('inf')
+        runner = engine.Engine(utils.MockTelegramBot(), registry, workers=4)
+        assert runner.tick(now=0) == 99
+        runner.shutdown()
+        assert sorted(polled) == sorted(str(i) for i in range(100) if i != 5)
+        assert all(tenant.next_poll > 0 for tenant in registry)
+
+    def test_poll_due_respects_saved_due_time(self, monkeypatch, tmp_path):
+        import engine
+        from storage import open_store
+        from tenants import Tenant, TenantRegistry
+
+        polled = []
+        monkeypatch.setattr(engine.homework, 'poll_tenant',
+                            lambda bot, tenant: polled.append(tenant.token))
+        url = f'sqlite:///{tmp_path}/state.db'
+
+        def run():
+            registry = TenantRegistry(Tenant(str(i), i) for i in range(10))
+            runner = engine.Engine(utils.MockTelegramBot(), registry,
+                                   workers=4, store=open_store(url))
+            count = runner.poll_due()
+            runner.shutdown()
+            runner.store.close()
+            return count
+
+        assert run() == 10 and len(polled) == 10
+        assert run() == 0 and len(polled) == 10
+
+    def test_startup_skips_heavy_imports(self):
+        import os
+        import subprocess
+        import sys
+
+        heavy = ('telegram', 'aiohttp', 'requests')
+        result = subprocess.run(
+            [sys.executable, '-c', 'import sys, engine; print(*(name for '
+             f'name in {heavy!r} if name in sys.modules))'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == ''
@@ -0,0 +1,84 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({'homeworks': [], 'current_date': 1}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HangingHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        time.sleep(2)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/'
+    server.shutdown()
+
+
+class TestHttpPool:
+
+    def test_connections_are_reused(self, local_server):
+        from http_pool import HttpPool
+
+        pool = HttpPool(size=2, per_host=2)
+        for _ in range(5):
+            assert pool.get(local_server).json()['current_date'] == 1
+        assert pool.stats() == {'requests': 5, 'misses': 1, 'hits': 4}
+        pool.close()
+
+    def test_get_api_answer_uses_installed_pool(self, monkeypatch,
+                                                local_server,
+                                                homework_module):
+        import http_pool
+
+        def forbidden_get(*args, **kwargs):
+            raise AssertionError('Запрос должен идти через пул')
+
+        monkeypatch.setattr(requests, 'get', forbidden_get)
+        monkeypatch.setattr(homework_module, 'ENDPOINT', local_server)
+        pool = http_pool.install(http_pool.HttpPool())
+        try:
+            homework_module.get_api_answer(0)
+            homework_module.get_api_answer(0)
+        finally:
+            http_pool.install(None)
+        assert pool.stats()['hits'] == 1
+
+    def test_hung_request_times_out(self):
+        from http_pool import HttpPool
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), HangingHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        pool = HttpPool(timeout=0.2)
+        started = time.monotonic()
+        try:
+            with pytest.raises(requests.Timeout):
+                pool.get(f'http://127.0.0.1:{server.server_address[1]}/')
+        finally:
+            pool.close()
+            server.shutdown()
+        assert time.monotonic() - started < 1.5
@@ -0,0 +1,61 @@
+import time
+
+BASE_NOON = time.mktime((2024, 3, 5, 12, 0, 0, 0, 0, -1))
+BASE_NIGHT = time.mktime((2024, 3, 5, 3, 0, 0, 0, 0, -1))
+
+
+def make_tenant(status, last_change=0.0):
+    from tenants import Tenant
+
+    tenant = Tenant('token', 1, timestamp=0)
+    tenant.last_status = status
+    tenant.last_change = last_change
+    return tenant
+
+
+class TestAdaptiveInterval:
+
+    def test_reviewing_polled_more_often_than_approved(self):
+        from intervals import AdaptiveInterval
+
+        policy = AdaptiveInterval(jitter=0)
+        reviewing = policy.next_interval(make_tenant('reviewing'), BASE_NOON)
+        approved = policy.next_interval(
+            make_tenant('approved', BASE_NOON - 60), BASE_NOON)
+        assert reviewing < approved
+
+    def test_stale_and_night_intervals_grow(self):
+        from intervals import AdaptiveInterval
+
+        policy = AdaptiveInterval(jitter=0, max_interval=10 ** 6)
+        fresh = policy.next_interval(
+            make_tenant('approved', BASE_NOON - 60), BASE_NOON)
+        stale = policy.next_interval(
+            make_tenant('approved', BASE_NOON - 5 * 86400), BASE_NOON)
+        night = policy.next_interval(
+            make_tenant('approved', BASE_NIGHT - 60), BASE_NIGHT)
+        assert stale > fresh
+        assert night > fresh
+
+    def test_bounds_and_jitter(self):
+        from intervals import AdaptiveInterval
+
+        low = AdaptiveInterval(min_interval=500, jitter=0.5, rand=lambda: 0)
+        assert low.next_interval(make_tenant('reviewing'), BASE_NOON) == 500
+        high = AdaptiveInterval(max_interval=1000, rand=lambda: 1)
+        assert high.next_interval(
+            make_tenant('approved', 1.0), BASE_NOON) == 1000
+        jittered = AdaptiveInterval(jitter=0.1, rand=lambda: 1)
+        assert jittered.next_interval(
+            make_tenant('reviewing'), BASE_NOON) == 330
+
+    def test_process_response_records_verdict(self, homework_module):
+        from models import Status
+
+        tenant = make_tenant(None)
+        homework_module.process_response(tenant, {
+            'homeworks': [{'homework_name': 'hw', 'status': 'rejected'}],
+            'current_date': 1,
+        })
+        assert tenant.last_status == Status.REJECTED
+        assert tenant.last_change > 0
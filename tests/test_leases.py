@@ -0,0 +1,142 @@
+import math
+import multiprocessing
+import time
+
+import requests
+
+import utils
+
+
+def lease_worker(path, node, owned, stop):
+    from leases import LeaseManager, SQLiteLeaseStore
+
+    manager = LeaseManager(SQLiteLeaseStore(path), node, ttl=0.6)
+    while not stop.is_set():
+        manager.step()
+        manager.release(manager.surplus())
+        owned[node] = sorted(manager.owned)
+        time.sleep(0.1)
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'Условие не выполнилось вовремя'
+        time.sleep(0.05)
+
+
+class TestLeases:
+
+    def test_nodes_split_partitions(self):
+        from leases import LeaseManager, MemoryLeaseStore
+
+        clock, store = utils.FakeClock(1000.0), MemoryLeaseStore()
+        first = LeaseManager(store, 'a', partitions=8, clock=clock)
+        second = LeaseManager(store, 'b', partitions=8, clock=clock)
+        assert len(first.step()[0]) == 8
+        assert second.step() == (set(), set())
+        first.step()
+        first.release(first.surplus())
+        assert len(first.owned) == 4
+        gained, _ = second.step()
+        assert gained == set(range(8)) - first.owned
+
+    def test_failover_after_lease_expires(self):
+        from leases import LeaseManager, MemoryLeaseStore
+
+        clock, store = utils.FakeClock(1000.0), MemoryLeaseStore()
+        first = LeaseManager(store, 'a', partitions=8, ttl=30, clock=clock)
+        second = LeaseManager(store, 'b', partitions=8, ttl=30, clock=clock)
+        first.step()
+        second.step()
+        first.step()
+        first.release(first.surplus())
+        second.step()
+        assert first.holds('token')
+        clock.now += 31
+        assert not first.holds('token')
+        assert len(second.step()[0]) == 4 and len(second.owned) == 8
+        assert first.step()[1], 'Узел должен заметить потерю аренды'
+
+    def test_processes_never_share_partition(self, tmp_path):
+        from leases import PARTITIONS, SQLiteLeaseStore
+
+        path = str(tmp_path / 'leases.sqlite3')
+        SQLiteLeaseStore(path).close()
+        context = multiprocessing.get_context('fork')
+        manager = context.Manager()
+        owned, stop = manager.dict(), context.Event()
+        processes = {
+            node: context.Process(target=lease_worker,
+                                  args=(path, node, owned, stop))
+            for node in ('a', 'b', 'c')
+        }
+        for process in processes.values():
+            process.start()
+
+        def balanced(nodes):
+            shares = [owned.get(node, []) for node in nodes]
+            flat = [partition for share in shares for partition in share]
+            return (sorted(flat) == list(range(PARTITIONS))
+                    and max(map(len, shares))
+                    <= math.ceil(PARTITIONS / len(nodes)))
+
+        try:
+            wait_for(lambda: balanced('abc'))
+            processes['c'].kill()
+            processes['c'].join()
+            wait_for(lambda: balanced('ab'))
+        finally:
+            stop.set()
+            for process in processes.values():
+                process.join(timeout=5)
+            manager.shutdown()
+
+    def test_handoff_does_not_renotify(self, monkeypatch, tmp_path):
+        import engine
+        from leases import Coordinator, LeaseManager, MemoryLeaseStore
+        from storage import SQLiteStore
+        from tenants import TenantRegistry
+
+        def mocked_get(url, headers=None, params=None, **kwargs):
+            response = utils.MockResponseGET(random_timestamp=0)
+            response.json = lambda: {
+                'homeworks': [{'homework_name': headers['Authorization'],
+                               'status': 'approved'}],
+                'current_date': 0}
+            return response
+
+        monkeypatch.setattr(requests, 'get', mocked_get)
+        clock, leases = utils.FakeClock(1000.0), MemoryLeaseStore()
+        specs = [{'token': f'token-{index}', 'chat_id': index}
+                 for index in range(20)]
+        specs[0].update(locale='en', subscribers=[100])
+        nodes = []
+        for node in ('a', 'b'):
+            sent = []
+            bot = utils.MockTelegramBot()
+            bot.send_message = lambda chat_id, text, sent=sent: sent.append(
+                chat_id)
+            manager = LeaseManager(leases, node, partitions=8, clock=clock)
+            runner = engine.Engine(
+                bot, TenantRegistry(), workers=1, leases=manager,
+                store=SQLiteStore(str(tmp_path / 'state.sqlite3')))
+            nodes.append((Coordinator(runner, manager, specs), sent))
+        (first, first_sent), (second, second_sent) = nodes
+
+        first.step()
+        for tenant in list(first.engine.registry):
+            first.engine.poll(tenant)
+        assert sorted(first_sent) == list(range(20)) + [100]
+        assert first.engine.registry.get('token-0').locale == 'en'
+        second.step()
+        first.step()
+        first.step()
+        second.step()
+        moved = list(second.engine.registry)
+        assert moved and len(first.engine.registry) + len(moved) == 20
+        for tenant in moved:
+            second.engine.poll(tenant)
+        assert second_sent == [], 'Статус уже был отправлен первым узлом'
+        for coordinator, _ in nodes:
+            coordinator.engine.shutdown()
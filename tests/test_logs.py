@@ -0,0 +1,111 @@
+import io
+import json
+import logging
+
+import pytest
+
+import utils
+
+
+class Unformattable:
+    def __str__(self):
+        raise AssertionError('Сообщение не должно собираться в потоке опроса')
+
+
+@pytest.fixture
+def pipeline():
+    import logs
+
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    stream = io.StringIO()
+    listener = logs.setup(level=logging.DEBUG, stream=stream)
+
+    def read():
+        listener.stop()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield read
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+class TestLogs:
+
+    def test_sampler_suppresses_repeated_errors(self):
+        from logs import ErrorSampler
+
+        clock = utils.FakeClock()
+        sampler = ErrorSampler(period=60, clock=clock)
+
+        def record(message, tenant=1, level=logging.ERROR):
+            entry = logging.LogRecord('root', level, __file__, 1, message,
+                                      None, None)
+            entry.tenant = tenant
+            return entry
+
+        assert sampler.filter(record('Сбой в работе программы: 500'))
+        assert not sampler.filter(record('Сбой в работе программы: 500'))
+        assert sampler.filter(record('Сбой в работе программы: 500', 2))
+        assert sampler.filter(record('Сбой в работе программы: 502'))
+        assert sampler.filter(record('info', level=logging.INFO))
+        assert sampler.filter(record('info', level=logging.INFO))
+        clock.now = 61
+        again = record('Сбой в работе программы: 500')
+        assert sampler.filter(again) and again.suppressed == 1
+        assert sampler.suppressed == 1
+
+    def test_json_records_carry_tenant_and_latency(self, pipeline):
+        from tenants import Tenant, use_tenant
+
+        tenant = Tenant('token', 42)
+        tenant.polls = 3
+        with use_tenant(tenant):
+            logging.debug('ответ %s', 200, extra={'api_latency': 0.25})
+            try:
+                1 / 0
+            except ZeroDivisionError:
+                logging.exception('Сбой в работе программы: %s', 'x')
+            logging.error('Сбой в работе программы: %s', 'x')
+        logging.info('без арендатора')
+        records = pipeline()
+        assert [record['message'] for record in records] == [
+            'ответ 200', 'Сбой в работе программы: x', 'без арендатора']
+        assert records[0]['tenant'] == 42 and records[0]['poll'] == 3
+        assert records[0]['api_latency'] == 0.25
+        assert 'ZeroDivisionError' in records[1]['exception']
+        assert 'tenant' not in records[2]
+
+    def test_disabled_debug_is_not_formatted(self, pipeline):
+        logging.getLogger().setLevel(logging.INFO)
+        logging.debug('%s', Unformattable())
+        assert pipeline() == []
+
+    def test_forked_worker_writes_its_records(self, tmp_path):
+        import multiprocessing
+
+        import logs
+
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+
+        def worker():
+            listener = logs.restart()
+            logging.warning('запись рабочего процесса')
+            listener.stop()
+
+        path = tmp_path / 'log.jsonl'
+        try:
+            with open(path, 'w') as stream:
+                listener = logs.setup(stream=stream)
+                process = multiprocessing.get_context('fork').Process(
+                    target=worker)
+                process.start()
+                process.join(5)
+                listener.stop()
+        finally:
+            root.handlers[:] = handlers
+            root.setLevel(level)
+        messages = [json.loads(line)['message']
+                    for line in path.read_text().splitlines()]
+        assert messages == ['запись рабочего процесса']
@@ -0,0 +1,53 @@
+import json
+
+
+class TestTemplates:
+
+    def test_russian_messages_keep_format(self, homework_module):
+        from messages import TEMPLATES
+
+        for label, verdict in homework_module.HOMEWORK_VERDICTS.items():
+            assert homework_module.parse_status(
+                {'homework_name': 'hw {x}', 'status': label}) == (
+                f'Изменился статус проверки работы "hw {{x}}". {verdict}')
+        assert TEMPLATES.not_accepted() == 'Не принята ревьюером'
+
+    def test_locale_comes_from_tenant(self, homework_module):
+        from messages import VERDICTS
+        from tenants import Tenant, use_tenant
+
+        homework = {'homework_name': 'hw', 'status': 'rejected'}
+        with use_tenant(Tenant('token', 1, locale='en')):
+            english = homework_module.parse_status(homework)
+        with use_tenant(Tenant('token', 2, locale='de')):
+            fallback = homework_module.parse_status(homework)
+        assert english == ('Homework "hw" review status changed. '
+                           + VERDICTS['en']['rejected'])
+        assert fallback == homework_module.parse_status(homework)
+
+        tenant = Tenant('token', 3, timestamp=0, locale='en')
+        assert homework_module.process_response(
+            tenant, {'homeworks': [], 'current_date': 1}) == [
+            'Not accepted by a reviewer yet']
+
+    def test_rendered_messages_are_cached(self):
+        from messages import TemplateRegistry
+        from models import Status
+
+        templates = TemplateRegistry()
+        first = templates.render('hw' + str(1), Status.APPROVED, 'ru')
+        again = templates.render('hw' + str(1), Status.APPROVED, 'ru')
+        assert first is again
+        assert templates.cache_info().hits == 1
+        assert not templates.knows('unknown') and not templates.knows([1])
+
+    def test_tenants_file_sets_locale(self, tmp_path):
+        from tenants import TenantRegistry
+
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'token': 'a', 'chat_id': 7},
+            {'token': 'b', 'chat_id': 8, 'locale': 'en'}]))
+        registry = TenantRegistry.load(str(path))
+        assert registry.get('a').locale == 'ru'
+        assert registry.get('b').locale == 'en'
@@ -0,0 +1,81 @@
+import urllib.request
+from http import HTTPStatus
+
+import pytest
+import requests
+
+import utils
+
+
+class TestMetrics:
+
+    def test_histogram_buckets_are_cumulative(self):
+        from metrics import Histogram
+
+        histogram = Histogram('latency', 'test', buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value)
+        lines = list(histogram.render())
+        assert lines[:3] == ['latency_bucket{le="0.1"} 2',
+                             'latency_bucket{le="1.0"} 3',
+                             'latency_bucket{le="+Inf"} 4']
+        assert lines[-1] == 'latency_count 4'
+        assert histogram.count == 4
+
+    def test_registry_renders_counters_and_collectors(self):
+        from metrics import Counter, Registry
+
+        registry = Registry()
+        counter = registry.register(Counter('errors_total', 'test', ('code',)))
+        counter.inc(500)
+        counter.inc(500)
+        counter.inc('a"b')
+        registry.collect('depth', lambda: [('queue_depth', {}, 7)])
+        registry.collect('broken', lambda: 1 / 0)
+        text = registry.render()
+        assert '# TYPE errors_total counter' in text
+        assert 'errors_total{code="500"} 2' in text
+        assert 'errors_total{code="a\\"b"} 1' in text
+        assert 'queue_depth 7' in text
+
+    def test_api_errors_counted_by_code(self, monkeypatch, homework_module):
+        import metrics
+        from exceptions import HttpResponseNotOkError
+
+        monkeypatch.setattr(requests, 'get', lambda *args, **kwargs: (
+            utils.MockResponseGET(http_status=HTTPStatus.BAD_GATEWAY)))
+        before = metrics.API_ERRORS.values[(HTTPStatus.BAD_GATEWAY,)]
+        observed = metrics.API_LATENCY.count
+        with pytest.raises(HttpResponseNotOkError) as error:
+            homework_module.get_api_answer(0)
+        assert error.value.status_code == HTTPStatus.BAD_GATEWAY
+        assert str(error.value) == 'Код ошибки: 502'
+        assert metrics.API_ERRORS.values[(HTTPStatus.BAD_GATEWAY,)] == (
+            before + 1)
+        assert metrics.API_LATENCY.count == observed + 1
+
+    def test_wrong_key_counted_by_cause(self, homework_module):
+        import metrics
+        from exceptions import WrongKeyHw
+
+        before = dict(metrics.WRONG_KEY.values)
+        for homework in ({'status': 'approved'},
+                         {'homework_name': 'hw', 'status': 'unknown'}):
+            with pytest.raises(WrongKeyHw):
+                homework_module.parse_status(homework)
+        for cause in ('homework_name', 'status'):
+            assert metrics.WRONG_KEY.values[(cause,)] == (
+                before.get((cause,), 0) + 1)
+
+    def test_metrics_endpoint(self):
+        import metrics
+
+        server = metrics.serve(port=0)
+        try:
+            url = f'http://127.0.0.1:{server.server_port}/metrics'
+            with urllib.request.urlopen(url) as response:
+                text = response.read().decode()
+            assert 'homework_api_request_seconds_bucket' in text
+            assert 'homework_conditional_not_modified' in text
+        finally:
+            server.shutdown()
@@ -0,0 +1,34 @@
+class TestModels:
+
+    def test_status_labels_match_verdicts(self, homework_module):
+        from models import Status
+
+        assert {status.label for status in Status} == set(
+            homework_module.HOMEWORK_VERDICTS)
+        assert Status.parse('approved') is Status.APPROVED
+        assert Status.parse(3) is Status.APPROVED
+        assert Status.parse('unknown') == 'unknown'
+        assert Status.parse(['list']) == ['list']
+
+    def test_legacy_string_state_is_migrated(self):
+        from models import Status
+        from tenants import Tenant
+
+        tenant = Tenant('token', 1)
+        tenant.set_state({'statuses': {'1': 'approved', '2': 1},
+                          'last_status': 'rejected'})
+        assert tenant.statuses == {'1': Status.APPROVED,
+                                   '2': Status.REVIEWING}
+        assert tenant.last_status is Status.REJECTED
+
+    def test_homework_behaves_like_api_dict(self, homework_module):
+        from models import Homework
+
+        homework = Homework.from_json({'id': 1, 'homework_name': 'hw',
+                                       'status': 'approved', 'extra': 'x'})
+        assert homework.get('status') == 'approved'
+        assert homework.get('extra', 'default') == 'default'
+        assert homework.as_dict() == {'id': 1, 'homework_name': 'hw',
+                                      'status': 'approved'}
+        assert 'Работа проверена' in homework_module.parse_status(homework)
+        assert not hasattr(homework, '__dict__')
@@ -0,0 +1,202 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import requests
+
+import utils
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FlakyBot:
+    def __init__(self, failures):
+        self.failures = failures
+        self.sent = []
+
+    def send_message(self, chat_id, text):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('Bot API недоступен')
+        self.sent.append((chat_id, text))
+
+
+class TestOutbox:
+
+    def test_reopen_keeps_pending_and_dedup(self, tmp_path):
+        from outbox import Outbox
+
+        box = Outbox(str(tmp_path))
+        assert box.put(1, 'первое', key='a')
+        assert box.put(2, 'второе', key='b')
+        assert not box.put(1, 'первое', key='a')
+        assert box.take(timeout=0) == ('a', 1, 'первое')
+        box.ack('a')
+        box.close()
+
+        box = Outbox(str(tmp_path))
+        assert len(box) == 1 and box.duplicates == 0
+        assert not box.put(1, 'первое', key='a')
+        assert box.take(timeout=0) == ('b', 2, 'второе')
+        assert box.take(timeout=0) is None
+        box.close()
+
+    def test_torn_tail_record_is_ignored(self, tmp_path):
+        from outbox import HEADER, Outbox
+
+        box = Outbox(str(tmp_path))
+        box.put(1, 'целое', key='a')
+        segment = box.segments[-1]
+        end = segment.offset
+        box.put(1, 'оборванное', key='b')
+        segment.map[end:end + HEADER.size] = bytes(HEADER.size)
+        box.close()
+
+        box = Outbox(str(tmp_path))
+        assert list(box.pending) == ['a']
+        assert box.put(1, 'новое', key='c')
+        box.close()
+        assert sorted(Outbox(str(tmp_path)).pending) == ['a', 'c']
+
+    def test_compaction_drops_acked_and_expired(self, tmp_path):
+        from outbox import Outbox
+
+        now = [0.0]
+        box = Outbox(str(tmp_path), segment_size=512, compact_segments=3,
+                     dedup_ttl=100, clock=lambda: now[0])
+        for number in range(40):
+            key = f'k{number}'
+            box.put(1, 'x' * 50, key=key)
+            if number != 7:
+                box.ack(key)
+            now[0] += 5
+        assert box.compactions > 0
+        assert len(os.listdir(tmp_path)) == len(box.segments) < 8
+        box.close()
+
+        box = Outbox(str(tmp_path), segment_size=512, clock=lambda: now[0])
+        assert list(box.pending) == ['k7']
+        assert 'k39' in box.delivered and 'k0' not in box.delivered
+        box.close()
+
+    def test_drainer_retries_with_backoff(self, tmp_path):
+        from outbox import Drainer, Outbox
+
+        box = Outbox(str(tmp_path), retry_base=0.01)
+        bot = FlakyBot(failures=3)
+        drainer = Drainer(box, bot, workers=2).start()
+        box.put(5, 'статус', key='a')
+        drainer.stop(timeout=5)
+        assert bot.sent == [(5, 'статус')] and box.retries == 3
+        assert len(box) == 0 and drainer.sent == 1
+        box.close()
+
+    def test_statuses_first_and_chat_limit(self, tmp_path):
+        import time
+
+        from outbox import Drainer, Outbox, OutboxBot
+        from ratelimit import ERROR_PREFIX
+
+        box = Outbox(str(tmp_path))
+        OutboxBot(box).send_many([(1, ERROR_PREFIX + 'сбой'),
+                                  (1, 'статус 1'), (1, 'статус 2')])
+        sent = []
+
+        class Bot:
+            def send_message(self, chat_id, text):
+                sent.append((text, time.monotonic()))
+
+        drainer = Drainer(box, Bot(), workers=2, chat_rate=20,
+                          chat_burst=1).start()
+        drainer.stop(timeout=5)
+        assert [text for text, _ in sent] == [
+            'статус 1', 'статус 2', ERROR_PREFIX + 'сбой']
+        assert sent[2][1] - sent[0][1] >= 0.09
+        box.close()
+
+    def test_permanent_errors_are_dead_lettered(self, tmp_path):
+        from exceptions import BotApiError
+        from outbox import Drainer, Outbox
+
+        class BlockedBot:
+            calls = 0
+
+            def send_message(self, chat_id, text):
+                self.calls += 1
+                if chat_id == 1:
+                    raise BotApiError('Forbidden: bot was blocked', 403)
+                raise BotApiError('Too Many Requests', 429, 0.01)
+
+        box = Outbox(str(tmp_path), retry_base=0.01)
+        bot = BlockedBot()
+        drainer = Drainer(box, bot, workers=1).start()
+        box.put(1, 'статус', key='a')
+        drainer.stop(timeout=5)
+        assert bot.calls == 1 and box.dead == 1 and len(box) == 0
+        assert not box.put(1, 'статус', key='a')
+        box.put(2, 'статус', key='b')
+        drainer = Drainer(box, bot, workers=1).start()
+        drainer.stop(timeout=0.1)
+        assert box.dead == 1 and len(box) == 1 and box.retries >= 1
+        box.close()
+
+    def test_crash_leaves_messages_on_disk(self, tmp_path):
+        script = textwrap.dedent(f'''
+            import os, sys
+            sys.path.insert(0, {ROOT!r})
+            from outbox import Outbox
+            box = Outbox({str(tmp_path)!r})
+            box.put(1, 'доставлено', key='a')
+            box.ack(box.take(timeout=0)[0])
+            box.put(1, 'в пути', key='b')
+            box.take(timeout=0)
+            os._exit(1)
+        ''')
+        subprocess.run([sys.executable, '-c', script], check=False)
+        from outbox import Outbox
+
+        box = Outbox(str(tmp_path))
+        assert box.take(timeout=0) == ('b', 1, 'в пути')
+        assert not box.put(1, 'доставлено', key='a')
+        box.close()
+
+    def test_repeated_poll_is_not_queued_twice(self, monkeypatch, tmp_path,
+                                               homework_module):
+        from outbox import Outbox, OutboxBot
+        from tenants import Tenant
+
+        def mocked_get(url, headers=None, params=None, **kwargs):
+            response = utils.MockResponseGET(
+                random_timestamp=params['from_date'])
+            response.json = lambda: {'current_date': 1, 'homeworks': [{
+                'id': 1, 'homework_name': 'hw', 'status': 'approved',
+                'date_updated': '2026-10-18T10:00:00Z'}]}
+            return response
+
+        monkeypatch.setattr(requests, 'get', mocked_get)
+        box = Outbox(str(tmp_path))
+        tenant = Tenant('token', 1, timestamp=0)
+        tenant.subscribers.add(2)
+        homework_module.poll_tenant(OutboxBot(box), tenant)
+        assert len(box) == 2
+        homework_module.poll_tenant(OutboxBot(box), Tenant('token', 1, 0))
+        assert len(box) == 2 and box.duplicates == 1
+        box.close()
+
+    def test_engine_rejects_outbox_with_digests(self, monkeypatch,
+                                                tmp_path):
+        import pytest
+
+        import digest
+        import engine
+        from tenants import Tenant, TenantRegistry
+
+        monkeypatch.setattr(engine, 'OUTBOX_DIR', str(tmp_path))
+        monkeypatch.setattr(digest, 'DIGEST_WINDOW', 5.0)
+        monkeypatch.setattr(engine.homework, 'TELEGRAM_TOKEN', 'token')
+        monkeypatch.setattr(engine, 'load_registry',
+                            lambda: TenantRegistry([Tenant('t', 1)]))
+        monkeypatch.setattr(sys, 'argv', ['engine.py', '--once'])
+        with pytest.raises(SystemExit, match='DIGEST_WINDOW'):
+            engine.main()
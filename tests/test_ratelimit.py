@@ -0,0 +1,123 @@
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+
+
+class RetryAfter(Exception):
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+
+
+class TestTokenBucket:
+
+    def test_refill_and_wait(self):
+        from ratelimit import TokenBucket
+
+        bucket = TokenBucket(rate=2, capacity=2, now=0)
+        assert bucket.consume(0) and bucket.consume(0)
+        assert not bucket.consume(0)
+        assert bucket.wait_time(0) == 0.5
+        assert bucket.consume(0.5)
+        assert bucket.is_full(10)
+
+
+class TestSendQueue:
+
+    def make_queue(self, bot, **kwargs):
+        from ratelimit import SendQueue
+
+        kwargs.setdefault('workers', 0)
+        return SendQueue(bot, clock=lambda: 0.0, **kwargs)
+
+    def test_status_sent_before_error(self):
+        from ratelimit import QueuedBot
+
+        bot = RecordingBot()
+        queue = self.make_queue(bot)
+        queued = QueuedBot(queue)
+        queued.send_message(1, 'Сбой в работе программы: boom')
+        queued.send_message(2, 'Изменился статус проверки работы "hw".')
+        assert queue.step(0) is None
+        assert [chat for chat, _ in bot.sent] == [2, 1]
+
+    def test_statuses_are_coalesced_per_chat(self):
+        from digest import Coalescer
+        from ratelimit import QueuedBot
+
+        bot = RecordingBot()
+        queue = self.make_queue(bot, coalescer=Coalescer(window=5,
+                                                         clock=lambda: 0.0))
+        queued = QueuedBot(queue)
+        for name in ('hw1', 'hw2', 'hw3'):
+            queued.send_message(1, f'Изменился статус "{name}"')
+        queued.send_message(2, 'Изменился статус "other"')
+        queued.send_message(1, 'Сбой в работе программы: boom')
+        assert queue.step(0) == 5 and len(queue) == 2
+        assert bot.sent == [(1, 'Сбой в работе программы: boom')]
+        assert queue.step(5) is None
+        assert sorted(bot.sent[1:]) == [
+            (1, 'Изменился статус "hw1"\nИзменился статус "hw2"\n'
+                'Изменился статус "hw3"'),
+            (2, 'Изменился статус "other"')]
+
+    def test_stop_flushes_pending_digests(self):
+        from digest import Coalescer
+
+        bot = RecordingBot()
+        queue = self.make_queue(bot, coalescer=Coalescer(window=3600))
+        queue.start()
+        queue.put(1, 'a')
+        queue.put(1, 'b')
+        queue.stop(timeout=5)
+        assert bot.sent == [(1, 'a\nb')]
+
+    def test_per_chat_limit_does_not_block_other_chats(self):
+        bot = RecordingBot()
+        queue = self.make_queue(bot, chat_rate=1, chat_burst=1)
+        for text in ('a1', 'a2'):
+            queue.put('a', text)
+        queue.put('b', 'b1')
+        assert queue.step(0) == 1.0
+        assert bot.sent == [('a', 'a1'), ('b', 'b1')]
+        assert queue.step(1.0) is None
+        assert bot.sent[-1] == ('a', 'a2')
+
+    def test_global_limit(self):
+        bot = RecordingBot()
+        queue = self.make_queue(bot, global_rate=2)
+        for chat in range(5):
+            queue.put(chat, 'text')
+        assert queue.step(0) > 0
+        assert len(bot.sent) == 2 and len(queue) == 3
+
+    def test_retry_after_pauses_and_requeues(self):
+        bot = RecordingBot()
+        calls = []
+
+        def flaky_send(chat_id, text):
+            calls.append(text)
+            if len(calls) == 1:
+                raise RetryAfter(5)
+            bot.sent.append((chat_id, text))
+
+        bot.send_message = flaky_send
+        queue = self.make_queue(bot)
+        queue.put(1, 'hello')
+        queue.step(0)
+        assert queue.paused_until == 5 and len(queue) == 1
+        assert queue.step(1) == 4
+        queue.step(5)
+        assert bot.sent == [(1, 'hello')]
+
+    def test_worker_thread_drains_queue(self):
+        from ratelimit import SendQueue
+
+        bot = RecordingBot()
+        queue = SendQueue(bot, workers=2).start()
+        for chat in range(10):
+            queue.put(chat, 'text')
+        queue.stop()
+        assert len(bot.sent) == 10
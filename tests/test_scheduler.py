@@ -0,0 +1,36 @@
+class TestScheduler:
+
+    def test_pop_due_in_order(self):
+        from scheduler import Scheduler
+
+        scheduler = Scheduler()
+        for key, due in (('c', 3), ('a', 1), ('b', 2), ('d', 10)):
+            scheduler.schedule(key, due, key)
+        assert scheduler.pop_due(5) == ['a', 'b', 'c']
+        assert len(scheduler) == 1
+        assert scheduler.next_due() == 10
+
+    def test_reschedule_and_cancel(self):
+        from scheduler import Scheduler
+
+        scheduler = Scheduler()
+        scheduler.schedule('a', 1, 'a')
+        scheduler.schedule('b', 2, 'b')
+        scheduler.reschedule('a', 5, 'a')
+        assert scheduler.cancel('b')
+        assert not scheduler.cancel('b')
+        assert scheduler.pop_due(3) == []
+        assert scheduler.next_due() == 5
+        assert scheduler.pop_due(5) == ['a']
+        assert scheduler.next_due() is None
+
+    def test_heap_compacts_after_many_cancels(self):
+        from scheduler import Scheduler
+
+        scheduler = Scheduler()
+        for i in range(1000):
+            scheduler.schedule(i, i, i)
+        for i in range(900):
+            scheduler.cancel(i)
+        assert len(scheduler._heap) < 1000
+        assert scheduler.pop_due(10 ** 6) == list(range(900, 1000))
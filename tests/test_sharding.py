@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+
+def idle_worker(name, specs, metrics_queue, store_url=None):
+    metrics_queue.put((name, {'tenants': len(specs), 'polls': 1}))
+    while True:
+        time.sleep(0.05)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'Условие не выполнилось вовремя'
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def supervisor():
+    import sharding
+
+    specs = [{'token': f'token-{index}', 'chat_id': index,
+              'locale': 'en', 'subscribers': [index + 1000]}
+             for index in range(200)]
+    runner = sharding.Supervisor(specs, workers=3, target=idle_worker)
+    yield runner.start()
+    runner.shutdown()
+
+
+class TestSharding:
+
+    def test_ring_moves_only_new_node_keys(self):
+        from sharding import HashRing
+
+        ring = HashRing(['a', 'b', 'c'])
+        keys = [f'token-{index}' for index in range(2000)]
+        before = {key: ring.node_for(key) for key in keys}
+        assert set(before.values()) == {'a', 'b', 'c'}
+        ring.add('d')
+        moved = [key for key in keys if ring.node_for(key) != before[key]]
+        assert all(ring.node_for(key) == 'd' for key in moved)
+        assert 0.15 < len(moved) / len(keys) < 0.35
+        ring.remove('d')
+        assert {key: ring.node_for(key) for key in keys} == before
+
+    def test_supervisor_shards_cover_all_tenants(self, supervisor):
+        shards = supervisor.shards
+        assert len(shards) == 3 == len(supervisor.processes)
+        tokens = [token for shard in shards.values() for token in shard]
+        assert sorted(tokens) == sorted(supervisor.specs)
+        spec = shards['worker-0'][next(iter(shards['worker-0']))]
+        assert spec['locale'] == 'en' and len(spec['subscribers']) == 1
+
+    def test_supervisor_restarts_crashed_worker(self, supervisor):
+        node, process = next(iter(supervisor.processes.items()))
+        process.kill()
+        process.join()
+        supervisor.monitor_once()
+        assert supervisor.restarts == 1
+        assert supervisor.processes[node] is not process
+        assert supervisor.processes[node].is_alive()
+
+    def test_supervisor_rebalances_on_add_and_remove(self, supervisor):
+        before = dict(supervisor.processes)
+        changed = supervisor.add_worker()
+        assert 'worker-3' in changed and len(supervisor.processes) == 4
+        for node, process in before.items():
+            assert (supervisor.processes[node] is process) == (
+                node not in changed)
+        supervisor.remove_worker('worker-0')
+        assert 'worker-0' not in supervisor.processes
+        assert not before['worker-0'].is_alive()
+        assert sum(map(len, supervisor.shards.values())) == 200
+
+    def test_supervisor_aggregates_metrics(self, supervisor):
+        def collected():
+            supervisor.monitor_once()
+            return len(supervisor.metrics) == 3
+
+        wait_for(collected)
+        total = supervisor.aggregate()
+        assert total['tenants'] == 200
+        assert total['polls'] == 3
+        assert total['workers'] == 3
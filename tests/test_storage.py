@@ -0,0 +1,67 @@
+import requests
+
+import utils
+
+
+class TestStateStore:
+
+    def test_sqlite_roundtrip(self, tmp_path):
+        from models import Status
+        from storage import open_store
+        from tenants import Tenant
+
+        store = open_store(f'sqlite:///{tmp_path}/state.db')
+        tenant = Tenant('token', 1, timestamp=123)
+        tenant.statuses = {'1': Status.APPROVED, 'hw': Status.REVIEWING}
+        tenant.old_error_message = 'error'
+        store.save(tenant)
+        store.close()
+
+        restored = Tenant('token', 1)
+        store = open_store(str(tmp_path / 'state.db'))
+        assert store.load(restored)
+        assert restored.timestamp == 123
+        assert restored.statuses == tenant.statuses
+        assert restored.old_error_message == 'error'
+        assert not store.load(Tenant('other', 2))
+
+    def test_saves_are_batched(self, tmp_path):
+        from storage import SQLiteStore
+        from tenants import Tenant
+
+        store = SQLiteStore(str(tmp_path / 'state.db'), batch_size=100,
+                            flush_interval=3600)
+        for i in range(250):
+            store.save(Tenant(str(i), i, timestamp=i))
+        assert store.commits == 2
+        store.flush_if_due()
+        assert store.commits == 2
+        store.close()
+        assert store.commits == 3
+
+    def test_restart_does_not_renotify(self, monkeypatch, tmp_path):
+        import engine
+        from storage import open_store
+        from tenants import Tenant, TenantRegistry
+
+        def mocked_get(*args, **kwargs):
+            response = utils.MockResponseGET(random_timestamp=1)
+            response.json = lambda: {
+                'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+                'current_date': 1,
+            }
+            return response
+
+        monkeypatch.setattr(requests, 'get', mocked_get)
+        sent = []
+        bot = utils.MockTelegramBot()
+        bot.send_message = lambda chat_id, text: sent.append(text)
+        url = f'sqlite:///{tmp_path}/state.db'
+        for _ in range(2):
+            store = open_store(url)
+            registry = TenantRegistry([Tenant('token', 1)])
+            runner = engine.Engine(bot, registry, workers=1, store=store)
+            runner.tick(now=0)
+            runner.shutdown()
+            store.close()
+        assert len(sent) == 1
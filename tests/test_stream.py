@@ -0,0 +1,145 @@
+import json
+import tracemalloc
+
+import pytest
+import requests
+
+
+def iter_homeworks(count):
+    for index in range(count):
+        yield {
+            'id': index,
+            'homework_name': f'hw{index}',
+            'status': 'approved',
+            'reviewer_comment': 'Отлично' * 20,
+            'date_updated': f'2022-01-{28 - index % 28:02d}T10:00:00Z',
+        }
+
+
+def make_homeworks(count):
+    return list(iter_homeworks(count))
+
+
+def split(body, size):
+    return [body[start:start + size] for start in range(0, len(body), size)]
+
+
+class StreamResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, body, size=64):
+        self.chunks = split(body, size)
+        self.read = 0
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+    def close(self):
+        pass
+
+
+class TestStream:
+
+    @pytest.mark.parametrize('size', [1, 3, 100, 10_000])
+    def test_same_result_for_any_chunking(self, size):
+        from models import Homework
+        from stream import parse_chunks
+
+        answer = {'homeworks': make_homeworks(10), 'current_date': 42}
+        body = json.dumps(answer, ensure_ascii=False).encode()
+        parsed, _ = parse_chunks(split(body, size))
+        assert parsed['current_date'] == 42
+        assert parsed['homeworks'] == [
+            Homework.from_json(homework) for homework in answer['homeworks']]
+
+    def test_stops_at_cursor(self):
+        from stream import parse_chunks, parse_date
+
+        body = json.dumps({'homeworks': make_homeworks(20),
+                           'current_date': 7}).encode()
+        cursor = parse_date('2022-01-25T10:00:00Z')
+        parsed, parser = parse_chunks(split(body, 50), cursor=cursor)
+        assert [hw.id for hw in parsed['homeworks']] == [0, 1, 2, 3]
+        assert parser.stopped and parsed['current_date'] == 7
+
+        chunks = iter(split(body, 50))
+        parsed, parser = parse_chunks(chunks, cursor=cursor, current_date=6)
+        assert [hw.id for hw in parsed['homeworks']] == [0, 1, 2, 3]
+        assert parsed['current_date'] == 6
+        assert next(chunks, None) is not None, 'Хвост не должен читаться'
+
+    def test_fallback_date(self):
+        from stream import fallback_date
+
+        headers = {'Date': 'Thu, 01 Jan 1970 00:01:40 GMT'}
+        assert fallback_date(headers, 200.5) == 100
+        assert fallback_date(headers, 50.5) == 50
+        assert fallback_date({}, 50.5) == 50
+        assert fallback_date({'Date': 'вчера'}, 50.5) == 50
+
+    def test_invalid_answers(self, homework_module):
+        from stream import parse_chunks
+
+        with pytest.raises(ValueError):
+            parse_chunks([b'{"homeworks": [{"id": 1}'])
+        parsed, _ = parse_chunks([b'{"homeworks": {"id": 1}}'])
+        with pytest.raises(TypeError):
+            homework_module.check_response(parsed)
+        parsed, _ = parse_chunks([b'[1, 2]'])
+        with pytest.raises(TypeError):
+            homework_module.check_response(parsed)
+
+    def test_peak_memory_does_not_grow_with_payload(self):
+        from stream import parse_chunks, parse_date
+
+        def chunks(count):
+            yield b'{"homeworks": ['
+            for index, homework in enumerate(iter_homeworks(count)):
+                prefix = b',' if index else b''
+                yield prefix + json.dumps(homework).encode()
+            yield b'], "current_date": 1}'
+
+        peaks = []
+        for count in (1_000, 20_000):
+            tracemalloc.start()
+            parsed, parser = parse_chunks(
+                chunks(count), cursor=parse_date('2022-01-27T10:00:00Z'))
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            assert parser.skipped == count - 2
+            assert parsed['current_date'] == 1
+        assert peaks[1] < peaks[0] * 2
+
+    def test_poll_tenant_streams_from_cursor(self, monkeypatch,
+                                             homework_module):
+        from tenants import Tenant
+
+        body = json.dumps({'homeworks': make_homeworks(30),
+                           'current_date': 5}).encode()
+        responses = []
+
+        def streamed_get(url, headers=None, params=None, stream=False,
+                         timeout=None):
+            assert stream
+            responses.append(StreamResponse(body))
+            responses[-1].headers = {'Date': 'Thu, 01 Jan 1970 00:00:07 GMT'}
+            return responses[-1]
+
+        monkeypatch.setattr(homework_module, 'STREAM_RESPONSES', True)
+        monkeypatch.setattr(requests, 'get', streamed_get)
+        sent = []
+        bot = type('Bot', (), {'send_message': lambda self, chat_id, text:
+                               sent.append(text)})()
+        tenant = Tenant('token', 1, timestamp=0)
+        homework_module.poll_tenant(bot, tenant)
+        assert len(sent) == 30 and len(tenant.statuses) == 30
+        assert tenant.cursor == homework_module.stream.parse_date(
+            '2022-01-28T10:00:00Z')
+        assert tenant.timestamp == 5
+        homework_module.poll_tenant(bot, tenant)
+        assert len(sent) == 30
+        assert responses[1].read < len(responses[1].chunks)
+        assert tenant.timestamp == 7
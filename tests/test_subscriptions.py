@@ -0,0 +1,100 @@
+import requests
+
+import utils
+
+
+class ManyBot:
+    def __init__(self):
+        self.batches = []
+
+    def send_many(self, messages):
+        self.batches.append(list(messages))
+        return [None if chat_id != 'broken' else Exception('403')
+                for chat_id, _ in messages]
+
+    def send_message(self, chat_id, text):
+        raise AssertionError('Ожидалась пакетная отправка')
+
+
+class TestSubscriptions:
+
+    def test_index_follows_subscriptions(self, tmp_path):
+        import json
+
+        from storage import MemoryStore
+        from tenants import Tenant, TenantRegistry
+
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'token': 'a', 'chat_id': 1, 'subscribers': [2]}]))
+        registry = TenantRegistry.load(str(path))
+        assert registry.subscribe('a', 3).token == 'a'
+        assert registry.subscribe('missing', 3) is None
+        assert set(registry.subscribers('a')) == {1, 2, 3}
+        assert [tenant.token for tenant in registry.by_chat(3)] == ['a']
+        assert registry.unsubscribe('a', 2)
+        assert not registry.unsubscribe('a', 1)
+        assert registry.by_chat(2) == []
+
+        store = MemoryStore()
+        store.save(registry.get('a'))
+        restored = Tenant('a', 1)
+        restored.subscribers.add(4)
+        store.load(restored)
+        assert restored.subscribers == {3, 4}
+        fresh = TenantRegistry([Tenant('a', 1)])
+        store.load(fresh.get('a'))
+        fresh.index(fresh.get('a'))
+        assert [tenant.token for tenant in fresh.by_chat(3)] == ['a']
+        fresh.remove('a')
+        assert fresh.by_chat(1) == [] and fresh.by_chat(3) == []
+
+    def test_chat_ids_of_both_types_are_one_subscriber(self, tmp_path):
+        import json
+
+        from tenants import TenantRegistry
+
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'token': 'a', 'chat_id': 1, 'subscribers': ['555', '@news']}]))
+        registry = TenantRegistry.load(str(path))
+        registry.subscribe('a', 555)
+        chats = registry.subscribers('a')
+        assert len(chats) == 3 and set(chats) == {1, 555, '@news'}
+        assert registry.unsubscribe('a', '555')
+        assert registry.by_chat(555) == []
+        assert set(registry.subscribers('a')) == {1, '@news'}
+
+    def test_one_poll_fans_out_to_all_chats(self, monkeypatch,
+                                            homework_module):
+        from ratelimit import QueuedBot, SendQueue
+        from tenants import Tenant
+
+        calls = []
+
+        def mocked_get(url, headers=None, params=None, **kwargs):
+            calls.append(url)
+            response = utils.MockResponseGET(
+                random_timestamp=params['from_date'])
+            response.json = lambda: {'current_date': 1, 'homeworks': [
+                {'id': 1, 'homework_name': 'hw', 'status': 'approved'}]}
+            return response
+
+        monkeypatch.setattr(requests, 'get', mocked_get)
+        tenant = Tenant('token', 1, timestamp=0)
+        tenant.subscribers.update({2, 'broken'})
+        bot = ManyBot()
+        homework_module.poll_tenant(bot, tenant)
+        [batch] = bot.batches
+        assert len(calls) == 1
+        assert sorted(map(str, (chat for chat, _ in batch))) == [
+            '1', '2', 'broken']
+        assert len({id(text) for _, text in batch}) == 1
+
+        sent = []
+        queue = SendQueue(type('Bot', (), {
+            'send_message': lambda self, chat_id, text:
+            sent.append(chat_id)})(), workers=0, clock=lambda: 0.0)
+        assert QueuedBot(queue).send_many(batch) == [None] * 3
+        queue.step(0)
+        assert sorted(map(str, sent)) == ['1', '2', 'broken']
@@ -0,0 +1,128 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+
+class FakeEngine:
+    def __init__(self, registry):
+        from storage import MemoryStore
+
+        self.registry = registry
+        self.store = MemoryStore()
+        self.added = []
+
+    def add(self, tenant):
+        self.added.append(tenant)
+        self.registry.add(tenant)
+
+    async def fetch_homeworks(self, tenant, from_date=0):
+        return {'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+                'current_date': 1}
+
+
+def send_commands(engine, *texts, secret='secret', header='secret'):
+    import webhook
+
+    async def scenario():
+        app = webhook.make_app(engine, secret=secret)
+        async with TestClient(TestServer(app)) as client:
+            replies = []
+            for text in texts:
+                headers = {webhook.SECRET_HEADER: header} if header else {}
+                response = await client.post(
+                    webhook.WEBHOOK_PATH, headers=headers,
+                    json={'message': {'chat': {'id': 7}, 'text': text}})
+                replies.append((response.status,
+                                await response.json()
+                                if response.content_length else None))
+            return replies
+
+    return asyncio.run(scenario())
+
+
+class TestWebhook:
+
+    def test_status_answers_from_cached_state(self, monkeypatch):
+        import requests
+
+        from tenants import Tenant, TenantRegistry
+
+        def forbidden_get(*args, **kwargs):
+            raise AssertionError('/status не должен опрашивать API')
+
+        monkeypatch.setattr(requests, 'get', forbidden_get)
+        tenant = Tenant('token', 7)
+        tenant.last_message = 'Изменился статус проверки работы "hw".'
+        engine = FakeEngine(TenantRegistry([tenant]))
+        [(status, reply)] = send_commands(engine, '/status')
+        assert status == 200
+        assert reply == {'method': 'sendMessage', 'chat_id': 7,
+                         'text': tenant.last_message}
+
+    def test_subscribe_and_mute(self):
+        from tenants import TenantRegistry
+
+        engine = FakeEngine(TenantRegistry())
+        replies = send_commands(engine, '/subscribe abc', '/mute',
+                                '/status')
+        assert [tenant.token for tenant in engine.added] == ['abc']
+        tenant = engine.registry.get('abc')
+        assert tenant.muted and str(tenant.chat_id) == '7'
+        assert replies[2][1]['text'] == 'Статусов пока нет'
+
+    def test_subscribe_to_existing_token(self):
+        from tenants import Tenant, TenantRegistry
+
+        engine = FakeEngine(TenantRegistry([Tenant('abc', 5)]))
+        replies = send_commands(engine, '/subscribe abc', '/mute',
+                                '/unsubscribe abc', '/unsubscribe abc')
+        tenant = engine.registry.get('abc')
+        assert engine.added == [] and tenant.chat_id == 5
+        assert not tenant.muted and tenant.subscribers == set()
+        assert [reply['text'] for _, reply in replies[1:]] == [
+            'Подписок нет, используйте /subscribe <токен>',
+            'Подписка отменена', 'Чат не подписан на этот токен']
+
+    def test_lang_switches_locale(self):
+        from tenants import Tenant, TenantRegistry
+
+        engine = FakeEngine(TenantRegistry([Tenant('token', 7)]))
+        replies = send_commands(engine, '/lang en', '/lang fr')
+        assert engine.registry.get('token').locale == 'en'
+        assert replies[1][1]['text'] == 'Укажите язык: /lang <en|ru>'
+
+    def test_check_reads_all_homeworks(self):
+        from tenants import Tenant, TenantRegistry
+
+        engine = FakeEngine(TenantRegistry([Tenant('token', 7)]))
+        [(_, reply)] = send_commands(engine, '/check')
+        assert reply['text'].startswith(
+            'Изменился статус проверки работы "hw"')
+        [_, (_, reply)] = send_commands(engine, '/lang en', '/check')
+        assert reply['text'].startswith('Homework "hw" review status')
+
+    def test_secret_is_checked(self):
+        import pytest
+
+        import webhook
+        from tenants import TenantRegistry
+
+        engine = FakeEngine(TenantRegistry())
+        [(status, _)] = send_commands(engine, '/status', header='wrong')
+        assert status == 403
+        [(status, _)] = send_commands(engine, '/status', header=None)
+        assert status == 403
+        with pytest.raises(ValueError):
+            webhook.make_app(engine, secret=None)
+
+    def test_muted_tenant_gets_no_messages(self, homework_module):
+        from models import Status
+        from tenants import Tenant
+
+        tenant = Tenant('token', 7, timestamp=0)
+        tenant.muted = True
+        messages = homework_module.process_response(tenant, {
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 1,
+        })
+        assert messages == [] and tenant.statuses == {'hw': Status.APPROVED}
@@ -0,0 +1,177 @@
+import hmac
+import inspect
+import logging
+import os
+
+from aiohttp import web
+
+import homework
+from messages import TEMPLATES
+from tenants import Tenant, use_tenant
+
+WEBHOOK_PATH = '/telegram/webhook'
+WEBHOOK_PORT = int(os.getenv('PORT', 8080))
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+HELP_MESSAGE = ('Команды: /status - последние статусы, '
+                '/check - статусы всех работ из API, '
+                '/subscribe <PRACTICUM_TOKEN> - подписка, '
+                '/unsubscribe <PRACTICUM_TOKEN> - отписка, '
+                '/mute и /unmute - выключить и включить уведомления, '
+                '/lang <ru|en> - язык уведомлений.')
+NO_SUBSCRIPTION_MESSAGE = 'Подписок нет, используйте /subscribe <токен>'
+
+
+def command_status(engine, chat_id, argument):
+    """Последние известные статусы без запроса к API."""
+    tenants = engine.registry.by_chat(chat_id)
+    if not tenants:
+        return NO_SUBSCRIPTION_MESSAGE
+    return '\n'.join(tenant.last_message or 'Статусов пока нет'
+                     for tenant in tenants)
+
+
+async def command_check(engine, chat_id, argument):
+    """Статусы всех работ из API через кэш с объединением запросов."""
+    tenants = engine.registry.by_chat(chat_id)
+    if not tenants:
+        return NO_SUBSCRIPTION_MESSAGE
+    lines = []
+    for tenant in tenants:
+        try:
+            answer = await engine.fetch_homeworks(tenant)
+            homeworks = homework.check_response(answer)
+            with use_tenant(tenant):
+                lines.extend(homework.parse_status(item)
+                             for item in homeworks)
+        except Exception as error:
+            lines.append(homework.ERROR_MESSAGE.format(error))
+    return '\n'.join(lines) or 'Работ пока нет'
+
+
+def command_subscribe(engine, chat_id, argument):
+    """Подписка чата на домашки студента с токеном argument."""
+    if not argument:
+        return 'Укажите токен: /subscribe <PRACTICUM_TOKEN>'
+    tenant = engine.registry.subscribe(argument, chat_id)
+    if tenant is None:
+        engine.add(Tenant(argument, chat_id))
+    else:
+        engine.store.save(tenant)
+    return 'Подписка оформлена, статусы придут в этот чат'
+
+
+def command_unsubscribe(engine, chat_id, argument):
+    """Отписка чата-подписчика от домашек студента с токеном argument."""
+    if not engine.registry.unsubscribe(argument, chat_id):
+        return 'Чат не подписан на этот токен'
+    engine.store.save(engine.registry.get(argument))
+    return 'Подписка отменена'
+
+
+def _owned(engine, chat_id):
+    """Арендаторы, владелец которых - чат; подписчики их не меняют."""
+    return [tenant for tenant in engine.registry.by_chat(chat_id)
+            if str(tenant.chat_id) == str(chat_id)]
+
+
+def _set_muted(engine, chat_id, muted):
+    tenants = _owned(engine, chat_id)
+    for tenant in tenants:
+        tenant.muted = muted
+        engine.store.save(tenant)
+    return tenants
+
+
+def command_mute(engine, chat_id, argument):
+    """Выключение уведомлений чата."""
+    if not _set_muted(engine, chat_id, True):
+        return NO_SUBSCRIPTION_MESSAGE
+    return 'Уведомления выключены, /unmute включит их снова'
+
+
+def command_unmute(engine, chat_id, argument):
+    """Включение уведомлений чата."""
+    if not _set_muted(engine, chat_id, False):
+        return NO_SUBSCRIPTION_MESSAGE
+    return 'Уведомления включены'
+
+
+def command_lang(engine, chat_id, argument):
+    """Выбор языка уведомлений чата."""
+    if argument not in TEMPLATES.locales:
+        return f'Укажите язык: /lang <{"|".join(TEMPLATES.locales)}>'
+    tenants = _owned(engine, chat_id)
+    if not tenants:
+        return NO_SUBSCRIPTION_MESSAGE
+    for tenant in tenants:
+        tenant.locale = argument
+        engine.store.save(tenant)
+    return f'Язык уведомлений: {argument}'
+
+
+COMMANDS = {
+    '/status': command_status,
+    '/check': command_check,
+    '/subscribe': command_subscribe,
+    '/unsubscribe': command_unsubscribe,
+    '/mute': command_mute,
+    '/unmute': command_unmute,
+    '/lang': command_lang,
+}
+
+
+def make_app(engine, secret=WEBHOOK_SECRET, path=WEBHOOK_PATH):
+    """Приложение, принимающее обновления Telegram для движка опроса.
+
+    Ответ отправляется в теле ответа на webhook, без отдельного запроса
+    к Bot API, поэтому без секрета приложение не создается: иначе любой,
+    кто достучится до порта, прочитал бы статусы чужого чата.
+    """
+    if not secret:
+        raise ValueError('Для webhook нужен WEBHOOK_SECRET')
+
+    async def handle_update(request):
+        header = request.headers.get(SECRET_HEADER, '')
+        if not hmac.compare_digest(header.encode(), secret.encode()):
+            return web.Response(status=403)
+        update = await request.json()
+        message = update.get('message') or {}
+        chat_id = (message.get('chat') or {}).get('id')
+        text = message.get('text') or ''
+        if chat_id is None or not text.startswith('/'):
+            return web.Response()
+        command, _, argument = text.partition(' ')
+        handler = COMMANDS.get(command.split('@')[0])
+        reply = (handler(engine, chat_id, argument.strip()) if handler
+                 else HELP_MESSAGE)
+        if inspect.isawaitable(reply):
+            reply = await reply
+        logging.debug('webhook: команда %s из чата %s', command, chat_id)
+        return web.json_response(
+            {'method': 'sendMessage', 'chat_id': chat_id, 'text': reply})
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    return app
+
+
+async def set_webhook(session, bot_url, url, secret=WEBHOOK_SECRET):
+    """Регистрация адреса webhook в Bot API."""
+    payload = {'url': url, 'allowed_updates': ['message']}
+    if secret:
+        payload['secret_token'] = secret
+    async with session.post(f'{bot_url}/setWebhook', json=payload) as answer:
+        if answer.status != 200:
+            logging.error(f'setWebhook: код ответа {answer.status}')
+
+
+async def start(engine, port=WEBHOOK_PORT):
+    """Запуск webhook-сервера в текущем цикле событий."""
+    runner = web.AppRunner(make_app(engine), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, port=port).start()
+    logging.info(f'Webhook слушает порт {port}')
+    return runner